@@ -0,0 +1,284 @@
+"""Cross-worker broadcast of live events (new threads and comments) for ``backend/live.py``.
+
+The hub fans events out to the streams of its own worker; a broadcast backend carries them to
+the hubs of the other workers. Backends (``LIVE_BROADCAST_BACKEND``):
+
+``local``
+    ``LocalBroadcast``: nothing leaves the process. Comments still reach every worker through
+    the hub's Firestore listeners (one per watched thread per worker); new threads only reach
+    streams on the worker that created them.
+``uds``
+    ``UnixSocketBroadcast``: the workers on a host exchange events through a broker on a Unix
+    domain socket (``LIVE_BROADCAST_SOCKET``). Whichever worker holds an exclusive ``flock`` on
+    ``<socket>.lock`` binds the socket and relays every message it receives to every other
+    connection; the rest connect to it. When the broker's worker exits the lock is released
+    and the first worker to reconnect takes over. Only the server's own user may connect: the
+    socket is ``chmod 0600`` and the default one sits in a per-user ``0700`` directory.
+
+Publishes are coalesced: they are buffered per ``(kind, key)`` for
+``LIVE_BROADCAST_INTERVAL_SECONDS`` and sent as one message per key, so a burst of 100 comments
+on a thread crosses the socket as a handful of messages, each fanned out by the receiving hubs
+as one queued write per subscriber. A connection with more than ``LIVE_BROADCAST_MAX_BUFFER``
+bytes unsent is dropped and reconnects; comments it missed still arrive through the listeners.
+
+Messages are length-prefixed JSON, ``{"kind": "comment"|"thread", "key": ..., "items":
+[[id, data], ...]}``. All backends implement ``start(on_message)``, ``publish(kind, key, id,
+data)`` and ``close()``.
+"""
+
+from __future__ import annotations
+import asyncio
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import struct
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+LIVE_BROADCAST_BACKEND = os.getenv("LIVE_BROADCAST_BACKEND", "local")
+_DEFAULT_SOCKET_DIR = os.path.join(tempfile.gettempdir(), f"techspace-live-{os.getuid()}")
+LIVE_BROADCAST_SOCKET = os.getenv("LIVE_BROADCAST_SOCKET") or os.path.join(
+    _DEFAULT_SOCKET_DIR, "live.sock"
+)
+LIVE_BROADCAST_INTERVAL = float(os.getenv("LIVE_BROADCAST_INTERVAL_SECONDS", "0.05"))
+LIVE_BROADCAST_MAX_BUFFER = int(os.getenv("LIVE_BROADCAST_MAX_BUFFER", str(4 << 20)))
+
+Item = List[Any]  # [id, data]
+OnMessage = Callable[[str, str, List[Item]], None]
+
+_HEADER = struct.Struct(">I")
+_RECONNECT_DELAYS = (0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def encode_message(kind: str, key: str, items: List[Item]) -> bytes:
+    payload = json.dumps({"kind": kind, "key": key, "items": items}, separators=(",", ":"))
+    raw = payload.encode()
+    return _HEADER.pack(len(raw)) + raw
+
+
+class LocalBroadcast:
+    """No cross-worker delivery."""
+
+    async def start(self, on_message: OnMessage) -> None:
+        pass
+
+    def publish(self, kind: str, key: str, item_id: str, data: Dict[str, Any]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class _Connection(asyncio.Protocol):
+    """A framed stream; passes every complete frame (header included) to ``on_frame``."""
+
+    def __init__(
+        self,
+        on_frame: Callable[["_Connection", bytes], None],
+        on_lost: Callable[["_Connection"], None],
+        max_buffer: int,
+    ):
+        self.on_frame = on_frame
+        self.on_lost = on_lost
+        self.max_buffer = max_buffer
+        self.transport: Optional[asyncio.Transport] = None
+        self._buffer = bytearray()
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+        while len(self._buffer) >= _HEADER.size:
+            (size,) = _HEADER.unpack_from(self._buffer)
+            end = _HEADER.size + size
+            if len(self._buffer) < end:
+                break
+            frame = bytes(self._buffer[:end])
+            del self._buffer[:end]
+            self.on_frame(self, frame)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.on_lost(self)
+
+    def send(self, data: bytes) -> None:
+        if self.transport is None or self.transport.is_closing():
+            return
+        if self.transport.get_write_buffer_size() > self.max_buffer:
+            logger.warning("live broadcast peer is not reading; dropping its connection")
+            self.transport.abort()
+            return
+        self.transport.write(data)
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+
+class UnixSocketBroadcast:
+    def __init__(
+        self,
+        path: str = LIVE_BROADCAST_SOCKET,
+        interval: float = LIVE_BROADCAST_INTERVAL,
+        max_buffer: int = LIVE_BROADCAST_MAX_BUFFER,
+    ):
+        self.path = path
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.is_broker = False
+        self.sent = 0  # messages written (one per coalesced key per flush)
+        self.received = 0
+        self._on_message: Optional[OnMessage] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[Tuple[str, str], List[Item]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._peers: Set[_Connection] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lock_fd: Optional[int] = None
+        self._ready = asyncio.Event()
+        self._connecting: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(self, on_message: OnMessage) -> None:
+        """Join the broker (or become it); waits briefly for the first connection."""
+        self._on_message = on_message
+        self._loop = asyncio.get_running_loop()
+        self._connecting = self._loop.create_task(self._connect())
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.shield(self._ready.wait()), 2)
+
+    def publish(self, kind: str, key: str, item_id: str, data: Dict[str, Any]) -> None:
+        """Queue an event for the next flush (call on the event loop)."""
+        if self._loop is None or self._closed:
+            return
+        self._pending.setdefault((kind, key), []).append([item_id, data])
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.interval, self._flush)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush()
+        if self._connecting is not None:
+            self._connecting.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._connecting
+        for peer in list(self._peers):
+            peer.close()
+        if self._server is not None:
+            self._server.close()
+            with contextlib.suppress(OSError):
+                os.unlink(self.path)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the flock; another worker takes over
+            self._lock_fd = None
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        data = b"".join(encode_message(*key, items) for key, items in pending.items())
+        for peer in list(self._peers):
+            peer.send(data)
+        self.sent += len(pending)
+
+    async def _connect(self) -> None:
+        attempt = 0
+        while not self._closed:
+            try:
+                await self._establish()
+            except OSError as exc:  # the broker is restarting or has not bound yet
+                delay = _RECONNECT_DELAYS[min(attempt, len(_RECONNECT_DELAYS) - 1)]
+                attempt += 1
+                logger.debug("live broadcast connect failed (%s); retrying in %ss", exc, delay)
+                await asyncio.sleep(delay)
+            else:
+                self._ready.set()
+                return
+
+    async def _establish(self) -> None:
+        _make_socket_dir(os.path.dirname(self.path))
+        if self._try_lock():
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)  # stale socket of a broker that exited
+            try:
+                self._server = await self._loop.create_unix_server(self._accept, self.path)
+                os.chmod(self.path, 0o600)  # connecting needs write permission on the socket
+            except OSError:
+                if self._server is not None:
+                    self._server.close()
+                    self._server = None
+                os.close(self._lock_fd)
+                self._lock_fd = None
+                raise
+            self.is_broker = True
+            return
+        _, conn = await self._loop.create_unix_connection(
+            lambda: _Connection(self._receive, self._lost, self.max_buffer), self.path
+        )
+        self._peers.add(conn)
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _accept(self) -> _Connection:
+        conn = _Connection(self._relay, self._peers.discard, self.max_buffer)
+        self._peers.add(conn)
+        return conn
+
+    def _lost(self, conn: _Connection) -> None:
+        self._peers.discard(conn)
+        if not self._closed:
+            self._ready.clear()
+            self._connecting = self._loop.create_task(self._connect())
+
+    def _relay(self, conn: _Connection, frame: bytes) -> None:
+        for peer in list(self._peers):
+            if peer is not conn:
+                peer.send(frame)
+        self._receive(conn, frame)
+
+    def _receive(self, conn: _Connection, frame: bytes) -> None:
+        self.received += 1
+        try:
+            message = json.loads(frame[_HEADER.size :])
+            self._on_message(message["kind"], message["key"], message["items"])
+        except Exception:  # noqa: BLE001 - one bad message must not break the connection
+            logger.exception("failed to handle live broadcast message")
+
+
+def _make_socket_dir(directory: str) -> None:
+    """Create the socket's directory (0700). The shared default one must be ours and private:
+    anyone who could write to it could swap in their own socket."""
+    if not directory:
+        return
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if directory == _DEFAULT_SOCKET_DIR:
+        st = os.stat(directory)
+        if st.st_uid != os.getuid() or st.st_mode & 0o077:
+            raise PermissionError(f"{directory} must be owned by this user with mode 0700")
+
+
+def make_broadcast(backend: str = LIVE_BROADCAST_BACKEND):
+    """Broadcast for ``LIVE_BROADCAST_BACKEND`` (``local`` or ``uds``)."""
+    if backend == "local":
+        return LocalBroadcast()
+    if backend == "uds":
+        return UnixSocketBroadcast()
+    raise ValueError(f"Unknown LIVE_BROADCAST_BACKEND {backend!r} (expected 'local' or 'uds')")
+
+
+__all__ = ["LocalBroadcast", "UnixSocketBroadcast", "encode_message", "make_broadcast"]
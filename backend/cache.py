@@ -0,0 +1,131 @@
+"""In-process LRU + TTL caches for the hottest read paths.
+
+``thread_pages`` caches ``GET /threads`` results keyed by ``(tag, limit, page_token, sort, view)``
+and ``thread_docs`` caches ``GET /threads/{id}`` keyed by thread id. Writes invalidate precisely via
+``invalidate_thread``; the short TTL bounds staleness for everything else (later pages, other
+workers). ``profiles`` holds public profiles by uid for author expansion and batch lookups; a
+profile save invalidates its entry, other workers see renames after ``PROFILE_CACHE_TTL``.
+``tag_counts`` holds ``GET /tags`` results for ``TAG_COUNTS_CACHE_TTL``; counts are only a
+popularity signal, so they are never invalidated.
+"""
+
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+THREAD_CACHE_TTL = float(os.getenv("THREAD_CACHE_TTL_SECONDS", "5"))
+THREAD_CACHE_SIZE = int(os.getenv("THREAD_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+TAG_COUNTS_CACHE_TTL = float(os.getenv("TAG_COUNTS_CACHE_TTL_SECONDS", "30"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire ``ttl`` seconds after being stored."""
+
+    def __init__(
+        self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value``; ``ttl`` overrides the cache-wide TTL for this entry."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every key matching ``predicate``; returns how many were removed."""
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
+
+
+thread_pages = TTLCache(THREAD_CACHE_SIZE, THREAD_CACHE_TTL)
+thread_docs = TTLCache(THREAD_CACHE_SIZE, THREAD_CACHE_TTL)
+profiles = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+tag_counts = TTLCache(64, TAG_COUNTS_CACHE_TTL)
+
+
+def invalidate_thread(thread_id: Optional[str], tags: Iterable[str]) -> None:
+    """Forget a changed thread and the first pages (untagged + each of its tags) listing it."""
+    if thread_id is not None:
+        thread_docs.invalidate(thread_id)
+    affected = {None, *tags}
+    # page keys are (tag, limit, page_token, sort, view); only first pages of the "new" ordering
+    # are invalidated eagerly (the hot feed changes only when the background job re-ranks it)
+    thread_pages.invalidate_where(
+        lambda key: key[2] is None and key[0] in affected and key[3] == "new"
+    )
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {
+        "thread_pages": thread_pages.stats(),
+        "thread_docs": thread_docs.stats(),
+        "profiles": profiles.stats(),
+        "tag_counts": tag_counts.stats(),
+    }
+
+
+__all__ = [
+    "TTLCache",
+    "thread_pages",
+    "thread_docs",
+    "profiles",
+    "tag_counts",
+    "invalidate_thread",
+    "stats",
+]
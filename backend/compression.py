@@ -0,0 +1,183 @@
+"""Response compression: negotiated gzip/brotli for API JSON, precompressed static files.
+
+API responses
+    ``CompressionMiddleware`` compresses ``application/json`` bodies of at least
+    ``COMPRESS_MIN_SIZE`` bytes with the best encoding the client accepts: ``br`` (when the
+    optional ``brotli`` package is installed, quality ``COMPRESS_BROTLI_QUALITY``), else ``gzip``
+    (level ``COMPRESS_GZIP_LEVEL``). Only bodies sent in one message are compressed, which is
+    every JSON response here; streams such as Server-Sent Events pass through untouched, since
+    compressing them would hold events back.
+Static files
+    ``PrecompressedStaticFiles`` serves ``<file>.br`` / ``<file>.gz`` in place of a built file
+    when the client accepts it. The variants are written once after ``vite build`` by
+    ``backend/tools/precompress_static.py``; nothing is compressed per request. Vite's
+    content-hashed ``assets/*`` files are sent with a one-year ``immutable`` ``Cache-Control``;
+    everything else (``index.html``) with ``no-cache``, so a deploy is picked up on next load.
+"""
+
+from __future__ import annotations
+import gzip
+import mimetypes
+import os
+import re
+from typing import Dict, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional: gzip only without it
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "5"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+# Encoding -> file suffix of its precompressed variant, in server preference order.
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Built files worth precompressing (images and fonts are compressed already).
+COMPRESSIBLE_EXTENSIONS = frozenset(
+    {".html", ".js", ".mjs", ".css", ".json", ".svg", ".map", ".txt", ".xml", ".wasm"}
+)
+# Settings for compressing once, ahead of time (build step, SPA shell): smallest output.
+MAX_LEVELS = {"br": 11, "gzip": 9}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Vite names build assets "<name>-<hash>.<ext>" (8-character base64url hash) under assets/.
+_HASHED_ASSET = re.compile(r"(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+
+def encodings() -> Sequence[str]:
+    """Encodings this process can produce, in preference order."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """The first of ``available`` with the highest q-value in ``Accept-Encoding`` (None if none)."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name.strip():
+            weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        quality = COMPRESS_BROTLI_QUALITY if level is None else level
+        return brotli.compress(data, quality=quality)
+    level = COMPRESS_GZIP_LEVEL if level is None else level
+    # mtime=0 keeps the output a pure function of the input (reproducible build variants)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compress complete JSON response bodies for clients that accept gzip or br."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        held: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal held
+            if message["type"] == "http.response.start":
+                held = message  # wait for the body to decide
+                return
+            if held is None:  # a later chunk of a passed-through stream
+                await send(message)
+                return
+            start, held = held, None
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            if (
+                not message.get("more_body", False)
+                and len(body) >= self.minimum_size
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith("application/json")
+            ):
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """``StaticFiles`` serving build-time ``.br`` / ``.gz`` variants and cache headers."""
+
+    def file_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        path, headers = full_path, {"Cache-Control": cache_control(scope["path"])}
+        variants: Dict[str, os.stat_result] = {}
+        for encoding, suffix in SUFFIXES.items():
+            try:
+                variants[encoding] = os.stat(full_path + suffix)
+            except OSError:
+                pass
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+            encoding = negotiate(request_headers.get("accept-encoding", ""), list(variants))
+            if encoding is not None:
+                path, stat_result = full_path + SUFFIXES[encoding], variants[encoding]
+                headers["Content-Encoding"] = encoding
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def cache_control(path: str) -> str:
+    """Cache-Control for a built file: immutable for hashed Vite assets, else revalidate."""
+    return IMMUTABLE_CACHE_CONTROL if _HASHED_ASSET.search(path) else "no-cache"
+
+
+__all__ = [
+    "CompressionMiddleware",
+    "PrecompressedStaticFiles",
+    "cache_control",
+    "compress",
+    "encodings",
+    "negotiate",
+    "COMPRESSIBLE_EXTENSIONS",
+    "MAX_LEVELS",
+    "SUFFIXES",
+]
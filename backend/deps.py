@@ -2,14 +2,25 @@
 
 from __future__ import annotations
 from fastapi import Header, HTTPException, Depends
-from .firebase import verify_token, get_db
-import time
+from .firebase import cached_token_claims, verify_token, get_db, run_db
+from .ratelimit import make_limiter, parse_route_limits
+import math
 from typing import Optional, Dict, Any
 
 RATE_LIMIT_PER_MIN = int(__import__("os").getenv("RATE_LIMIT_PER_MINUTE", "120"))
 
-# Simple in-memory rate limiter {key: (window_start, count)}
-_rate_state: Dict[str, tuple[float, int]] = {}
+# Per-route budgets, enforced on top of the global RATE_LIMIT_PER_MIN. Override or extend with
+# RATE_LIMIT_ROUTES="comments.vote=60,moderation.report=10".
+ROUTE_RATE_LIMITS: Dict[str, int] = {
+    "comments.vote": 60,
+    "moderation.report": 10,
+    "moderation.block": 30,
+    **parse_route_limits(__import__("os").getenv("RATE_LIMIT_ROUTES", "")),
+}
+
+# Token buckets keyed by (scope, uid); per process or shared by all workers on the host,
+# depending on RATE_LIMIT_BACKEND (see backend/ratelimit.py).
+limiter = make_limiter()
 
 
 class UserContext(Dict[str, Any]):
@@ -42,28 +53,41 @@ async def get_current_user(authorization: Optional[str] = Header(None)) -> UserC
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
     token = authorization.split(" ", 1)[1].strip()
-    try:
-        decoded = verify_token(token)
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    # Repeat requests with the same token skip both the RSA check and the executor hop.
+    decoded = cached_token_claims(token)
+    if decoded is None:
+        try:
+            decoded = await run_db(verify_token, token)
+        except ValueError:
+            raise HTTPException(status_code=401, detail="Invalid token")
     return UserContext(uid=decoded.get("uid"), email_verified=decoded.get("email_verified"))
 
 
+def _enforce(scope: str, uid: str, limit: int) -> None:
+    retry_after = limiter.try_acquire((scope, uid), limit)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
 async def rate_limit(user: UserContext = Depends(get_current_user)):
     # Always enforce even in bypass so tests like rate_limit_429 can validate behavior.
-    now = time.time()
-    window = int(now // 60)
-    key = f"{user['uid']}:{window}"
-    start, count = _rate_state.get(key, (now, 0))
-    # Enforce limit AFTER accounting for current request so a limit of N allows N requests
-    if count + 1 > RATE_LIMIT_PER_MIN:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
-    _rate_state[key] = (start, count + 1)
-    # Opportunistic cleanup of old windows
-    if len(_rate_state) > 5000:
-        old_keys = [k for k, (s, _) in _rate_state.items() if now - s > 3600]
-        for k in old_keys:
-            _rate_state.pop(k, None)
-
-
-__all__ = ["get_current_user", "rate_limit", "get_db", "UserContext"]
+    # A limit of N allows a burst of N requests, then one more every 60/N seconds.
+    _enforce("*", user["uid"], RATE_LIMIT_PER_MIN)
+
+
+def route_rate_limit(scope: str):
+    """Dependency enforcing ``ROUTE_RATE_LIMITS[scope]`` per user (no-op if unset)."""
+
+    async def _route_rate_limit(user: UserContext = Depends(get_current_user)):
+        limit = ROUTE_RATE_LIMITS.get(scope)
+        if limit is not None:
+            _enforce(scope, user["uid"], limit)
+
+    return _route_rate_limit
+
+
+__all__ = ["get_current_user", "rate_limit", "route_rate_limit", "get_db", "UserContext"]
@@ -1,17 +1,57 @@
-"""Firebase initialization and helpers for TechSpace backend."""
+"""Firebase initialization and helpers for TechSpace backend.
+
+``firebase_admin`` and ``google.cloud.firestore`` (gRPC) take a few hundred milliseconds to
+import, so they are imported on first use rather than with this module. The app lifespan
+calls ``warm_up`` on the executor right after startup, so that cost, and the gRPC connection,
+are paid off the request path.
+"""
 
 from __future__ import annotations
 import os
 import json
-from functools import lru_cache
-from typing import Optional, Dict, Any
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Optional, Dict, Any, Callable, TypeVar
+
+from .cache import TTLCache
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
 
-import firebase_admin
-from firebase_admin import credentials, auth
-from google.cloud import firestore
+logger = logging.getLogger(__name__)
 
 PROJECT_ID_ENV = "FIREBASE_PROJECT_ID"
 CREDENTIALS_JSON_ENV = "FIREBASE_CREDENTIALS_JSON"
+EXECUTOR_WORKERS_ENV = "FIRESTORE_EXECUTOR_WORKERS"
+
+# Verified ID-token claims, keyed by sha256(token). An entry lives until the token's own `exp`
+# but at most VERIFIED_TOKEN_CACHE_TTL seconds, which bounds how long a revoked token or
+# disabled user keeps working on this worker (verify_id_token does not check revocation
+# either unless asked to).
+VERIFIED_TOKEN_CACHE_TTL = float(os.getenv("VERIFIED_TOKEN_CACHE_TTL_SECONDS", "300"))
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "10000"))
+# How often the lifespan task re-downloads Google's token signing certs (0 disables).
+CERT_REFRESH_SECONDS = float(os.getenv("FIREBASE_CERT_REFRESH_SECONDS", "3600"))
+# How long warm_up waits for the Firestore gRPC channel to connect.
+WARMUP_TIMEOUT = float(os.getenv("FIRESTORE_WARMUP_TIMEOUT_SECONDS", "10"))
+
+T = TypeVar("T")
+
+# The Firestore/Admin SDK clients are synchronous (gRPC + requests). Every blocking call made
+# from an async route goes through this bounded pool so one slow round-trip never stalls the
+# event loop for the other requests on the worker.
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# The first get_app()/get_db() may come from warm_up and a request at the same time.
+_init_lock = threading.RLock()
+_db: Optional["firestore.Client"] = None
+
+verified_tokens = TTLCache(VERIFIED_TOKEN_CACHE_SIZE, VERIFIED_TOKEN_CACHE_TTL)
 
 
 class FirebaseInitError(RuntimeError):
@@ -26,6 +66,14 @@ def get_app():
     1. FIREBASE_CREDENTIALS_JSON (inline JSON string path or JSON string)
     2. GOOGLE_APPLICATION_CREDENTIALS (handled implicitly)
     """
+    with _init_lock:
+        return _init_app()
+
+
+def _init_app():
+    import firebase_admin
+    from firebase_admin import credentials
+
     if firebase_admin._apps:  # type: ignore[attr-defined]
         return firebase_admin.get_app()
 
@@ -68,7 +116,11 @@ def get_app():
     return firebase_admin.initialize_app(options={"projectId": project_id})
 
 
-@lru_cache(maxsize=1)
+def db_initialized() -> bool:
+    """Whether the Firestore client exists, i.e. ``get_db()`` returns without blocking."""
+    return _db is not None
+
+
 def get_db() -> firestore.Client:
     """Return a Firestore client bound to the initialized firebase app.
 
@@ -76,16 +128,109 @@ def get_db() -> firestore.Client:
     factory function named `client` (older docs sometimes show firestore.client()).
     Using the correct constructor avoids AttributeError in newer library versions.
     """
-    app = get_app()
-    # The Client constructor accepts the app via the credentials already initialized; passing
-    # project explicitly ensures consistency in tests where only project id is set.
-    project_id = os.getenv(PROJECT_ID_ENV)
-    return firestore.Client(project=project_id)  # type: ignore[return-value]
+    global _db
+    if _db is None:
+        with _init_lock:
+            if _db is None:
+                from google.cloud import firestore
+
+                get_app()
+                # The Client constructor accepts the app via the credentials already initialized;
+                # passing project explicitly ensures consistency in tests where only project id
+                # is set.
+                project_id = os.getenv(PROJECT_ID_ENV)
+                _db = firestore.Client(project=project_id)  # type: ignore[assignment]
+    return _db
+
+
+def warm_up(timeout: float = WARMUP_TIMEOUT) -> None:
+    """Initialize the Admin SDK app and the Firestore client and connect its gRPC channel.
+
+    Blocking; run on the executor. Connecting the channel sends no RPC, so nothing is billed.
+    Raises if the channel isn't ready within ``timeout``.
+    """
+    from firebase_admin import auth  # noqa: F401 - used by token verification and /auth
+
+    get_app()
+    api = getattr(get_db(), "_firestore_api", None)  # noqa: SLF001 - the client's GAPIC layer
+    channel = getattr(getattr(api, "_transport", None), "grpc_channel", None)
+    if channel is not None:
+        import grpc
+
+        grpc.channel_ready_future(channel).result(timeout=timeout)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared executor used for blocking Firebase/Firestore calls (created lazily)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(os.getenv(EXECUTOR_WORKERS_ENV, "32"))
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, workers), thread_name_prefix="firestore"
+                )
+    return _executor
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking Firestore/Admin SDK call on the shared executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(fn, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    """Stop the shared executor; a later run_db() call transparently creates a new one."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _token_key(id_token: str) -> str:
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+
+def cached_token_claims(id_token: str) -> Optional[Dict[str, Any]]:
+    """Claims of a recently verified token, or None (cheap enough to call on the event loop)."""
+    return verified_tokens.get(_token_key(id_token))
 
 
 def verify_token(id_token: str) -> Dict[str, Any]:
+    """Verify a Firebase ID token (RSA signature, audience, expiry); results are cached."""
+    key = _token_key(id_token)
+    decoded = verified_tokens.get(key)
+    if decoded is not None:
+        return decoded
+    from firebase_admin import auth
+
     try:
         decoded = auth.verify_id_token(id_token)
-        return decoded
     except Exception as exc:  # Broad catch to convert to 401 upstream
         raise ValueError("Invalid token") from exc
+    exp = decoded.get("exp")
+    if isinstance(exp, (int, float)):
+        remaining = exp - time.time()
+        if remaining > 0:
+            verified_tokens.set(key, decoded, ttl=min(VERIFIED_TOKEN_CACHE_TTL, remaining))
+    return decoded
+
+
+def prefetch_signing_certs() -> None:
+    """Re-download the ID-token signing certs into the verifier's HTTP cache.
+
+    ``verify_id_token`` fetches the certs through a cache-control aware session and so blocks
+    whichever request first finds them stale. Refreshing them from a background task, with
+    ``no-cache`` so the fresh copy replaces the cached one, keeps that download off the
+    request path.
+    """
+    from firebase_admin import _token_gen, auth
+
+    client = auth._get_client(get_app())  # noqa: SLF001 - the verifier's own cached session
+    request = client._token_verifier.request  # noqa: SLF001
+    request(
+        url=_token_gen.ID_TOKEN_CERT_URI,
+        method="GET",
+        headers={"Cache-Control": "no-cache"},
+    )
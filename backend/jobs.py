@@ -0,0 +1,105 @@
+"""Background jobs started from the app lifespan.
+
+The hot feed is ranked here, periodically, and materialized into ``feeds/hot`` so that
+``GET /threads?sort=hot`` is served from a single document read. The search index is flushed
+and compacted here too (``maintain_search_index``). ``warm_up`` does the
+cold-start work kept out of import time (see ``backend/firebase.py``) once the app is serving.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from . import firebase
+from . import identity
+from . import repositories
+from . import search
+from .ranking import rank_hot
+from .schemas import THREAD_SUMMARY_FIELDS
+
+logger = logging.getLogger(__name__)
+
+HOT_FEED_NAME = "hot"
+HOT_FEED_REFRESH_SECONDS = float(os.getenv("HOT_FEED_REFRESH_SECONDS", "60"))
+HOT_FEED_SIZE = int(os.getenv("HOT_FEED_SIZE", "100"))
+# Only the most recently active threads can be hot; this bounds the job's reads per run.
+HOT_FEED_CANDIDATES = int(os.getenv("HOT_FEED_CANDIDATES", "300"))
+
+
+def refresh_hot_feed(
+    repos: Optional[repositories.Repositories] = None, now: Optional[float] = None
+) -> Dict[str, Any]:
+    """Rank recent threads by hot_score and store the top ones as the ``feeds/hot`` document."""
+    repos = repos or repositories.get_repositories()
+    now = now or time.time()
+    # Summary rows only (excerpt, no body): a sanitized body can reach 20 KB, so HOT_FEED_SIZE
+    # full threads would not fit Firestore's 1 MiB document limit. view=full hot pages read
+    # their window's thread documents.
+    candidates = repos.threads.list(None, HOT_FEED_CANDIDATES, None, THREAD_SUMMARY_FIELDS)
+    feed = {
+        "generated_at": now,
+        "items": [
+            {
+                **{k: data[k] for k in THREAD_SUMMARY_FIELDS if k in data},
+                "id": thread_id,
+                "hot_score": score,
+            }
+            for score, thread_id, data in rank_hot(candidates, now, HOT_FEED_SIZE)
+        ],
+    }
+    repos.threads.save_feed(HOT_FEED_NAME, feed)
+    return feed
+
+
+def maintain_search_index() -> None:
+    """Flush and compact the local search index (see ``backend/search.py``)."""
+    search.get_index().maintain()
+
+
+def _warm_firestore() -> None:
+    repositories.get_repositories()  # Firebase app + Firestore client
+    firebase.warm_up()  # + the gRPC connection
+
+
+async def warm_up(on_ready: Callable[[], None]) -> None:
+    """Import and connect what the first requests need, off the event loop, then ``on_ready()``.
+
+    Retries with backoff until Firestore is reachable; cancelled with the app.
+    """
+    await identity.aget_client()  # import httpx, open the pooled client on this loop
+    delay = 0.5
+    while True:
+        try:
+            await firebase.run_db(_warm_firestore)
+            break
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001 - e.g. Firestore unreachable: stay not ready, retry
+            logger.exception("warm-up failed; retrying in %ss", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    on_ready()
+
+
+async def run_periodically(fn: Callable[[], Any], interval: float) -> None:
+    """Run blocking ``fn`` on the Firestore executor every ``interval`` seconds until cancelled."""
+    while True:
+        try:
+            await firebase.run_db(fn)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001 - keep the loop alive; next run may succeed
+            logger.exception("background job %s failed", getattr(fn, "__name__", fn))
+        await asyncio.sleep(interval)
+
+
+__all__ = [
+    "refresh_hot_feed",
+    "maintain_search_index",
+    "run_periodically",
+    "warm_up",
+    "HOT_FEED_NAME",
+]
@@ -0,0 +1,289 @@
+"""Live comment streams: the in-process pub/sub hub behind ``GET /threads/{id}/comments/stream``.
+
+Each worker keeps one channel per thread that currently has stream subscribers. New comments
+reach a channel two ways: ``add_comment`` publishes directly (instant for writes taken by this
+worker), and one Firestore snapshot listener per channel (``CommentRepository.watch``) delivers
+comments written through other workers. Both paths are deduplicated by comment id. The listener
+is opened with a thread's first subscriber and closed with its last, so a thread with N viewers
+costs one listener instead of N clients polling ``GET /threads/{id}/comments``. New threads are
+published to the ``NEW_THREADS`` channel behind ``GET /threads/stream``.
+
+Every publish is also handed to the broadcast backend (``backend/broadcast.py``), which carries
+it, coalesced per thread, to the hubs of the other workers. Each batch they receive is queued to
+a subscriber as a single write.
+
+A comment is encoded into a Server-Sent Events frame once and the same bytes are queued to every
+subscriber. Queues are bounded (``LIVE_QUEUE_SIZE``): a client whose socket stops draining stalls
+its writer on transport backpressure, and once its queue is full it is sent ``event: resync`` and
+disconnected instead of holding memory or slowing the publisher. It should re-read the comments
+page and reconnect. A single ticker queues a comment-line heartbeat to idle subscribers every
+``LIVE_HEARTBEAT_SECONDS`` so proxies keep their connections open.
+
+All channel state is owned by the event loop; listener callbacks arrive on Firestore's threads
+and are handed over with ``call_soon_threadsafe``.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+from . import firebase
+from . import repositories
+from .broadcast import LocalBroadcast
+from .schemas import comment_out, thread_out
+
+logger = logging.getLogger(__name__)
+
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "64"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "10000"))
+# Recent comment ids per channel, enough to drop the listener's echo of a local publish.
+_SEEN_SIZE = 256
+
+RETRY = b"retry: 3000\n\n"
+HEARTBEAT = b": ping\n\n"
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+NEW_THREADS = ""  # channel of new threads; never a thread id
+
+
+class HubFull(RuntimeError):
+    """The worker already serves ``max_subscribers`` streams."""
+
+
+def encode_comment(comment_id: str, data: Dict) -> bytes:
+    """One ``event: comment`` frame; ``id`` lets clients tell where they left off."""
+    payload = comment_out(comment_id, data).model_dump_json()
+    return f"id: {comment_id}\nevent: comment\ndata: {payload}\n\n".encode()
+
+
+def encode_thread(thread_id: str, data: Dict) -> bytes:
+    payload = thread_out(thread_id, data).model_dump_json()
+    return f"id: {thread_id}\nevent: thread\ndata: {payload}\n\n".encode()
+
+
+_ENCODERS: Dict[str, Callable[[str, Dict], bytes]] = {
+    "comment": encode_comment,
+    "thread": encode_thread,
+}
+
+
+class Subscription:
+    """One client's bounded queue of encoded frames."""
+
+    __slots__ = ("thread_id", "queue", "closed")
+
+    def __init__(self, thread_id: str, size: int):
+        self.thread_id = thread_id
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(max(1, size))
+        self.closed = False
+
+    def offer(self, frame: bytes) -> bool:
+        """Queue ``frame`` without waiting; False if the client is a full queue behind."""
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def close(self, frame: bytes = RESYNC) -> None:
+        """Replace whatever is still queued with a final ``frame``; the stream ends after it."""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+
+
+class _Channel:
+    __slots__ = ("subscribers", "seen", "loop", "stop")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.subscribers: Set[Subscription] = set()
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+        self.loop = loop
+        self.stop: Optional[Callable[[], None]] = None
+
+    def first_sighting(self, comment_id: str) -> bool:
+        if comment_id in self.seen:
+            return False
+        self.seen[comment_id] = None
+        if len(self.seen) > _SEEN_SIZE:
+            self.seen.popitem(last=False)
+        return True
+
+
+class Hub:
+    def __init__(
+        self,
+        queue_size: int = LIVE_QUEUE_SIZE,
+        heartbeat: float = LIVE_HEARTBEAT_SECONDS,
+        max_subscribers: int = LIVE_MAX_SUBSCRIBERS,
+    ):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.dropped = 0  # subscribers disconnected for falling behind
+        self._channels: Dict[str, _Channel] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        self.broadcast = LocalBroadcast()
+
+    async def start_broadcast(self, broadcast) -> None:
+        """Exchange events with the other workers through ``broadcast`` (see broadcast.py)."""
+        await broadcast.start(self._on_broadcast)
+        self.broadcast = broadcast
+
+    def channel_count(self) -> int:
+        return len(self._channels)
+
+    def subscribe(self, thread_id: str) -> Subscription:
+        """Register a subscriber (call on the event loop). Raises HubFull at capacity."""
+        if self.subscribers >= self.max_subscribers:
+            raise HubFull(thread_id)
+        loop = asyncio.get_running_loop()
+        channel = self._channels.get(thread_id)
+        if channel is None:
+            channel = self._channels[thread_id] = _Channel(loop)
+            if thread_id != NEW_THREADS:
+                # Comments newer than now that land before the listener is up are still in its
+                # first snapshot, so subscribing never waits for the listener.
+                loop.run_in_executor(
+                    firebase.get_executor(), self._start_listener, thread_id, channel, time.time()
+                )
+        sub = Subscription(thread_id, self.queue_size)
+        channel.subscribers.add(sub)
+        self.subscribers += 1
+        if self._ticker is None and self.heartbeat > 0:
+            self._ticker = loop.create_task(self._beat())
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> Optional[Future]:
+        """Remove ``sub`` (idempotent). The last subscriber of a thread closes its listener;
+        the returned future (if any) completes once it is closed."""
+        channel = self._channels.get(sub.thread_id)
+        if channel is None or sub not in channel.subscribers:
+            return None
+        channel.subscribers.discard(sub)
+        self.subscribers -= 1
+        if not self.subscribers and self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        if channel.subscribers:
+            return None
+        del self._channels[sub.thread_id]
+        return firebase.get_executor().submit(channel.stop) if channel.stop else None
+
+    def publish(self, thread_id: str, comment_id: str, data: Dict) -> int:
+        """Fan a new comment out to the thread's subscribers, here and (through the broadcast)
+        on the other workers; returns how many local subscribers got it."""
+        self.broadcast.publish("comment", thread_id, comment_id, data)
+        return self.deliver(thread_id, [(comment_id, data)], encode_comment)
+
+    def publish_thread(self, thread_id: str, data: Dict) -> int:
+        """Fan a new thread out to the ``NEW_THREADS`` subscribers, like ``publish``."""
+        self.broadcast.publish("thread", NEW_THREADS, thread_id, data)
+        return self.deliver(NEW_THREADS, [(thread_id, data)], encode_thread)
+
+    def deliver(
+        self, key: str, items: List[repositories.Doc], encode: Callable[[str, Dict], bytes]
+    ) -> int:
+        """Queue the unseen ``(id, data)`` items of a batch to every subscriber of channel
+        ``key`` as one write; returns how many subscribers got it."""
+        channel = self._channels.get(key)
+        if channel is None:
+            return 0
+        frames = [encode(i, data) for i, data in items if channel.first_sighting(i)]
+        return self._fan_out(channel, b"".join(frames)) if frames else 0
+
+    async def close_all(self) -> None:
+        """End every stream, close the listeners and leave the broadcast (at shutdown)."""
+        stopping = []
+        for channel in list(self._channels.values()):
+            for sub in list(channel.subscribers):
+                sub.close()
+                stopping.append(self.unsubscribe(sub))
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in stopping if f is not None))
+        broadcast, self.broadcast = self.broadcast, LocalBroadcast()
+        await broadcast.close()
+
+    async def events(self, sub: Subscription) -> AsyncIterator[bytes]:
+        """The frames of one stream, ending after the subscription is closed. Unsubscribes
+        when it finishes or is cancelled by a client disconnect."""
+        try:
+            yield RETRY
+            while True:
+                frame = await sub.queue.get()
+                yield frame
+                if sub.closed and sub.queue.empty():
+                    return
+        finally:
+            self.unsubscribe(sub)
+
+    def _fan_out(self, channel: _Channel, frame: bytes) -> int:
+        delivered = 0
+        for sub in list(channel.subscribers):
+            if sub.offer(frame):
+                delivered += 1
+            else:
+                self.dropped += 1
+                sub.close()
+                self.unsubscribe(sub)
+        return delivered
+
+    def _start_listener(self, thread_id: str, channel: _Channel, since: float) -> None:
+        def on_comments(docs: List[repositories.Doc]) -> None:
+            try:
+                channel.loop.call_soon_threadsafe(self._deliver, thread_id, channel, docs)
+            except RuntimeError:  # loop closed: the channel is gone with it
+                pass
+
+        try:
+            stop = repositories.get_repositories().comments.watch(thread_id, since, on_comments)
+        except Exception:  # noqa: BLE001 - local publishes still reach this worker's clients
+            logger.exception("failed to watch comments of thread %s", thread_id)
+            return
+        try:
+            channel.loop.call_soon_threadsafe(self._attach_listener, thread_id, channel, stop)
+        except RuntimeError:
+            stop()
+
+    def _attach_listener(self, thread_id: str, channel: _Channel, stop: Callable) -> None:
+        if self._channels.get(thread_id) is channel:
+            channel.stop = stop
+        else:  # every subscriber left while the listener was starting
+            firebase.get_executor().submit(stop)
+
+    def _deliver(self, thread_id: str, channel: _Channel, docs: List[repositories.Doc]) -> None:
+        if self._channels.get(thread_id) is channel:
+            self.deliver(thread_id, docs, encode_comment)
+
+    def _on_broadcast(self, kind: str, key: str, items: List[List]) -> None:
+        self.deliver(key, items, _ENCODERS[kind])
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for channel in list(self._channels.values()):
+                for sub in channel.subscribers:
+                    if sub.queue.empty():  # anything already queued keeps the connection busy
+                        sub.offer(HEARTBEAT)
+
+
+hub = Hub()
+
+__all__ = [
+    "Hub",
+    "HubFull",
+    "Subscription",
+    "hub",
+    "encode_comment",
+    "encode_thread",
+    "NEW_THREADS",
+]
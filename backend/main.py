@@ -1,17 +1,31 @@
 """FastAPI application factory for TechSpace backend."""
 
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 import os
 from pathlib import Path
 
+from . import broadcast
+from . import firebase
+from . import identity
+from . import jobs
+from . import live
+from . import search
+from . import spa
+from .compression import CompressionMiddleware
+from .responses import FastJSONResponse
 from .routes.profiles import router as profiles_router
 from .routes.threads import router as threads_router
 from .routes.comments import router as comments_router
 from .routes.moderation import router as moderation_router
+from .routes.tags import router as tags_router
+from .routes.search import router as search_router
 from .routes.auth import router as auth_router
 
 # Load default .env (current working dir). If required keys absent, also try backend/.env path.
@@ -21,15 +35,69 @@ if not os.getenv("FIREBASE_PROJECT_ID"):
     if backend_env.exists():
         load_dotenv(dotenv_path=backend_env, override=False)
 
+# Unset means same-origin only (frontend served by this app, see README "CORS").
 ALLOWED_ORIGINS = [
     o.strip()
-    for o in os.getenv("ALLOWED_ORIGINS").split(",")
+    for o in os.getenv("ALLOWED_ORIGINS", "").split(",")
     if o.strip()
 ]
 
 
+def _set_ready(app: FastAPI, ready: bool) -> None:
+    app.state.ready = ready
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background: list[asyncio.Task] = []
+    if jobs.HOT_FEED_REFRESH_SECONDS > 0:
+        background.append(
+            asyncio.create_task(
+                jobs.run_periodically(jobs.refresh_hot_feed, jobs.HOT_FEED_REFRESH_SECONDS)
+            )
+        )
+    if search.SEARCH_MAINTENANCE_SECONDS > 0:
+        # Segment flushes and merges of the search index, kept off the write path.
+        background.append(
+            asyncio.create_task(
+                jobs.run_periodically(
+                    jobs.maintain_search_index, search.SEARCH_MAINTENANCE_SECONDS
+                )
+            )
+        )
+    if firebase.CERT_REFRESH_SECONDS > 0 and os.getenv("TEST_BYPASS_AUTH") != "1":
+        # Warm, then keep refreshing, the token signing certs so no request waits on them.
+        background.append(
+            asyncio.create_task(
+                jobs.run_periodically(
+                    firebase.prefetch_signing_certs, firebase.CERT_REFRESH_SECONDS
+                )
+            )
+        )
+    # Firebase/Firestore/httpx are imported and connected after startup (/readyz flips when
+    # done), so the worker answers /healthz as soon as the app module is imported.
+    background.append(asyncio.create_task(jobs.warm_up(lambda: _set_ready(app, True))))
+    # Join the other workers' live-event broadcast (LIVE_BROADCAST_BACKEND, local by default).
+    await live.hub.start_broadcast(broadcast.make_broadcast())
+    yield
+    _set_ready(app, False)
+    for task in background:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await identity.aclose()
+    await live.hub.close_all()
+    # Release the Firestore worker threads so shutdown doesn't wait on idle executors.
+    firebase.shutdown_executor()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="TechSpace API", version="1.0.0")
+    app = FastAPI(
+        title="TechSpace API",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse,
+    )
 
     app.add_middleware(
         CORSMiddleware,
@@ -38,11 +106,23 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # gzip/br for JSON bodies >= COMPRESS_MIN_SIZE; static files come precompressed (see below).
+    app.add_middleware(CompressionMiddleware)
+
+    app.state.ready = False
 
     @app.get("/healthz")
     async def healthz():
+        """Liveness: the process serves requests (no dependency is checked)."""
         return {"status": "ok"}
 
+    @app.get("/readyz")
+    async def readyz():
+        """Readiness: warm-up finished (Firestore client connected); 503 until then."""
+        if not app.state.ready:
+            return JSONResponse(status_code=503, content={"status": "starting"})
+        return {"status": "ready"}
+
     @app.exception_handler(Exception)
     async def global_exception_handler(request: Request, exc: Exception):  # noqa: D401
         # Let HTTPException pass through unchanged (FastAPI default) so we can wrap manually in routes
@@ -61,23 +141,12 @@ def create_app() -> FastAPI:
     app.include_router(profiles_router)
     app.include_router(threads_router)
     app.include_router(comments_router)
+    app.include_router(tags_router)
+    app.include_router(search_router)
     app.include_router(moderation_router)
 
     # Optionally serve built frontend (vite build output) if it exists so frontend + backend share port.
-    dist_dir = Path(__file__).resolve().parent.parent / "frontend" / "dist"
-    index_file = dist_dir / "index.html"
-    if dist_dir.exists() and index_file.exists():
-        app.mount("/", StaticFiles(directory=dist_dir, html=True), name="frontend")
-
-        # Explicit SPA fallback (helps when using routers; StaticFiles handles most cases with html=True)
-        @app.exception_handler(404)
-        async def spa_fallback(request: Request, exc):  # type: ignore[override]
-            # If path has a dot, probably an asset -> return original 404
-            if "." in request.url.path.split("/")[-1]:
-                return JSONResponse(status_code=404, content={"error": {"code": 404, "message": "Not Found"}})
-            if index_file.exists():
-                return FileResponse(index_file)
-            return JSONResponse(status_code=404, content={"error": {"code": 404, "message": "Not Found"}})
+    spa.mount_frontend(app, Path(__file__).resolve().parent.parent / "frontend" / "dist")
     return app
 
 
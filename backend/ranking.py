@@ -0,0 +1,61 @@
+"""Ranking functions for comments and threads.
+
+Scores are precomputed, either at write time (comment score, per vote) or by a background job
+(hot feed), so every sorted listing is a single read instead of a per-request ranking pass.
+"""
+
+from __future__ import annotations
+import heapq
+import math
+from typing import Any, Dict, Iterable, List, Tuple
+
+# z for an 80% confidence interval: favours a comment with a few more upvotes than downvotes
+# over one with a single upvote, without drowning new comments.
+WILSON_Z = 1.281551565545
+
+
+def wilson_lower_bound(ups: int, downs: int, z: float = WILSON_Z) -> float:
+    """Lower bound of the Wilson score interval for the fraction of upvotes (0.0 if unvoted)."""
+    n = ups + downs
+    if n <= 0:
+        return 0.0
+    phat = ups / n
+    z2 = z * z
+    centre = phat + z2 / (2 * n)
+    spread = z * math.sqrt((phat * (1 - phat) + z2 / (4 * n)) / n)
+    return (centre - spread) / (1 + z2 / n)
+
+
+# Hot feed: comments per (age + offset)^gravity, the Hacker News shape. Higher gravity makes old
+# threads sink faster; the 2h offset keeps brand-new threads from dominating on one comment.
+HOT_GRAVITY = 1.5
+HOT_AGE_OFFSET_HOURS = 2.0
+
+
+def hot_score(
+    comment_count: int, created_at: float, now: float, gravity: float = HOT_GRAVITY
+) -> float:
+    """Time-decayed comment velocity of a thread (higher is hotter)."""
+    age_hours = max(0.0, now - created_at) / 3600.0
+    return (comment_count + 1) / (age_hours + HOT_AGE_OFFSET_HOURS) ** gravity
+
+
+def rank_hot(
+    threads: Iterable[Tuple[str, Dict[str, Any]]], now: float, limit: int
+) -> List[Tuple[float, str, Dict[str, Any]]]:
+    """Top ``limit`` threads by hot_score as ``(score, id, data)``, hottest first."""
+    scored = (
+        (hot_score(int(d.get("comment_count", 0)), d.get("created_at") or now, now), tid, d)
+        for tid, d in threads
+    )
+    return heapq.nlargest(limit, scored, key=lambda item: (item[0], item[1]))
+
+
+def apply_vote(ups: int, downs: int, old: int, new: int) -> tuple[int, int]:
+    """Tallies after a user's vote changes from ``old`` to ``new`` (each -1, 0 or 1)."""
+    ups += (new == 1) - (old == 1)
+    downs += (new == -1) - (old == -1)
+    return max(0, ups), max(0, downs)
+
+
+__all__ = ["wilson_lower_bound", "apply_vote", "hot_score", "rank_hot"]
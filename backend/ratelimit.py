@@ -0,0 +1,337 @@
+"""Token-bucket rate limiting with bounded memory and O(1) amortized expiry.
+
+Backends (``RATE_LIMIT_BACKEND``):
+
+``memory``
+    ``TokenBucketLimiter``: buckets live in an ``OrderedDict`` ordered by last use; every hit
+    moves its key to the end, so idle buckets collect at the front and are popped from there.
+    A bucket idle for a whole ``period`` has refilled completely, so forgetting it is lossless;
+    only when more than ``maxsize`` keys are active within one period is the least recently
+    used bucket evicted early (that user gets a fresh, full bucket, i.e. the limiter errs on
+    the lenient side). State is per process.
+``shared``
+    ``SharedMemoryLimiter``: the same buckets in a fixed-size, memory-mapped file shared by all
+    workers on the host, so ``uvicorn --workers N`` enforces one global limit per user. The
+    table is set-associative (``WAYS`` slots per group); one request is one locked
+    read-modify-write of its group. Wrapped in ``LeasedLimiter``, which takes small batches of
+    tokens from the shared table and spends them locally, so most requests never leave the
+    process.
+
+All backends implement ``take(key, limit, want, refund)`` and ``try_acquire(key, limit)``.
+"""
+
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_SHARED_PATH = os.getenv("RATE_LIMIT_SHARED_PATH") or os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    "techspace-ratelimit.bin",
+)
+# Tokens a worker may take from the shared table at once (capped at a tenth of the limit).
+RATE_LIMIT_LEASE = int(os.getenv("RATE_LIMIT_LEASE", "4"))
+RATE_LIMIT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "1"))
+
+
+def _refill(tokens: float, last: float, now: float, limit: int, period: float) -> float:
+    return min(float(limit), tokens + max(0.0, now - last) * limit / period)
+
+
+def _spend(tokens: float, limit: int, want: int, period: float) -> Tuple[float, int, float]:
+    """Take up to ``want`` whole tokens; returns ``(tokens left, granted, retry_after)``."""
+    granted = min(want, int(tokens))
+    tokens -= granted
+    retry_after = 0.0 if granted else (1.0 - tokens) * period / limit
+    return tokens, granted, retry_after
+
+
+class TokenBucketLimiter:
+    """``limit`` requests per ``period`` seconds per key, refilled continuously."""
+
+    def __init__(
+        self,
+        maxsize: int = RATE_LIMIT_MAX_KEYS,
+        period: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = max(1, maxsize)
+        self.period = period
+        self._clock = clock
+        # key -> (tokens left, last refill time)
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evictions = 0
+
+    def take(
+        self, key: Hashable, limit: int, want: int = 1, refund: float = 0.0
+    ) -> Tuple[int, float]:
+        """Return ``refund`` unused tokens, then take up to ``want``: ``(granted, retry_after)``."""
+        if limit <= 0:
+            return 0, self.period
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            entry = self._buckets.pop(key, None)
+            if entry is None:
+                tokens = float(limit)
+            else:
+                tokens = _refill(entry[0], entry[1], now, limit, self.period)
+            tokens = min(float(limit), tokens + refund)
+            tokens, granted, retry_after = _spend(tokens, limit, want, self.period)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            return granted, retry_after
+
+    def try_acquire(self, key: Hashable, limit: int) -> float:
+        """Take one token for ``key``; returns 0.0 if allowed, else seconds until one is free."""
+        granted, retry_after = self.take(key, limit)
+        return 0.0 if granted else retry_after
+
+    def _expire(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key = next(iter(buckets))
+            if now - buckets[key][1] < self.period:
+                break
+            del buckets[key]
+            self.expired += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self.expired = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._buckets), "expired": self.expired, "evictions": self.evictions}
+
+
+def _key_hash(key: Hashable) -> int:
+    """Stable across processes (unlike ``hash``); never 0, which marks an empty slot."""
+    raw = "\x1f".join(map(str, key)) if isinstance(key, tuple) else str(key)
+    digest = hashlib.blake2b(raw.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+class SharedMemoryLimiter:
+    """Token buckets in a memory-mapped file shared by every worker process on the host.
+
+    Slots are ``(key hash, tokens, last refill)``; a key hashes to one group of ``WAYS`` slots
+    and only that group is locked (``fcntl`` byte-range lock across processes, plus a thread
+    lock within one), so each request is a single atomic read-modify-write and unrelated users
+    do not contend. A new key takes an empty or fully refilled slot, else the group's least
+    recently used one. Uses wall-clock time, which all workers agree on.
+    """
+
+    WAYS = 8
+    SLOT = struct.Struct("<Qdd")
+
+    def __init__(
+        self,
+        path: str = RATE_LIMIT_SHARED_PATH,
+        slots: int = RATE_LIMIT_MAX_KEYS,
+        period: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        import fcntl  # POSIX only; the memory backend works everywhere
+
+        self._fcntl = fcntl
+        self.path = path
+        self.period = period
+        self._clock = clock
+        self.groups = max(1, -(-slots // self.WAYS))
+        self._group_size = self.WAYS * self.SLOT.size
+        size = self.groups * self._group_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size != size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def take(
+        self, key: Hashable, limit: int, want: int = 1, refund: float = 0.0
+    ) -> Tuple[int, float]:
+        """Return ``refund`` unused tokens, then take up to ``want``: ``(granted, retry_after)``."""
+        if limit <= 0:
+            return 0, self.period
+        h = _key_hash(key)
+        base = (h % self.groups) * self._group_size
+        slot, buf = self.SLOT, self._map
+        with self._lock:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, self._group_size, base)
+            try:
+                now = self._clock()
+                offset, tokens, last = self._find(h, base, now)
+                if offset < 0:
+                    offset, tokens = -offset - 1, float(limit)
+                else:
+                    tokens = _refill(tokens, last, now, limit, self.period)
+                tokens = min(float(limit), tokens + refund)
+                tokens, granted, retry_after = _spend(tokens, limit, want, self.period)
+                slot.pack_into(buf, offset, h, tokens, now)
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, self._group_size, base)
+        return granted, retry_after
+
+    def _find(self, h: int, base: int, now: float) -> Tuple[int, float, float]:
+        """``(offset, tokens, last)`` of ``h``'s slot, or ``(-offset - 1, 0, 0)`` of a free one."""
+        slot, buf = self.SLOT, self._map
+        victim, victim_last = base, float("inf")
+        for offset in range(base, base + self._group_size, slot.size):
+            key_hash, tokens, last = slot.unpack_from(buf, offset)
+            if key_hash == h:
+                return offset, tokens, last
+            if key_hash == 0 or now - last >= self.period:
+                victim, victim_last = offset, float("-inf")
+            elif last < victim_last:
+                victim, victim_last = offset, last
+        if victim_last != float("-inf"):
+            self.evictions += 1
+        return -victim - 1, 0.0, 0.0
+
+    def try_acquire(self, key: Hashable, limit: int) -> float:
+        granted, retry_after = self.take(key, limit)
+        return 0.0 if granted else retry_after
+
+    def reset(self) -> None:
+        with self._lock:
+            self._map[:] = bytes(len(self._map))
+            self.evictions = 0
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def stats(self) -> Dict[str, int]:
+        return {"slots": self.groups * self.WAYS, "evictions": self.evictions}
+
+
+class LeasedLimiter:
+    """Batch local pre-counting in front of a shared backend.
+
+    A worker takes up to ``lease`` tokens per key in one backend operation and spends them
+    locally for at most ``lease_ttl`` seconds; leftovers are handed back with the key's next
+    backend operation (or when the lease is swept), so the global limit is never exceeded and
+    tokens are parked at most ``lease - 1`` per worker. The lease is capped at a tenth of the
+    limit, so small limits still go to the backend on every request. A refusal is remembered
+    the same way (until the retry time, at most ``lease_ttl``), so a client hammering past its
+    limit costs the shared table one operation per ``lease_ttl``, not one per request.
+    """
+
+    def __init__(
+        self,
+        backend,
+        lease: int = RATE_LIMIT_LEASE,
+        lease_ttl: float = RATE_LIMIT_LEASE_SECONDS,
+        maxsize: int = RATE_LIMIT_MAX_KEYS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.backend = backend
+        self.lease = max(1, lease)
+        self.lease_ttl = lease_ttl
+        self.maxsize = max(1, maxsize)
+        self._clock = clock
+        # key -> (tokens left or -1 if refused, lease expiry, limit); ordered by lease start
+        self._leases: "OrderedDict[Hashable, Tuple[int, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.backend_calls = 0
+
+    def try_acquire(self, key: Hashable, limit: int) -> float:
+        with self._lock:
+            now = self._clock()
+            self._sweep(now)
+            entry = self._leases.get(key)
+            if entry is not None and entry[1] > now and entry[2] == limit:
+                if entry[0] > 0:
+                    self._leases[key] = (entry[0] - 1, entry[1], limit)  # keeps its position
+                    self.local_hits += 1
+                    return 0.0
+                if entry[0] < 0:  # recently refused: refuse again without a backend call
+                    self.local_hits += 1
+                    return entry[1] - now
+            if entry is not None:
+                del self._leases[key]
+        refund = max(0, entry[0]) if entry is not None else 0
+        want = max(1, min(self.lease, limit // 10))
+        self.backend_calls += 1
+        granted, retry_after = self.backend.take(key, limit, want, refund)
+        if granted == 1:
+            return 0.0
+        with self._lock:
+            if granted:
+                self._leases[key] = (granted - 1, now + self.lease_ttl, limit)
+            else:
+                self._leases[key] = (-1, now + min(retry_after, self.lease_ttl), limit)
+        return 0.0 if granted else retry_after
+
+    def _sweep(self, now: float) -> None:
+        """Hand back expired leases (oldest first) and cap the number held."""
+        leases = self._leases
+        while leases:
+            key = next(iter(leases))
+            tokens, expires, limit = leases[key]
+            if expires > now and len(leases) <= self.maxsize:
+                break
+            del leases[key]
+            if tokens > 0:
+                self.backend_calls += 1
+                self.backend.take(key, limit, 0, tokens)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._leases.clear()
+            self.local_hits = self.backend_calls = 0
+        self.backend.reset()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leases": len(self._leases),
+            "local_hits": self.local_hits,
+            "backend_calls": self.backend_calls,
+            **self.backend.stats(),
+        }
+
+
+def make_limiter(backend: str = RATE_LIMIT_BACKEND):
+    """Limiter for ``RATE_LIMIT_BACKEND`` (``memory`` or ``shared``)."""
+    if backend == "memory":
+        return TokenBucketLimiter()
+    if backend == "shared":
+        return LeasedLimiter(SharedMemoryLimiter())
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r} (expected 'memory' or 'shared')")
+
+
+def parse_route_limits(spec: str) -> Dict[str, int]:
+    """Parse ``"scope=n,scope=n"`` (as in ``RATE_LIMIT_ROUTES``) into a dict."""
+    limits: Dict[str, int] = {}
+    for part in spec.split(","):
+        scope, sep, value = part.partition("=")
+        if sep and scope.strip() and value.strip():
+            limits[scope.strip()] = int(value)
+    return limits
+
+
+__all__ = [
+    "TokenBucketLimiter",
+    "SharedMemoryLimiter",
+    "LeasedLimiter",
+    "make_limiter",
+    "parse_route_limits",
+    "RATE_LIMIT_MAX_KEYS",
+]
@@ -0,0 +1,87 @@
+"""Server-side markdown rendering, done once at write time.
+
+``create_thread`` / ``add_comment`` store ``body_html`` (and the ``render_version`` that produced
+it) next to the sanitized ``body``, so reads serve ready HTML with no per-view cost.
+``body_html`` is a pure function of the stored ``body``: the sanitized text is unescaped,
+rendered with markdown-it (CommonMark + strikethrough, single newlines as ``<br>``) and the
+resulting HTML sanitized again with a slightly wider allow-list (headings, ``hr``, ``del``).
+Re-running it over stored documents therefore reproduces exactly what a fresh write would
+store; ``backend/tools/rerender_bodies.py`` does that whenever ``RENDER_VERSION`` changes.
+
+Threads also store an ``excerpt``: the first ``EXCERPT_CHARS`` characters of the rendered text
+(tags stripped, whitespace collapsed, cut at a word boundary), which feed views serve in place
+of the body (``GET /threads?view=summary``).
+"""
+
+from __future__ import annotations
+import hashlib
+import html
+import re
+
+import markdown_it
+from markdown_it import MarkdownIt
+
+from .sanitize import ALLOWED_ATTRS, ALLOWED_TAGS, Sanitizer, backend_name
+
+# Bump when rendering changes in a way the fingerprint below can't see.
+RENDERER_REVISION = 1
+
+RENDER_OPTIONS = {"html": True, "breaks": True, "linkify": False, "typographer": False}
+EXCERPT_CHARS = 200
+RENDER_TAGS = ALLOWED_TAGS + ["h1", "h2", "h3", "h4", "h5", "h6", "hr", "del"]
+
+_md = MarkdownIt("commonmark", RENDER_OPTIONS).enable("strikethrough")
+_sanitizer = Sanitizer(tags=RENDER_TAGS, attributes=ALLOWED_ATTRS)
+_tag = re.compile(r"<[^>]*>")
+
+# Fingerprint of everything that shapes body_html; stored per document as render_version.
+RENDER_VERSION = hashlib.blake2b(
+    repr(
+        (
+            RENDERER_REVISION,
+            markdown_it.__version__,
+            sorted(RENDER_OPTIONS.items()),
+            RENDER_TAGS,
+            sorted(ALLOWED_ATTRS.items()),
+            backend_name(),
+        )
+    ).encode("utf-8"),
+    digest_size=6,
+).hexdigest()
+
+
+def render_body(body: str) -> str:
+    """HTML for a stored (already sanitized) body."""
+    return _sanitizer(_md.render(html.unescape(body)))
+
+
+def rendered_fields(body: str) -> dict:
+    """The fields a write stores next to ``body``."""
+    return {"body_html": render_body(body), "render_version": RENDER_VERSION}
+
+
+def excerpt(body_html: str, limit: int = EXCERPT_CHARS) -> str:
+    """Plain-text start of a rendered body, escaped like every stored text field."""
+    text = " ".join(html.unescape(_tag.sub(" ", body_html)).split())
+    if len(text) > limit:
+        cut = text[:limit]
+        space = cut.rfind(" ")
+        text = (cut[:space] if space > limit // 2 else cut).rstrip(" ,.;:") + "\u2026"
+    return html.escape(text, quote=False)
+
+
+def thread_rendered_fields(body: str) -> dict:
+    """The fields a thread write stores next to ``body``: ``rendered_fields`` + ``excerpt``."""
+    fields = rendered_fields(body)
+    fields["excerpt"] = excerpt(fields["body_html"])
+    return fields
+
+
+__all__ = [
+    "render_body",
+    "rendered_fields",
+    "excerpt",
+    "thread_rendered_fields",
+    "EXCERPT_CHARS",
+    "RENDER_VERSION",
+]
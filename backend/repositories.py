@@ -0,0 +1,1158 @@
+"""Data-access layer: thread, comment and user repositories.
+
+Routes talk to these repositories instead of the Firestore client so that every request performs
+one well-defined set of round-trips. Each repository comes in two flavours:
+
+- ``Firestore*Repository``: production implementation on top of ``google.cloud.firestore``.
+- ``InMemory*Repository``: a faithful dict-backed implementation (same ordering, cursor and
+  conflict semantics) used by tests and benchmarks.
+
+Both record the document reads and writes of every operation in a shared ``OpStats``.
+
+A thread's ``comment_count`` is kept in a sharded counter (see ``counters.py``): the value stored
+on the thread document is only a base (legacy threads), and reads add the shard totals.
+
+Usernames are unique case-insensitively through reservation documents,
+``usernames/{username_lower} = {uid, username}``, claimed in the same transaction that creates
+the profile; checking availability is a point read. ``backend/tools/backfill_usernames.py``
+creates reservations for profiles that predate them.
+
+Tag feeds are served from a denormalized index: every thread is copied to
+``tags/{tag}/threads/{thread_id}`` for each of its tags (written in the same batch as the thread,
+and touched along with it on comment activity), so ``GET /threads?tag=x`` is a plain ordered
+query over one small collection instead of an ``array_contains`` scan of ``threads`` behind a
+composite index. ``tags/{tag}`` holds ``{tag, thread_count}``, the precomputed aggregate behind
+``GET /tags``. ``backend/tools/backfill_tag_index.py`` indexes threads that predate it.
+"""
+
+from __future__ import annotations
+import copy
+import itertools
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import firebase
+from .cache import TTLCache
+from .counters import ShardedCounter, COMMENT_COUNTER_SHARDS
+from .ranking import apply_vote, wilson_lower_bound
+
+Doc = Tuple[str, Dict[str, Any]]  # (document id, document data)
+CommentKey = Tuple[str, str]  # (thread id, comment id)
+CommentDoc = Tuple[str, str, Dict[str, Any]]  # (thread id, comment id, comment data)
+OnComments = Callable[[List[Doc]], None]  # receives newly added (comment id, data) pairs
+
+COMMENT_SHARDS_COLLECTION = "comment_count_shards"
+USERNAMES_COLLECTION = "usernames"
+TAGS_COLLECTION = "tags"
+# Firestore caps a batched write at 500 operations.
+MAX_BATCH_WRITES = 500
+# A thread write fans out to at most 5 tag index entries (ThreadCreate caps tags at 5).
+THREAD_WRITE_FANOUT = 6
+# add_comment bumps the parent thread's last_activity at most this often per thread (per
+# process), keeping busy threads well under Firestore's per-document write rate.
+THREAD_TOUCH_INTERVAL = float(os.getenv("THREAD_TOUCH_INTERVAL_SECONDS", "1"))
+
+
+class NotFound(LookupError):
+    """The addressed document (usually the parent thread) does not exist."""
+
+
+class Conflict(RuntimeError):
+    """A create-only write found an existing document."""
+
+
+class UsernameTaken(Conflict):
+    """The username's reservation (``usernames/{username_lower}``) belongs to another user."""
+
+
+@dataclass
+class OpCount:
+    calls: int = 0
+    reads: int = 0
+    writes: int = 0
+
+
+class OpStats:
+    """Thread-safe per-operation counters of billed document reads and writes."""
+
+    def __init__(self) -> None:
+        self._ops: Dict[str, OpCount] = {}
+        self._lock = threading.Lock()
+
+    def record(self, op: str, reads: int = 0, writes: int = 0) -> None:
+        with self._lock:
+            count = self._ops.setdefault(op, OpCount())
+            count.calls += 1
+            count.reads += reads
+            count.writes += writes
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                op: {"calls": c.calls, "reads": c.reads, "writes": c.writes}
+                for op, c in self._ops.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops.clear()
+
+
+def _query_reads(docs: list) -> int:
+    # Firestore bills one read per returned document, and a minimum of one per query.
+    return max(1, len(docs))
+
+
+# ---------------------------------------------------------------------------
+# Interfaces
+# ---------------------------------------------------------------------------
+
+
+class ThreadRepository(ABC):
+    def __init__(self, stats: OpStats):
+        self.stats = stats
+
+    @abstractmethod
+    def create(self, data: Dict[str, Any]) -> str:
+        """Store a new thread, index it under each tag and bump the tag counts; returns its id.
+
+        One batched commit of 1 + 2 writes per tag.
+        """
+
+    @abstractmethod
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """Return thread data or None (1 read)."""
+
+    @abstractmethod
+    def get_many(self, thread_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Threads of ``thread_ids`` that exist, in one batched read (1 read per id)."""
+
+    @abstractmethod
+    def list(
+        self,
+        tag: Optional[str],
+        limit: int,
+        cursor: Optional[Dict[str, Any]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Doc]:
+        """Threads ordered by (last_activity, id) desc, optionally filtered by tag (1 query).
+
+        With a tag the query runs over the ``tags/{tag}/threads`` index. ``cursor`` is a
+        decoded page token ({"id", "ts"}); the page starts strictly after it. ``fields``
+        projects the returned documents onto those stored fields (a ``select()`` in Firestore:
+        the same reads, but only the projected fields cross the wire); ``last_activity`` and
+        ``title`` are always included.
+        """
+
+    @abstractmethod
+    def tag_counts(self, limit: int) -> List[Tuple[str, int]]:
+        """``(tag, thread_count)`` for the most used tags, most used first (1 query)."""
+
+    @abstractmethod
+    def index_tags(self, docs: List[Doc]) -> None:
+        """(Re)write the tag index entries of the given threads (1 write per entry)."""
+
+    @abstractmethod
+    def set_tag_counts(self, counts: Dict[str, int]) -> None:
+        """Overwrite ``thread_count`` of the given tags (1 write each)."""
+
+    @abstractmethod
+    def get_feed(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the materialized feed document ``feeds/{name}`` or None (1 read)."""
+
+    @abstractmethod
+    def save_feed(self, name: str, feed: Dict[str, Any]) -> None:
+        """Replace the materialized feed document ``feeds/{name}`` (1 write)."""
+
+    @abstractmethod
+    def scan(self, limit: int, after_id: Optional[str] = None) -> List[Doc]:
+        """Threads in id order, starting after ``after_id`` (1 query; stored data only,
+        ``comment_count`` is not overlaid). For maintenance jobs."""
+
+    @abstractmethod
+    def update_many(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Merge ``{thread_id: fields}`` into existing threads and their tag index entries.
+
+        Threads that no longer exist are skipped; missing tag entries are created bare, like the
+        merge writes of ``CommentRepository.add``. Batched commits of 1 write per thread + 1 per
+        tag; the Firestore implementation first reads the threads (1 read each) to find their
+        tags.
+        """
+
+
+class CommentRepository(ABC):
+    def __init__(self, stats: OpStats):
+        self.stats = stats
+
+    @abstractmethod
+    def add(self, thread_id: str, data: Dict[str, Any]) -> Doc:
+        """Store a comment, increment the thread's comment counter and touch last_activity.
+
+        Returns ``(comment_id, thread_data)``. 1 read + one batched commit of 2-3 writes
+        (comment, counter shard, throttled thread touch). Raises NotFound if the thread
+        does not exist.
+        """
+
+    @abstractmethod
+    def list(
+        self,
+        thread_id: str,
+        sort: str,
+        limit: int,
+        cursor: Optional[Dict[str, Any]] = None,
+        verify_thread: bool = True,
+    ) -> List[Doc]:
+        """Comments of a thread ordered for ``sort`` (new|top).
+
+        1 read (thread existence) + 1 query. Raises NotFound if the thread does not exist.
+        Callers that already hold the thread pass ``verify_thread=False`` to skip the read.
+        """
+
+    @abstractmethod
+    def vote(self, thread_id: str, comment_id: str, uid: str, value: int) -> Dict[str, Any]:
+        """Record ``uid``'s vote (1, -1, or 0 to retract) and update the comment's stored score.
+
+        The score is maintained incrementally from the ups/downs tallies, so ``sort=top`` stays
+        a plain indexed query. Returns the updated comment; 2 reads + 2 writes (no writes when
+        the vote is unchanged). Raises NotFound if the comment does not exist.
+        """
+
+    @abstractmethod
+    def watch(self, thread_id: str, since: float, on_comments: OnComments) -> Callable[[], None]:
+        """Call ``on_comments`` with comments added to a thread with ``created_at > since``.
+
+        Firestore opens a snapshot listener (1 read per delivered comment) and invokes the
+        callback on its own thread. Returns a function that stops the listener.
+        """
+
+    @abstractmethod
+    def scan(self, limit: int, after: Optional[CommentKey] = None) -> List[CommentDoc]:
+        """Comments of all threads ordered by (thread id, comment id), starting after ``after``
+        (1 collection-group query). For maintenance jobs."""
+
+    @abstractmethod
+    def update_many(self, updates: Dict[CommentKey, Dict[str, Any]]) -> None:
+        """Merge ``{(thread_id, comment_id): fields}`` into existing comments in batched
+        commits (1 write each)."""
+
+
+class UserRepository(ABC):
+    def __init__(self, stats: OpStats):
+        self.stats = stats
+
+    @abstractmethod
+    def get(self, uid: str) -> Optional[Dict[str, Any]]:
+        """Return the profile or None (1 read)."""
+
+    @abstractmethod
+    def get_many(self, uids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Profiles of ``uids`` that exist, in one batched read (1 read per uid)."""
+
+    @abstractmethod
+    def username_taken(self, username_lower: str) -> bool:
+        """Whether the username is reserved (1 read)."""
+
+    @abstractmethod
+    def username_holder(self, username_lower: str) -> Optional[str]:
+        """The uid holding the username's reservation, or None (1 read)."""
+
+    @abstractmethod
+    def create(self, uid: str, data: Dict[str, Any]) -> None:
+        """Create the profile and claim its username in one transaction (2 reads, 2 writes).
+
+        Raises UsernameTaken if another user holds the reservation, Conflict if the profile
+        already exists.
+        """
+
+    @abstractmethod
+    def reserve_username(self, username_lower: str, uid: str, username: str) -> bool:
+        """Claim the reservation for ``uid`` (1 read, <= 1 write); False if held by another uid."""
+
+    @abstractmethod
+    def scan(self, limit: int, after_uid: Optional[str] = None) -> List[Doc]:
+        """Profiles in uid order, ``limit`` at a time, resuming after ``after_uid``."""
+
+    @abstractmethod
+    def update(self, uid: str, data: Dict[str, Any]) -> None:
+        """Merge ``data`` into an existing profile (1 write)."""
+
+
+@dataclass
+class Repositories:
+    threads: ThreadRepository
+    comments: CommentRepository
+    users: UserRepository
+    stats: OpStats = field(default_factory=OpStats)
+
+
+# ---------------------------------------------------------------------------
+# Firestore implementation
+# ---------------------------------------------------------------------------
+
+
+def _username_lower(profile: Dict[str, Any]) -> str:
+    return profile.get("username_lower") or (profile.get("username") or "").lower()
+
+
+def _reservation(uid: str, profile: Dict[str, Any]) -> Dict[str, Any]:
+    return {"uid": uid, "username": profile.get("username")}
+
+
+def _chunks(items: List[Any], size: int = MAX_BATCH_WRITES):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _unique_tags(data: Dict[str, Any]) -> List[str]:
+    return list(dict.fromkeys(data.get("tags") or ()))
+
+
+def _projection(fields: Sequence[str]) -> List[str]:
+    """Stored fields to select for a thread listing: the cursor and tag-entry check need
+    ``last_activity`` and ``title``."""
+    return sorted({*fields, "last_activity", "title"})
+
+
+def _with_comment_count(data: Dict[str, Any], shard_total: int) -> Dict[str, Any]:
+    data["comment_count"] = int(data.get("comment_count", 0)) + shard_total
+    return data
+
+
+class FirestoreThreadRepository(ThreadRepository):
+    def __init__(self, db, stats: OpStats, counter: ShardedCounter):
+        super().__init__(stats)
+        self._db = db
+        self._col = db.collection("threads")
+        self._tags = db.collection(TAGS_COLLECTION)
+        self._feeds = db.collection("feeds")
+        self._counter = counter
+
+    def _entry(self, tag: str, thread_id: str):
+        return self._tags.document(tag).collection("threads").document(thread_id)
+
+    def _overlay_counts(self, docs: List[Doc]) -> int:
+        totals, reads = self._counter.totals(self._col.document(tid) for tid, _ in docs)
+        for tid, data in docs:
+            _with_comment_count(data, totals[self._col.document(tid).path])
+        return reads
+
+    def create(self, data: Dict[str, Any]) -> str:
+        from google.cloud import firestore
+
+        doc_ref = self._col.document()
+        tags = _unique_tags(data)
+        batch = self._db.batch()
+        batch.set(doc_ref, data)
+        for tag in tags:
+            batch.set(self._entry(tag, doc_ref.id), data)
+            batch.set(
+                self._tags.document(tag),
+                {"tag": tag, "thread_count": firestore.Increment(1)},
+                merge=True,
+            )
+        batch.commit()
+        self.stats.record("threads.create", writes=1 + 2 * len(tags))
+        return doc_ref.id
+
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        snap = self._col.document(thread_id).get()
+        if not snap.exists:
+            self.stats.record("threads.get", reads=1)
+            return None
+        docs = [(thread_id, snap.to_dict())]
+        self.stats.record("threads.get", reads=1 + self._overlay_counts(docs))
+        return docs[0][1]
+
+    def get_many(self, thread_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not thread_ids:
+            return {}
+        snaps = self._db.get_all([self._col.document(tid) for tid in thread_ids])
+        docs = [(snap.id, snap.to_dict()) for snap in snaps if snap.exists]
+        reads = len(thread_ids) + self._overlay_counts(docs)
+        self.stats.record("threads.get_many", reads=reads)
+        return dict(docs)
+
+    def list(
+        self,
+        tag: Optional[str],
+        limit: int,
+        cursor: Optional[Dict[str, Any]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Doc]:
+        from google.cloud import firestore
+
+        # Ordering explicitly by __name__ makes the cursor a pure value tuple: start_after can take
+        # field values directly instead of a snapshot (no extra document read per page), and
+        # threads sharing a last_activity are neither skipped nor repeated.
+        source = self._tags.document(tag).collection("threads") if tag else self._col
+        query = source.order_by(
+            "last_activity", direction=firestore.Query.DESCENDING
+        ).order_by("__name__", direction=firestore.Query.DESCENDING)
+        if cursor:
+            query = query.start_after(
+                {"last_activity": cursor.get("ts"), "__name__": cursor.get("id")}
+            )
+        if fields is not None:
+            query = query.select(_projection(fields))
+        # A comment on a not-yet-backfilled thread merges last_activity into a bare tag entry;
+        # those are skipped (until backfill_tag_index writes the full copy) and the query
+        # continues past them, so a page is only short at the end of the listing.
+        docs: List[Doc] = []
+        reads = 0
+        while True:
+            want = limit - len(docs)
+            batch = [(d.id, d.to_dict()) for d in query.limit(want).stream()]
+            reads += _query_reads(batch)
+            docs.extend((tid, data) for tid, data in batch if not tag or "title" in data)
+            if len(batch) < want or len(docs) >= limit:
+                break
+            last_id, last = batch[-1]
+            query = query.start_after(
+                {"last_activity": last.get("last_activity"), "__name__": last_id}
+            )
+        reads += self._overlay_counts(docs) if docs else 0
+        self.stats.record("threads.list", reads=reads)
+        return docs
+
+    def tag_counts(self, limit: int) -> List[Tuple[str, int]]:
+        from google.cloud import firestore
+
+        query = self._tags.order_by("thread_count", direction=firestore.Query.DESCENDING)
+        docs = [(d.id, int(d.get("thread_count") or 0)) for d in query.limit(limit).stream()]
+        self.stats.record("tags.counts", reads=_query_reads(docs))
+        return docs
+
+    def index_tags(self, docs: List[Doc]) -> None:
+        entries = [(tag, tid, data) for tid, data in docs for tag in _unique_tags(data)]
+        for chunk in _chunks(entries):
+            batch = self._db.batch()
+            for tag, thread_id, data in chunk:
+                batch.set(self._entry(tag, thread_id), data)
+            batch.commit()
+        self.stats.record("tags.index", writes=len(entries))
+
+    def set_tag_counts(self, counts: Dict[str, int]) -> None:
+        for chunk in _chunks(list(counts.items())):
+            batch = self._db.batch()
+            for tag, count in chunk:
+                batch.set(self._tags.document(tag), {"tag": tag, "thread_count": count})
+            batch.commit()
+        self.stats.record("tags.set_counts", writes=len(counts))
+
+    def get_feed(self, name: str) -> Optional[Dict[str, Any]]:
+        snap = self._feeds.document(name).get()
+        self.stats.record("feeds.get", reads=1)
+        return snap.to_dict() if snap.exists else None
+
+    def save_feed(self, name: str, feed: Dict[str, Any]) -> None:
+        self._feeds.document(name).set(feed)
+        self.stats.record("feeds.save", writes=1)
+
+    def scan(self, limit: int, after_id: Optional[str] = None) -> List[Doc]:
+        query = self._col.order_by("__name__")
+        if after_id is not None:
+            query = query.start_after({"__name__": self._col.document(after_id)})
+        docs = [(d.id, d.to_dict()) for d in query.limit(limit).stream()]
+        self.stats.record("threads.scan", reads=_query_reads(docs))
+        return docs
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        reads = writes = 0
+        for chunk in _chunks(list(updates.items()), MAX_BATCH_WRITES // THREAD_WRITE_FANOUT):
+            refs = [self._col.document(thread_id) for thread_id, _ in chunk]
+            snaps = self._db.get_all(refs)
+            tags = {snap.id: _unique_tags(snap.to_dict()) for snap in snaps if snap.exists}
+            reads += len(refs)
+            batch = self._db.batch()
+            for ref, (thread_id, fields) in zip(refs, chunk):
+                if thread_id not in tags:  # deleted since it was scanned
+                    continue
+                batch.update(ref, fields)
+                # Threads written before the tag index was backfilled may lack entries, and
+                # update() on a missing document fails the whole batch.
+                for tag in tags[thread_id]:
+                    batch.set(self._entry(tag, thread_id), fields, merge=True)
+                writes += 1 + len(tags[thread_id])
+            batch.commit()
+        self.stats.record("threads.update_many", reads=reads, writes=writes)
+
+
+class FirestoreCommentRepository(CommentRepository):
+    def __init__(self, db, stats: OpStats, counter: ShardedCounter):
+        super().__init__(stats)
+        self._db = db
+        self._threads = db.collection("threads")
+        self._tags = db.collection(TAGS_COLLECTION)
+        self._counter = counter
+        self._touched = TTLCache(4096, THREAD_TOUCH_INTERVAL)
+
+    def add(self, thread_id: str, data: Dict[str, Any]) -> Doc:
+        from google.cloud import firestore
+
+        thread_ref = self._threads.document(thread_id)
+        snap = thread_ref.get()
+        if not snap.exists:
+            self.stats.record("comments.add", reads=1)
+            raise NotFound(thread_id)
+        thread = snap.to_dict()
+        now = data["created_at"]
+
+        # Blind writes in one batch instead of a read-modify-write transaction on the thread:
+        # the count goes to a counter shard, and last_activity uses a Maximum transform so
+        # out-of-order commits never move it backwards.
+        comment_ref = thread_ref.collection("comments").document()
+        batch = self._db.batch()
+        batch.set(comment_ref, data)
+        self._counter.increment(batch, thread_ref)
+        writes = 2
+        if self._touched.get(thread_id) is None:
+            self._touched.set(thread_id, now)
+            touch = {"last_activity": firestore.Maximum(now), "updated_at": firestore.Maximum(now)}
+            batch.update(thread_ref, touch)
+            # merge rather than update: a missing (not yet backfilled) entry must not fail the batch
+            for tag in _unique_tags(thread):
+                entry = self._tags.document(tag).collection("threads").document(thread_id)
+                batch.set(entry, touch, merge=True)
+            writes += 1 + len(_unique_tags(thread))
+        batch.commit()
+        self._counter.invalidate(thread_ref)
+        self.stats.record("comments.add", reads=1, writes=writes)
+        thread["last_activity"] = max(now, thread.get("last_activity") or 0)
+        return comment_ref.id, thread
+
+    def list(
+        self,
+        thread_id: str,
+        sort: str,
+        limit: int,
+        cursor: Optional[Dict[str, Any]] = None,
+        verify_thread: bool = True,
+    ) -> List[Doc]:
+        from google.cloud import firestore
+
+        thread_ref = self._threads.document(thread_id)
+        reads = 0
+        if verify_thread:
+            reads += 1
+            if not thread_ref.get().exists:
+                self.stats.record("comments.list", reads=reads)
+                raise NotFound(thread_id)
+
+        query = thread_ref.collection("comments")
+        if sort == "top":
+            query = query.order_by("score", direction=firestore.Query.DESCENDING)
+        query = query.order_by(
+            "created_at", direction=firestore.Query.DESCENDING
+        ).order_by("__name__", direction=firestore.Query.DESCENDING)
+        if cursor:
+            # start_after expects field values in order-of-order_by
+            values = {"created_at": cursor.get("ts"), "__name__": cursor.get("id")}
+            if sort == "top":
+                values = {"score": cursor.get("score", 0.0), **values}
+            query = query.start_after(values)
+        docs = [(d.id, d.to_dict()) for d in query.limit(limit).stream()]
+        self.stats.record("comments.list", reads=reads + _query_reads(docs))
+        return docs
+
+    def vote(self, thread_id: str, comment_id: str, uid: str, value: int) -> Dict[str, Any]:
+        from google.cloud import firestore
+
+        comment_ref = (
+            self._threads.document(thread_id).collection("comments").document(comment_id)
+        )
+        vote_ref = comment_ref.collection("votes").document(uid)
+
+        @firestore.transactional
+        def txn(transaction: firestore.Transaction) -> Tuple[Dict[str, Any], int]:
+            comment_snap = comment_ref.get(transaction=transaction)
+            if not comment_snap.exists:
+                raise NotFound(comment_id)
+            vote_snap = vote_ref.get(transaction=transaction)
+            comment = comment_snap.to_dict()
+            old = int(vote_snap.get("value") or 0) if vote_snap.exists else 0
+            if old == value:
+                return comment, 0
+            ups, downs = apply_vote(
+                int(comment.get("ups", 0)), int(comment.get("downs", 0)), old, value
+            )
+            changes = {"ups": ups, "downs": downs, "score": wilson_lower_bound(ups, downs)}
+            transaction.update(comment_ref, changes)
+            if value:
+                transaction.set(vote_ref, {"value": value})
+            else:
+                transaction.delete(vote_ref)
+            return comment | changes, 2
+
+        comment, writes = txn(self._db.transaction())
+        self.stats.record("comments.vote", reads=2, writes=writes)
+        return comment
+
+    def watch(self, thread_id: str, since: float, on_comments: OnComments) -> Callable[[], None]:
+        from google.cloud import firestore
+
+        query = (
+            self._threads.document(thread_id)
+            .collection("comments")
+            .where(filter=firestore.FieldFilter("created_at", ">", since))
+        )
+
+        def on_snapshot(_docs, changes, _read_time) -> None:
+            added = [
+                (c.document.id, c.document.to_dict()) for c in changes if c.type.name == "ADDED"
+            ]
+            self.stats.record("comments.watch", reads=len(added))
+            if added:
+                on_comments(added)
+
+        return query.on_snapshot(on_snapshot).unsubscribe
+
+    def _comment_ref(self, key: CommentKey):
+        thread_id, comment_id = key
+        return self._threads.document(thread_id).collection("comments").document(comment_id)
+
+    def scan(self, limit: int, after: Optional[CommentKey] = None) -> List[CommentDoc]:
+        # A collection-group query ordered by full document path visits comments grouped by
+        # thread, which is exactly (thread id, comment id) order.
+        query = self._db.collection_group("comments").order_by("__name__")
+        if after is not None:
+            query = query.start_after({"__name__": self._comment_ref(after)})
+        docs = [
+            (d.reference.parent.parent.id, d.id, d.to_dict())
+            for d in query.limit(limit).stream()
+        ]
+        self.stats.record("comments.scan", reads=_query_reads(docs))
+        return docs
+
+    def update_many(self, updates: Dict[CommentKey, Dict[str, Any]]) -> None:
+        for chunk in _chunks(list(updates.items())):
+            batch = self._db.batch()
+            for key, fields in chunk:
+                batch.update(self._comment_ref(key), fields)
+            batch.commit()
+        self.stats.record("comments.update_many", writes=len(updates))
+
+
+class FirestoreUserRepository(UserRepository):
+    def __init__(self, db, stats: OpStats):
+        super().__init__(stats)
+        self._db = db
+        self._col = db.collection("users")
+        self._usernames = db.collection(USERNAMES_COLLECTION)
+
+    def get(self, uid: str) -> Optional[Dict[str, Any]]:
+        snap = self._col.document(uid).get()
+        self.stats.record("users.get", reads=1)
+        return snap.to_dict() if snap.exists else None
+
+    def get_many(self, uids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not uids:
+            return {}
+        snaps = self._db.get_all([self._col.document(uid) for uid in uids])
+        found = {snap.id: snap.to_dict() for snap in snaps if snap.exists}
+        self.stats.record("users.get_many", reads=len(uids))
+        return found
+
+    def username_taken(self, username_lower: str) -> bool:
+        snap = self._usernames.document(username_lower).get()
+        self.stats.record("users.username_taken", reads=1)
+        return snap.exists
+
+    def username_holder(self, username_lower: str) -> Optional[str]:
+        snap = self._usernames.document(username_lower).get()
+        self.stats.record("users.username_holder", reads=1)
+        return snap.get("uid") if snap.exists else None
+
+    def create(self, uid: str, data: Dict[str, Any]) -> None:
+        from google.cloud import firestore
+
+        user_ref = self._col.document(uid)
+        username_lower = _username_lower(data)
+        name_ref = self._usernames.document(username_lower) if username_lower else None
+
+        @firestore.transactional
+        def txn(transaction: firestore.Transaction) -> None:
+            name_snap = name_ref.get(transaction=transaction) if name_ref else None
+            if user_ref.get(transaction=transaction).exists:
+                raise Conflict(uid)
+            if name_snap is not None and name_snap.exists and name_snap.get("uid") != uid:
+                raise UsernameTaken(username_lower)
+            transaction.create(user_ref, data)
+            if name_ref is not None:
+                transaction.set(name_ref, _reservation(uid, data))
+
+        try:
+            txn(self._db.transaction())
+        finally:
+            self.stats.record("users.create", reads=2 if name_ref else 1, writes=2 if name_ref else 1)
+
+    def reserve_username(self, username_lower: str, uid: str, username: str) -> bool:
+        from google.cloud import firestore
+
+        name_ref = self._usernames.document(username_lower)
+
+        @firestore.transactional
+        def txn(transaction: firestore.Transaction) -> Tuple[bool, int]:
+            snap = name_ref.get(transaction=transaction)
+            if snap.exists:
+                return snap.get("uid") == uid, 0
+            transaction.set(name_ref, _reservation(uid, {"username": username}))
+            return True, 1
+
+        claimed, writes = txn(self._db.transaction())
+        self.stats.record("users.reserve_username", reads=1, writes=writes)
+        return claimed
+
+    def scan(self, limit: int, after_uid: Optional[str] = None) -> List[Doc]:
+        query = self._col.order_by("__name__")
+        if after_uid is not None:
+            query = query.start_after({"__name__": self._col.document(after_uid)})
+        docs = [(d.id, d.to_dict()) for d in query.limit(limit).stream()]
+        self.stats.record("users.scan", reads=_query_reads(docs))
+        return docs
+
+    def update(self, uid: str, data: Dict[str, Any]) -> None:
+        from google.api_core import exceptions as gexc
+
+        try:
+            self._col.document(uid).update(data)
+        except gexc.NotFound as exc:
+            raise NotFound(uid) from exc
+        finally:
+            self.stats.record("users.update", writes=1)
+
+
+def firestore_repositories(db) -> Repositories:
+    stats = OpStats()
+    counter = ShardedCounter(db, COMMENT_SHARDS_COLLECTION)
+    return Repositories(
+        threads=FirestoreThreadRepository(db, stats, counter),
+        comments=FirestoreCommentRepository(db, stats, counter),
+        users=FirestoreUserRepository(db, stats),
+        stats=stats,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_repositories() -> Repositories:
+    """Return the process-wide repositories bound to the Firestore client."""
+    return firestore_repositories(firebase.get_db())
+
+
+async def aget_repositories() -> Repositories:
+    """``get_repositories()`` for async routes.
+
+    Until the Firestore client exists, creating it imports the SDK and may wait for the startup
+    warm-up to release ``firebase._init_lock``, so that call runs on the executor rather than
+    stalling the event loop (and ``/healthz`` with it).
+    """
+    if firebase.db_initialized():
+        return get_repositories()
+    return await firebase.run_db(get_repositories)
+
+
+# ---------------------------------------------------------------------------
+# In-memory implementation
+# ---------------------------------------------------------------------------
+
+
+class InMemoryStore:
+    """Backing dicts for the in-memory repositories.
+
+    ``threads`` and ``users`` map document id -> data, ``usernames`` username_lower ->
+    reservation; ``comments`` maps
+    thread id -> {comment id -> data}, mirroring the Firestore subcollection layout, and
+    ``comment_shards`` maps thread id -> per-shard comment counts. ``tag_threads`` maps
+    tag -> {thread id -> thread copy} and ``tag_counts`` tag -> thread count, mirroring
+    ``tags/{tag}/threads`` and ``tags/{tag}``. ``watchers`` holds the ``(since, callback)``
+    listeners registered through ``CommentRepository.watch``.
+    """
+
+    def __init__(self, num_shards: int = COMMENT_COUNTER_SHARDS) -> None:
+        self.threads: Dict[str, Dict[str, Any]] = {}
+        self.comments: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.comment_shards: Dict[str, List[int]] = {}
+        self.votes: Dict[Tuple[str, str], Dict[str, int]] = {}  # (thread, comment) -> {uid: value}
+        self.num_shards = max(1, num_shards)
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.usernames: Dict[str, Dict[str, Any]] = {}  # username_lower -> reservation
+        self.feeds: Dict[str, Dict[str, Any]] = {}
+        self.tag_threads: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.tag_counts: Dict[str, int] = {}
+        self.watchers: Dict[str, List[Tuple[float, OnComments]]] = {}  # thread id -> listeners
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}{next(self._ids)}"
+
+    def thread_with_count(
+        self, thread_id: str, data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Deep copy of a thread (or of ``data``, e.g. a tag index entry) with its shard totals
+        folded into comment_count."""
+        data = copy.deepcopy(self.threads[thread_id] if data is None else data)
+        return _with_comment_count(data, sum(self.comment_shards.get(thread_id, ())))
+
+    def tag_entries(self, thread_id: str, create: bool = False) -> List[Dict[str, Any]]:
+        """The tag index entries of a thread; ``create`` adds bare ones where missing, like the
+        merge writes of FirestoreCommentRepository.add."""
+        tags = _unique_tags(self.threads.get(thread_id, {}))
+        index = self.tag_threads
+        if create:
+            return [index.setdefault(t, {}).setdefault(thread_id, {}) for t in tags]
+        return [index[t][thread_id] for t in tags if thread_id in index.get(t, {})]
+
+
+def _desc_after(docs: List[Doc], key, after: Optional[tuple]) -> List[Doc]:
+    """Sort docs descending by ``key`` (document id breaks ties, like Firestore's implicit
+    ``__name__`` ordering) and keep those strictly after the ``after`` cursor tuple."""
+    ordered = sorted(docs, key=lambda d: (*key(d[1]), d[0]), reverse=True)
+    if after is None:
+        return ordered
+    width = len(after)
+    return [d for d in ordered if (*key(d[1]), d[0])[:width] < after]
+
+
+class InMemoryThreadRepository(ThreadRepository):
+    def __init__(self, store: InMemoryStore, stats: OpStats):
+        super().__init__(stats)
+        self._store = store
+
+    def create(self, data: Dict[str, Any]) -> str:
+        tags = _unique_tags(data)
+        with self._store.lock:
+            thread_id = self._store.new_id("t")
+            self._store.threads[thread_id] = copy.deepcopy(data)
+            for tag in tags:
+                self._store.tag_threads.setdefault(tag, {})[thread_id] = copy.deepcopy(data)
+                self._store.tag_counts[tag] = self._store.tag_counts.get(tag, 0) + 1
+        self.stats.record("threads.create", writes=1 + 2 * len(tags))
+        return thread_id
+
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._store.lock:
+            if thread_id not in self._store.threads:
+                self.stats.record("threads.get", reads=1)
+                return None
+            data = self._store.thread_with_count(thread_id)
+        self.stats.record("threads.get", reads=1 + self._store.num_shards)
+        return data
+
+    def get_many(self, thread_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not thread_ids:
+            return {}
+        with self._store.lock:
+            threads = self._store.threads
+            found = {
+                tid: self._store.thread_with_count(tid) for tid in thread_ids if tid in threads
+            }
+        self.stats.record(
+            "threads.get_many", reads=len(thread_ids) + len(found) * self._store.num_shards
+        )
+        return found
+
+    def list(
+        self,
+        tag: Optional[str],
+        limit: int,
+        cursor: Optional[Dict[str, Any]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Doc]:
+        with self._store.lock:
+            source = self._store.tag_threads.get(tag, {}) if tag else self._store.threads
+            docs = [(tid, self._store.thread_with_count(tid, d)) for tid, d in source.items()]
+        if fields is not None:
+            keep = set(_projection(fields)) | {"comment_count"}  # overlaid like the shard totals
+            docs = [(tid, {k: v for k, v in d.items() if k in keep}) for tid, d in docs]
+        after = (cursor.get("ts"), cursor.get("id")) if cursor else None
+        page: List[Doc] = []
+        scanned = 0
+        for tid, d in _desc_after(docs, lambda d: (d.get("last_activity", 0),), after):
+            if len(page) == limit:
+                break
+            scanned += 1
+            if not tag or "title" in d:  # bare tag entries are read and skipped, like Firestore
+                page.append((tid, d))
+        docs = page
+        reads = max(1, scanned) + len(docs) * self._store.num_shards
+        self.stats.record("threads.list", reads=reads)
+        return docs
+
+    def get_feed(self, name: str) -> Optional[Dict[str, Any]]:
+        self.stats.record("feeds.get", reads=1)
+        with self._store.lock:
+            feed = self._store.feeds.get(name)
+            return copy.deepcopy(feed) if feed is not None else None
+
+    def save_feed(self, name: str, feed: Dict[str, Any]) -> None:
+        self.stats.record("feeds.save", writes=1)
+        with self._store.lock:
+            self._store.feeds[name] = copy.deepcopy(feed)
+
+    def tag_counts(self, limit: int) -> List[Tuple[str, int]]:
+        with self._store.lock:
+            counts = sorted(self._store.tag_counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        docs = counts[:limit]
+        self.stats.record("tags.counts", reads=_query_reads(docs))
+        return docs
+
+    def index_tags(self, docs: List[Doc]) -> None:
+        writes = 0
+        with self._store.lock:
+            for thread_id, data in docs:
+                for tag in _unique_tags(data):
+                    self._store.tag_threads.setdefault(tag, {})[thread_id] = copy.deepcopy(data)
+                    writes += 1
+        self.stats.record("tags.index", writes=writes)
+
+    def set_tag_counts(self, counts: Dict[str, int]) -> None:
+        self.stats.record("tags.set_counts", writes=len(counts))
+        with self._store.lock:
+            self._store.tag_counts.update(counts)
+
+    def scan(self, limit: int, after_id: Optional[str] = None) -> List[Doc]:
+        with self._store.lock:
+            ids = sorted(t for t in self._store.threads if after_id is None or t > after_id)
+            docs = [(t, copy.deepcopy(self._store.threads[t])) for t in ids[:limit]]
+        self.stats.record("threads.scan", reads=_query_reads(docs))
+        return docs
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        writes = 0
+        with self._store.lock:
+            for thread_id, fields in updates.items():
+                if thread_id not in self._store.threads:
+                    continue
+                docs = [
+                    self._store.threads[thread_id],
+                    *self._store.tag_entries(thread_id, create=True),
+                ]
+                for doc in docs:
+                    doc.update(copy.deepcopy(fields))
+                writes += len(docs)
+        self.stats.record("threads.update_many", reads=len(updates), writes=writes)
+
+
+class InMemoryCommentRepository(CommentRepository):
+    def __init__(self, store: InMemoryStore, stats: OpStats):
+        super().__init__(stats)
+        self._store = store
+
+    def add(self, thread_id: str, data: Dict[str, Any]) -> Doc:
+        now = data["created_at"]
+        with self._store.lock:
+            thread = self._store.threads.get(thread_id)
+            if thread is None:
+                self.stats.record("comments.add", reads=1)
+                raise NotFound(thread_id)
+            shards = self._store.comment_shards.setdefault(
+                thread_id, [0] * self._store.num_shards
+            )
+            shards[random.randrange(len(shards))] += 1
+            # No per-document write limit in memory, so the thread is touched on every comment.
+            entries = self._store.tag_entries(thread_id, create=True)
+            for doc in (thread, *entries):
+                for field_name in ("last_activity", "updated_at"):
+                    doc[field_name] = max(now, doc.get(field_name) or 0)
+            comment_id = self._store.new_id("c")
+            self._store.comments.setdefault(thread_id, {})[comment_id] = copy.deepcopy(data)
+            thread = copy.deepcopy(thread)
+            watchers = list(self._store.watchers.get(thread_id, ()))
+        self.stats.record("comments.add", reads=1, writes=3 + len(entries))
+        for since, on_comments in watchers:
+            if now > since:
+                self.stats.record("comments.watch", reads=1)
+                on_comments([(comment_id, copy.deepcopy(data))])
+        return comment_id, thread
+
+    def list(
+        self,
+        thread_id: str,
+        sort: str,
+        limit: int,
+        cursor: Optional[Dict[str, Any]] = None,
+        verify_thread: bool = True,
+    ) -> List[Doc]:
+        reads = 1 if verify_thread else 0
+        with self._store.lock:
+            if verify_thread and thread_id not in self._store.threads:
+                self.stats.record("comments.list", reads=reads)
+                raise NotFound(thread_id)
+            docs = [
+                (cid, copy.deepcopy(d))
+                for cid, d in self._store.comments.get(thread_id, {}).items()
+            ]
+        if sort == "top":
+            key = lambda d: (d.get("score", 0.0), d.get("created_at", 0))  # noqa: E731
+            after = (cursor.get("score", 0.0), cursor.get("ts"), cursor.get("id")) if cursor else None
+        else:
+            key = lambda d: (d.get("created_at", 0),)  # noqa: E731
+            after = (cursor.get("ts"), cursor.get("id")) if cursor else None
+        docs = _desc_after(docs, key, after)[:limit]
+        self.stats.record("comments.list", reads=reads + _query_reads(docs))
+        return docs
+
+    def vote(self, thread_id: str, comment_id: str, uid: str, value: int) -> Dict[str, Any]:
+        with self._store.lock:
+            comment = self._store.comments.get(thread_id, {}).get(comment_id)
+            if comment is None:
+                self.stats.record("comments.vote", reads=1)
+                raise NotFound(comment_id)
+            votes = self._store.votes.setdefault((thread_id, comment_id), {})
+            old = votes.get(uid, 0)
+            writes = 0
+            if old != value:
+                ups, downs = apply_vote(
+                    int(comment.get("ups", 0)), int(comment.get("downs", 0)), old, value
+                )
+                comment.update(
+                    {"ups": ups, "downs": downs, "score": wilson_lower_bound(ups, downs)}
+                )
+                if value:
+                    votes[uid] = value
+                else:
+                    votes.pop(uid, None)
+                writes = 2
+            comment = copy.deepcopy(comment)
+        self.stats.record("comments.vote", reads=2, writes=writes)
+        return comment
+
+    def watch(self, thread_id: str, since: float, on_comments: OnComments) -> Callable[[], None]:
+        listener = (since, on_comments)
+        with self._store.lock:
+            self._store.watchers.setdefault(thread_id, []).append(listener)
+
+        def stop() -> None:
+            with self._store.lock:
+                listeners = self._store.watchers.get(thread_id, [])
+                if listener in listeners:
+                    listeners.remove(listener)
+                if not listeners:
+                    self._store.watchers.pop(thread_id, None)
+
+        return stop
+
+    def scan(self, limit: int, after: Optional[CommentKey] = None) -> List[CommentDoc]:
+        with self._store.lock:
+            keys = sorted(
+                (tid, cid)
+                for tid, comments in self._store.comments.items()
+                for cid in comments
+                if after is None or (tid, cid) > after
+            )
+            docs = [
+                (tid, cid, copy.deepcopy(self._store.comments[tid][cid]))
+                for tid, cid in keys[:limit]
+            ]
+        self.stats.record("comments.scan", reads=_query_reads(docs))
+        return docs
+
+    def update_many(self, updates: Dict[CommentKey, Dict[str, Any]]) -> None:
+        self.stats.record("comments.update_many", writes=len(updates))
+        with self._store.lock:
+            comments = self._store.comments
+            missing = [k for k in updates if k[1] not in comments.get(k[0], {})]
+            if missing:
+                raise NotFound(missing[0][1])
+            for (thread_id, comment_id), fields in updates.items():
+                comments[thread_id][comment_id].update(copy.deepcopy(fields))
+
+
+class InMemoryUserRepository(UserRepository):
+    def __init__(self, store: InMemoryStore, stats: OpStats):
+        super().__init__(stats)
+        self._store = store
+
+    def get(self, uid: str) -> Optional[Dict[str, Any]]:
+        self.stats.record("users.get", reads=1)
+        with self._store.lock:
+            data = self._store.users.get(uid)
+            return copy.deepcopy(data) if data is not None else None
+
+    def get_many(self, uids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not uids:
+            return {}
+        self.stats.record("users.get_many", reads=len(uids))
+        with self._store.lock:
+            users = self._store.users
+            return {uid: copy.deepcopy(users[uid]) for uid in uids if uid in users}
+
+    def username_taken(self, username_lower: str) -> bool:
+        self.stats.record("users.username_taken", reads=1)
+        with self._store.lock:
+            return username_lower in self._store.usernames
+
+    def username_holder(self, username_lower: str) -> Optional[str]:
+        self.stats.record("users.username_holder", reads=1)
+        with self._store.lock:
+            holder = self._store.usernames.get(username_lower)
+            return holder["uid"] if holder is not None else None
+
+    def create(self, uid: str, data: Dict[str, Any]) -> None:
+        username_lower = _username_lower(data)
+        n = 2 if username_lower else 1
+        self.stats.record("users.create", reads=n, writes=n)
+        with self._store.lock:
+            if uid in self._store.users:
+                raise Conflict(uid)
+            holder = self._store.usernames.get(username_lower) if username_lower else None
+            if holder is not None and holder["uid"] != uid:
+                raise UsernameTaken(username_lower)
+            self._store.users[uid] = copy.deepcopy(data)
+            if username_lower:
+                self._store.usernames[username_lower] = _reservation(uid, data)
+
+    def reserve_username(self, username_lower: str, uid: str, username: str) -> bool:
+        with self._store.lock:
+            holder = self._store.usernames.get(username_lower)
+            if holder is None:
+                self._store.usernames[username_lower] = _reservation(uid, {"username": username})
+        self.stats.record("users.reserve_username", reads=1, writes=int(holder is None))
+        return holder is None or holder["uid"] == uid
+
+    def scan(self, limit: int, after_uid: Optional[str] = None) -> List[Doc]:
+        with self._store.lock:
+            uids = sorted(u for u in self._store.users if after_uid is None or u > after_uid)
+            docs = [(u, copy.deepcopy(self._store.users[u])) for u in uids[:limit]]
+        self.stats.record("users.scan", reads=_query_reads(docs))
+        return docs
+
+    def update(self, uid: str, data: Dict[str, Any]) -> None:
+        self.stats.record("users.update", writes=1)
+        with self._store.lock:
+            if uid not in self._store.users:
+                raise NotFound(uid)
+            self._store.users[uid].update(copy.deepcopy(data))
+
+
+def in_memory_repositories(store: Optional[InMemoryStore] = None) -> Repositories:
+    store = store or InMemoryStore()
+    stats = OpStats()
+    return Repositories(
+        threads=InMemoryThreadRepository(store, stats),
+        comments=InMemoryCommentRepository(store, stats),
+        users=InMemoryUserRepository(store, stats),
+        stats=stats,
+    )
+
+
+__all__ = [
+    "NotFound",
+    "Conflict",
+    "UsernameTaken",
+    "OpStats",
+    "ThreadRepository",
+    "CommentRepository",
+    "UserRepository",
+    "Repositories",
+    "get_repositories",
+    "aget_repositories",
+    "firestore_repositories",
+    "in_memory_repositories",
+    "InMemoryStore",
+]
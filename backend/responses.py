@@ -0,0 +1,49 @@
+"""JSON response classes for the read hot paths.
+
+For a route with ``response_model`` FastAPI validates the returned object against the model
+again, walks the result with ``jsonable_encoder`` and encodes it with the stdlib ``json``
+module, a large share of the CPU time of a 50-item page. ``ModelResponse`` skips all
+three: the model, validated once when it was built (``schemas.thread_out`` / ``comment_out``),
+is serialized straight to bytes by pydantic-core (``include`` trims it to a sparse fieldset on
+the way). Routes keep ``response_model`` for the OpenAPI schema.
+
+``FastJSONResponse`` is the app's default response class for everything still returned as plain
+data: ``orjson`` when installed, otherwise stdlib ``json`` exactly like ``JSONResponse``.
+"""
+
+from __future__ import annotations
+from typing import Any, Mapping, Optional, Union
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse, Response
+
+try:  # optional speedup
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ModelResponse(Response):
+    """A pydantic model serialized once by pydantic-core, bypassing response_model handling."""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        model: BaseModel,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        include: Optional[Union[set, dict]] = None,
+    ):
+        body = model.__pydantic_serializer__.to_json(model, include=include)
+        super().__init__(body, status_code, headers)
+
+
+__all__ = ["FastJSONResponse", "ModelResponse"]
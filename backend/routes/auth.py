@@ -1,14 +1,15 @@
 from __future__ import annotations
+import importlib
 import os
 import time
 from typing import Optional
 
-import httpx
 from fastapi import APIRouter, HTTPException, Depends, Response
-from firebase_admin import auth as fb_auth
 
 from .. import firebase
 from .. import deps
+from .. import identity
+from .. import repositories
 from ..schemas import (
     RegisterRequest,
     RegisterResponse,
@@ -25,9 +26,6 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 SESSION_COOKIE_MAX_AGE = int(os.getenv("SESSION_COOKIE_MAX_AGE", "3600"))
 ISSUE_SESSION_COOKIE = os.getenv("ISSUE_SESSION_COOKIE", "false").lower() in {"1", "true", "yes"}
 
-IDENTITY_BASE = "https://identitytoolkit.googleapis.com/v1"
-SECURETOKEN_BASE = "https://securetoken.googleapis.com/v1"
-
 
 def _error(status: int, msg: str, details: Optional[dict] = None):
     raise HTTPException(status_code=status, detail={"code": status, "message": msg, "details": details or {}})
@@ -37,9 +35,11 @@ async def _sign_in_with_password(email: str, password: str):
     api_key = os.getenv("FIREBASE_WEB_API_KEY")
     if not api_key:
         _error(500, "Server missing FIREBASE_WEB_API_KEY")
-    url = f"{IDENTITY_BASE}/accounts:signInWithPassword?key={api_key}"
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(url, json={"email": email, "password": password, "returnSecureToken": True})
+    url = f"{identity.IDENTITY_BASE}/accounts:signInWithPassword?key={api_key}"
+    client = await identity.aget_client()
+    r = await client.post(
+        url, json={"email": email, "password": password, "returnSecureToken": True}
+    )
     if r.status_code != 200:
         _error(401, "Invalid email or password")
     return r.json()
@@ -49,10 +49,10 @@ async def _exchange_refresh_token(refresh_token: str):
     api_key = os.getenv("FIREBASE_WEB_API_KEY")
     if not api_key:
         _error(500, "Server missing FIREBASE_WEB_API_KEY")
-    url = f"{SECURETOKEN_BASE}/token?key={api_key}"
+    url = f"{identity.SECURETOKEN_BASE}/token?key={api_key}"
     data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(url, data=data)
+    client = await identity.aget_client()
+    r = await client.post(url, data=data)
     if r.status_code != 200:
         _error(401, "Invalid refresh token")
     return r.json()
@@ -63,13 +63,12 @@ def _bundle(id_token: str, refresh_token: str, expires_in: int) -> TokenBundle:
 
 
 def _ensure_profile(uid: str, display_name: str, username: str):
-    db = firebase.get_db()
-    users_ref = db.collection("users")
-    doc_ref = users_ref.document(uid)
-    snap = doc_ref.get()
+    users = repositories.get_repositories().users
+    existing = users.get(uid)
     now = time.time()
-    if not snap.exists:
-        doc_ref.set(
+    if existing is None:
+        users.create(
+            uid,
             {
                 "display_name": display_name,
                 "username": username,
@@ -80,25 +79,27 @@ def _ensure_profile(uid: str, display_name: str, username: str):
                 "updated_at": now,
             }
         )
-    else:
+    elif "username_lower" not in existing and existing.get("username"):
         # Ensure username_lower present (migration safety)
-        data = snap.to_dict()
-        if "username_lower" not in data and data.get("username"):
-            doc_ref.update({"username_lower": data["username"].lower()})
+        users.update(uid, {"username_lower": existing["username"].lower()})
 
 
 @router.post("/register", response_model=RegisterResponse, status_code=201)
 async def register(payload: RegisterRequest):
-    # Username uniqueness (case-insensitive)
-    db = firebase.get_db()
-    users_ref = db.collection("users")
-    existing = list(users_ref.where("username_lower", "==", payload.username.lower()).limit(1).stream())
-    if existing:
+    # Imported on the executor: a first import (before firebase.warm_up) must not block the loop.
+    fb_auth = await firebase.run_db(importlib.import_module, "firebase_admin.auth")
+
+    # Username uniqueness (case-insensitive): fail fast on a reservation point read; the
+    # profile create below claims the reservation transactionally.
+    users = (await repositories.aget_repositories()).users
+    if await firebase.run_db(users.username_taken, payload.username.lower()):
         _error(409, "Username already taken")
 
     # Create user in Firebase Auth (email uniqueness enforced there)
     try:
-        user_record = fb_auth.create_user(email=payload.email, password=payload.password, display_name=payload.display_name)
+        user_record = await firebase.run_db(
+            fb_auth.create_user, email=payload.email, password=payload.password, display_name=payload.display_name
+        )
     except fb_auth.EmailAlreadyExistsError:  # type: ignore[attr-defined]
         _error(409, "Email already registered")
     except Exception:
@@ -111,7 +112,20 @@ async def register(payload: RegisterRequest):
     expires_in = int(sign_in_data.get("expiresIn", 3600))
 
     # Ensure profile stored
-    _ensure_profile(user_record.uid, payload.display_name, payload.username)
+    try:
+        await firebase.run_db(
+            _ensure_profile, user_record.uid, payload.display_name, payload.username
+        )
+    except repositories.Conflict as exc:
+        # A concurrent registration claimed the username after our check (UsernameTaken), or
+        # the profile was created concurrently; don't leave an account behind either way.
+        try:
+            await firebase.run_db(fb_auth.delete_user, user_record.uid)
+        except Exception:
+            pass
+        if isinstance(exc, repositories.UsernameTaken):
+            _error(409, "Username already taken")
+        _error(409, "Profile was modified concurrently")
 
     # Optional session cookie
     tokens_bundle = _bundle(id_token, refresh_token, expires_in)
@@ -127,6 +141,8 @@ async def register(payload: RegisterRequest):
 
 @router.post("/login", response_model=LoginResponse)
 async def login(payload: LoginRequest, response: Response):
+    fb_auth = await firebase.run_db(importlib.import_module, "firebase_admin.auth")
+
     sign_in_data = await _sign_in_with_password(payload.email, payload.password)
     id_token = sign_in_data.get("idToken")
     refresh_token = sign_in_data.get("refreshToken")
@@ -135,7 +151,9 @@ async def login(payload: LoginRequest, response: Response):
     # Optionally create session cookie
     if ISSUE_SESSION_COOKIE and id_token:
         try:
-            session_cookie = fb_auth.create_session_cookie(id_token, expires_in=SESSION_COOKIE_MAX_AGE)
+            session_cookie = await firebase.run_db(
+                fb_auth.create_session_cookie, id_token, expires_in=SESSION_COOKIE_MAX_AGE
+            )
             cookie_domain = os.getenv("COOKIE_DOMAIN")
             response.set_cookie(
                 "session",
@@ -161,7 +179,7 @@ async def refresh(payload: RefreshRequest):
     expires_in = int(data.get("expires_in") or data.get("expiresIn") or 3600)
     # Verify id token to ensure still valid (defense-in-depth)
     try:
-        firebase.verify_token(id_token)
+        await firebase.run_db(firebase.verify_token, id_token)
     except Exception:
         _error(401, "Invalid refreshed token")
     return RefreshResponse(tokens=_bundle(id_token, refresh_token, expires_in))
@@ -169,11 +187,10 @@ async def refresh(payload: RefreshRequest):
 
 @router.get("/me", response_model=AuthUserProfile)
 async def me(user=Depends(deps.get_current_user)):
-    db = firebase.get_db()
-    snap = db.collection("users").document(user["uid"]).get()
-    if not snap.exists:
+    users = (await repositories.aget_repositories()).users
+    data = await firebase.run_db(users.get, user["uid"])
+    if data is None:
         _error(404, "Profile not found")
-    data = snap.to_dict()
     return AuthUserProfile(
         uid=user["uid"],
         email=user.get("email"),  # email may not be present in decoded token without custom claims
@@ -1,31 +1,54 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, Query
-from google.cloud import firestore
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 import time
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
+from .. import cache
 from .. import deps
 from .. import firebase
+from .. import live
+from .. import repositories
+from .. import search
 from ..schemas import (
     CommentCreate,
     CommentOut,
     CommentsPage,
+    VoteIn,
+    VoteOut,
     encode_cursor,
-    decode_cursor,
     encode_comment_cursor,
     decode_comment_cursor,
+    comment_out,
     mask_author_uid,
 )
-from ..utils import sanitize_markdown
+from ..render import rendered_fields
+from ..responses import ModelResponse
+from ..utils import sanitize_markdown, weak_etag, etag_matches
+from .profiles import expand_authors
+from .threads import EVENT_STREAM_RESPONSES, event_stream, load_thread
 
 router = APIRouter(prefix="/threads/{thread_id}/comments", tags=["comments"])
 
-# The previous iteration introduced multiple layers of fallback caches to compensate for
-# ephemeral dummy DB instances. Tests in this repository create a fresh Dummy DB per test
-# client, but persistence across a single client instance is maintained because monkeypatch
-# replaces firebase.get_db with a closure that returns the same in-memory object. Therefore
-# we can drastically simplify logic: directly interact with the provided dummy object's
-# attributes when present, otherwise use Firestore-compatible calls.
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_comment_cursor(token: str, sort: str) -> Dict[str, Any]:
+    """The cursor of a comments page token (400 if malformed).
+
+    ``sort=new`` tokens carry ``{"id", "ts"}``; ``sort=top`` tokens also need the ``score``.
+    """
+    cursor = decode_comment_cursor(token)
+    if (
+        not isinstance(cursor, dict)
+        or not isinstance(cursor.get("id"), str)
+        or not _is_number(cursor.get("ts"))
+        or (sort == "top" and not _is_number(cursor.get("score")))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+    return cursor
 
 
 @router.post("", response_model=CommentOut, status_code=201)
@@ -35,170 +58,127 @@ async def add_comment(
     user: deps.UserContext = Depends(deps.get_current_user),
     _=Depends(deps.rate_limit),
 ):
-    db = firebase.get_db()
-    thread_ref = db.collection("threads").document(thread_id)
-    comment_ref = thread_ref.collection("comments").document()
     now = time.time()
-
-    def txn(transaction: firestore.Transaction):
-        # Support dummy test DBs whose get() signature lacks transaction parameter
-        try:
-            snap = thread_ref.get(transaction=transaction)  # type: ignore[arg-type]
-        except TypeError:  # pragma: no cover - fallback for test doubles
-            snap = thread_ref.get()
-        if not snap.exists:
-            raise HTTPException(status_code=404, detail="Thread not found")
-        thread_data = snap.to_dict()
-        new_count = int(thread_data.get("comment_count", 0)) + 1
-        try:
-            transaction.update(
-                thread_ref,
-                {"comment_count": new_count, "last_activity": now, "updated_at": now},
-            )
-        except Exception:  # pragma: no cover - dummy path
-            # Attempt direct structure update for test double
-            try:
-                if hasattr(db, "threads") and thread_ref.id in getattr(db, "threads", {}):  # type: ignore[attr-defined]
-                    db.threads[thread_ref.id].update({  # type: ignore[attr-defined]
-                        "comment_count": new_count,
-                        "last_activity": now,
-                        "updated_at": now,
-                    })
-            except Exception:
-                pass
-        comment_payload = {
-            "body": sanitize_markdown(payload.body.strip()),
-            "author_uid": user["uid"],
-            "author_mode": payload.author_mode,
-            "created_at": now,
-            "score": 0.0,
-        }
-        try:
-            transaction.set(comment_ref, comment_payload)
-        except Exception:  # pragma: no cover - dummy path
-            try:
-                # For Dummy DB, comments likely stored under db.comments dict keyed by id or (tid,cid)
-                if hasattr(db, "comments"):
-                    # Try thread-specific composite key first
-                    key = (getattr(thread_ref, "id", thread_id), getattr(comment_ref, "id", comment_ref))
-                    db.comments[key] = comment_payload  # type: ignore[attr-defined]
-            except Exception:
-                pass
-
-    transaction = db.transaction()
+    body = sanitize_markdown(payload.body.strip())
+    comment_payload = {
+        "body": body,
+        **rendered_fields(body),
+        "author_uid": user["uid"],
+        "author_mode": payload.author_mode,
+        "created_at": now,
+        "score": 0.0,
+        "ups": 0,
+        "downs": 0,
+    }
+    repos = await repositories.aget_repositories()
     try:
-        transaction.call(txn)
-    except HTTPException:
-        raise
+        comment_id, thread = await firebase.run_db(
+            repos.comments.add, thread_id, comment_payload
+        )
+    except repositories.NotFound:
+        raise HTTPException(status_code=404, detail="Thread not found")
     except Exception as exc:  # pragma: no cover - defensive
         raise HTTPException(status_code=500, detail="Failed to add comment") from exc
-
-    # No extra fallback store needed; dummy DB implements set operations directly.
+    # comment_count / last_activity changed: drop the cached thread and its first pages
+    cache.invalidate_thread(thread_id, thread.get("tags", []))
+    live.hub.publish(thread_id, comment_id, comment_payload)
+    await firebase.run_db(search.index_comment, thread_id, comment_id, comment_payload)
 
     return CommentOut(
-        id=comment_ref.id,
-        body=sanitize_markdown(payload.body.strip()),
+        id=comment_id,
+        body=body,
+        body_html=comment_payload["body_html"],
         author_uid=mask_author_uid(payload.author_mode, user["uid"]),
         author_mode=payload.author_mode,
         created_at=now,
         score=0.0,
     )
 
-    # unreachable return (kept for clarity); code above returns. Kept for future instrumentation.
 
-
-@router.get("", response_model=CommentsPage)
+@router.get(
+    "",
+    response_model=CommentsPage,
+    responses={304: {"description": "Not Modified (If-None-Match matched)"}},
+)
 async def list_comments(
     thread_id: str,
-    sort: str = Query("new", regex="^(new|top)$"),
+    sort: str = Query("new", pattern="^(new|top)$"),
     limit: int = Query(20, le=100),
     page_token: Optional[str] = None,
+    expand: Optional[str] = Query(None, pattern="^author$"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    db = firebase.get_db()
-    thread_ref = db.collection("threads").document(thread_id)
-    thread_snap = thread_ref.get()
-    if not thread_snap.exists:
-        raise HTTPException(status_code=404, detail="Thread not found")
-
-    # Dummy DB support: if comments stored as dict with (thread_id, comment_id) keys
-    if hasattr(db, "comments") and isinstance(getattr(db, "comments"), dict):
-        raw_comments = []
-        for key, value in db.comments.items():  # type: ignore[attr-defined]
-            if isinstance(key, tuple) and key[0] == thread_id:
-                cid = key[1]
-                raw_comments.append((cid, value))
-        # Order newest first by created_at
-        raw_comments.sort(key=lambda x: x[1].get("created_at", 0), reverse=True)
-        slice_comments = raw_comments[: limit + 1]
-        items: List[CommentOut] = []
-        for cid, data in slice_comments[:limit]:
-            items.append(
-                CommentOut(
-                    id=cid,
-                    body=data.get("body"),
-                    author_mode=data.get("author_mode"),
-                    author_uid=mask_author_uid(
-                        data.get("author_mode"), data.get("author_uid")
-                    ),
-                    created_at=data.get("created_at"),
-                    score=data.get("score", 0.0),
-                )
-            )
-        next_token = None
-        if len(slice_comments) > limit:
-            last_id, last_data = slice_comments[limit - 1]
-            next_token = encode_comment_cursor(
-                last_id, last_data.get("created_at"), sort, last_data.get("score", 0.0)
-            )
-        return CommentsPage(items=items, next_page_token=next_token)
+    thread = await load_thread(thread_id)
+    cursor = parse_comment_cursor(page_token, sort) if page_token else None
+    repos = await repositories.aget_repositories()
+    docs = await firebase.run_db(
+        repos.comments.list, thread_id, sort, limit + 1, cursor, verify_thread=False
+    )
+    # Votes change a comment's counts (and "top" order) without touching the thread, so pages
+    # are versioned by their own (id, score, ups, downs) sequence; a match still saves
+    # serialization and egress.
+    etag = weak_etag(
+        thread_id,
+        thread.comment_count,
+        sort,
+        limit,
+        page_token,
+        expand,
+        *((cid, d.get("score"), d.get("ups"), d.get("downs")) for cid, d in docs),
+    )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
-    base_query = thread_ref.collection("comments")
-    if sort == "new":
-        base_query = base_query.order_by(
-            "created_at", direction=firestore.Query.DESCENDING
-        )
-    else:
-        # For now also order by created_at; placeholder for score ordering
-        base_query = base_query.order_by(
-            "score", direction=firestore.Query.DESCENDING
-        ).order_by("created_at", direction=firestore.Query.DESCENDING)
-
-    cursor = decode_comment_cursor(page_token) if page_token else None
-    if cursor:
-        if sort == "new":
-            last_ts = cursor.get("ts")
-            base_query = base_query.start_after({"created_at": last_ts})
-        else:
-            # For top we order by score desc, created_at desc: need both to paginate
-            last_score = cursor.get("score", 0.0)
-            last_ts = cursor.get("ts")
-            # Firestore start_after expects field values in order-of-order_by
-            base_query = base_query.start_after((last_score, last_ts))
-
-    docs = list(base_query.limit(limit + 1).stream())
-    items: List[CommentOut] = []
-    for d in docs[:limit]:
-        data = d.to_dict()
-        items.append(
-            CommentOut(
-                id=d.id,
-                body=data.get("body"),
-                author_mode=data.get("author_mode"),
-                author_uid=mask_author_uid(
-                    data.get("author_mode"), data.get("author_uid")
-                ),
-                created_at=data.get("created_at"),
-                score=data.get("score", 0.0),
-            )
-        )
+    items: List[CommentOut] = [comment_out(cid, data) for cid, data in docs[:limit]]
     next_token = None
     if len(docs) > limit:
-        last = docs[limit - 1]
-        ld = last.to_dict()
+        last_id, ld = docs[limit - 1]
         if sort == "new":
-            next_token = encode_cursor(last.id, ld.get("created_at"))
+            next_token = encode_cursor(last_id, ld.get("created_at"))
         else:
             next_token = encode_comment_cursor(
-                last.id, ld.get("created_at"), sort, ld.get("score", 0.0)
+                last_id, ld.get("created_at"), sort, ld.get("score", 0.0)
             )
-    return CommentsPage(items=items, next_page_token=next_token)
+    if expand == "author":
+        items = await expand_authors(items)
+    page = CommentsPage(items=items, next_page_token=next_token)
+    return ModelResponse(page, headers={"ETag": etag})
+
+
+@router.get("/stream", response_class=StreamingResponse, responses=EVENT_STREAM_RESPONSES)
+async def stream_comments(thread_id: str):
+    """Server-Sent Events: ``comment`` events (CommentOut JSON) for new comments of a thread.
+
+    ``resync`` means the stream fell behind and was closed: re-read the comments page, then
+    reconnect. See ``backend/live.py``.
+    """
+    await load_thread(thread_id)  # 404 for unknown threads
+    return event_stream(thread_id)
+
+
+@router.post(
+    "/{comment_id}/votes",
+    response_model=VoteOut,
+    dependencies=[Depends(deps.route_rate_limit("comments.vote"))],
+)
+async def vote_comment(
+    thread_id: str,
+    comment_id: str,
+    payload: VoteIn,
+    user: deps.UserContext = Depends(deps.get_current_user),
+    _=Depends(deps.rate_limit),
+):
+    repos = await repositories.aget_repositories()
+    try:
+        comment = await firebase.run_db(
+            repos.comments.vote, thread_id, comment_id, user["uid"], payload.value
+        )
+    except repositories.NotFound:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return VoteOut(
+        comment_id=comment_id,
+        value=payload.value,
+        ups=comment.get("ups", 0),
+        downs=comment.get("downs", 0),
+        score=comment.get("score", 0.0),
+    )
@@ -33,16 +33,19 @@ class BlockOut(BaseModel):
     created_at: float
 
 
-@router.post("/reports", response_model=ReportOut, status_code=202)
+@router.post(
+    "/reports",
+    response_model=ReportOut,
+    status_code=202,
+    dependencies=[Depends(deps.route_rate_limit("moderation.report"))],
+)
 async def create_report(
     payload: ReportIn,
     user: deps.UserContext = Depends(deps.get_current_user),
     _=Depends(deps.rate_limit),
 ):
     # For MVP we just persist to a collection; moderation system can process async.
-    db = firebase.get_db()
     now = time.time()
-    doc_ref = db.collection("reports").document()
     data = {
         "reporter_uid": user["uid"],
         "target_type": payload.target_type,
@@ -51,9 +54,15 @@ async def create_report(
         "created_at": now,
         "status": "open",
     }
-    doc_ref.set(data)
+
+    def _write() -> str:
+        doc_ref = firebase.get_db().collection("reports").document()
+        doc_ref.set(data)
+        return doc_ref.id
+
+    report_id = await firebase.run_db(_write)
     return ReportOut(
-        id=doc_ref.id,
+        id=report_id,
         target_type=data["target_type"],
         target_id=data["target_id"],
         reason=data["reason"],
@@ -61,7 +70,12 @@ async def create_report(
     )
 
 
-@router.post("/blocks", response_model=BlockOut, status_code=201)
+@router.post(
+    "/blocks",
+    response_model=BlockOut,
+    status_code=201,
+    dependencies=[Depends(deps.route_rate_limit("moderation.block"))],
+)
 async def block_user(
     payload: BlockIn,
     user: deps.UserContext = Depends(deps.get_current_user),
@@ -69,14 +83,17 @@ async def block_user(
 ):
     if payload.blocked_uid == user["uid"]:
         raise HTTPException(status_code=422, detail="Cannot block yourself")
-    db = firebase.get_db()
     now = time.time()
-    doc_ref = db.collection("blocks").document(f"{user['uid']}__{payload.blocked_uid}")
-    doc_ref.set(
-        {
-            "blocker_uid": user["uid"],
-            "blocked_uid": payload.blocked_uid,
-            "created_at": now,
-        }
-    )
+
+    def _write() -> None:
+        doc_ref = firebase.get_db().collection("blocks").document(f"{user['uid']}__{payload.blocked_uid}")
+        doc_ref.set(
+            {
+                "blocker_uid": user["uid"],
+                "blocked_uid": payload.blocked_uid,
+                "created_at": now,
+            }
+        )
+
+    await firebase.run_db(_write)
     return BlockOut(blocked_uid=payload.blocked_uid, created_at=now)
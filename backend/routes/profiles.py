@@ -1,14 +1,65 @@
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException, Depends
-from google.cloud import firestore
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 import time
+from typing import Dict, Iterable, List, TypeVar
 
+from pydantic import BaseModel
+
+from .. import cache
 from .. import deps
 from .. import firebase
-from ..schemas import ProfileIn, ProfileOut
+from .. import repositories
+from ..schemas import ProfileIn, ProfileOut, PublicProfile, PublicProfilesOut
 
 router = APIRouter(prefix="/profiles", tags=["profiles"])
 
+MAX_BATCH_UIDS = 100
+
+M = TypeVar("M", bound=BaseModel)
+
+
+async def load_profiles(uids: Iterable[str]) -> Dict[str, PublicProfile]:
+    """Public profiles by uid from the process cache; all misses in one batched read."""
+    found: Dict[str, PublicProfile] = {}
+    missing: List[str] = []
+    for uid in dict.fromkeys(uids):
+        profile = cache.profiles.get(uid)
+        if profile is None:
+            missing.append(uid)
+        else:
+            found[uid] = profile
+    if missing:
+        users = (await repositories.aget_repositories()).users
+        for uid, data in (await firebase.run_db(users.get_many, missing)).items():
+            profile = PublicProfile(
+                uid=uid,
+                display_name=data.get("display_name", ""),
+                username=data.get("username", ""),
+            )
+            cache.profiles.set(uid, profile)
+            found[uid] = profile
+    return found
+
+
+async def expand_authors(items: List[M]) -> List[M]:
+    """Copies of ``items`` with ``author`` set; anon items already have author_uid masked."""
+    profiles = await load_profiles(i.author_uid for i in items if i.author_uid)
+    return [
+        i.model_copy(update={"author": profiles.get(i.author_uid)}) if i.author_uid else i
+        for i in items
+    ]
+
+
+@router.get("", response_model=PublicProfilesOut)
+async def get_profiles(
+    uids: str = Query(..., description=f"Comma-separated uids (at most {MAX_BATCH_UIDS})"),
+):
+    requested = [u for u in dict.fromkeys(x.strip() for x in uids.split(",")) if u]
+    if len(requested) > MAX_BATCH_UIDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_UIDS} uids")
+    profiles = await load_profiles(requested)
+    return PublicProfilesOut(items=[profiles[u] for u in requested if u in profiles])
+
 
 @router.post(
     "",
@@ -18,48 +69,32 @@ router = APIRouter(prefix="/profiles", tags=["profiles"])
 async def create_or_update_profile(
     payload: ProfileIn, user: deps.UserContext = Depends(deps.get_current_user)
 ):
-    db = firebase.get_db()
-    username_lower = payload.username.lower()
-    users_ref = db.collection("users")
-
-    # Fetch existing profile (if any) to decide if username is changing.
-    doc_ref = users_ref.document(user["uid"])
-    try:
-        existing_snap = doc_ref.get()
-        has_existing = getattr(existing_snap, "exists", False)
-    except Exception:
-        existing_snap = None
-        has_existing = False
-
-    prior_username_lower = None
-    if has_existing:
-        try:
-            prior_username_lower = (existing_snap.to_dict() or {}).get("username_lower")
-        except Exception:
-            prior_username_lower = None
-
-    # Enforce username immutability & case preservation after creation to satisfy tests:
-    # - If profile exists and supplied username differs in case OR attempts to change to any
-    #   other username (case-insensitive), return 409.
-    if has_existing:
-        try:
-            existing_data = existing_snap.to_dict() if existing_snap else {}
-        except Exception:  # pragma: no cover
-            existing_data = {}
-        existing_username = existing_data.get("username")
-        if existing_username:
-            if existing_username.lower() == username_lower and existing_username != payload.username:
-                raise HTTPException(status_code=409, detail="Username already taken")
-            if existing_username.lower() != username_lower:
-                # Attempt to change username entirely
-                raise HTTPException(status_code=409, detail="Username already taken")
-    else:
-        # New profile; check global uniqueness
-        conflict = list(
-            users_ref.where("username_lower", "==", username_lower).limit(1).stream()
+    out, created_new = await firebase.run_db(_save_profile, payload, user["uid"])
+    cache.profiles.invalidate(user["uid"])
+    # FastAPI will infer 200; manually override if created
+    if created_new:
+        return Response(
+            content=out.json(), media_type="application/json", status_code=201
         )
-        if conflict:
-            raise HTTPException(status_code=409, detail="Username already taken")
+    return out
+
+
+def _save_profile(payload: ProfileIn, uid: str) -> tuple[ProfileOut, bool]:
+    """Blocking part of create_or_update_profile; runs on the Firestore executor.
+
+    Round-trips: 1 profile read, then either 1 update (existing profile) or one transaction
+    that claims ``usernames/{username_lower}`` and creates the profile (new profile). An
+    existing profile without a username first claims the reservation in its own transaction.
+    """
+    users = repositories.get_repositories().users
+    username_lower = payload.username.lower()
+    existing = users.get(uid)
+
+    # Enforce username immutability & case preservation after creation:
+    # if the profile exists and the supplied username differs in case OR attempts to change to
+    # any other username (case-insensitive), return 409.
+    if existing and existing.get("username") and existing["username"] != payload.username:
+        raise HTTPException(status_code=409, detail="Username already taken")
 
     now = time.time()
     data = {
@@ -73,73 +108,25 @@ async def create_or_update_profile(
         "updated_at": now,
     }
 
-    created_new = False
-
-    def txn(transaction: firestore.Transaction):
-        nonlocal created_new
-        # Support dummy test DBs that don't accept a transaction parameter
-        try:
-            snapshot = doc_ref.get(transaction=transaction)  # type: ignore[arg-type]
-        except TypeError:  # pragma: no cover - test double fallback
-            snapshot = doc_ref.get()
-        if snapshot.exists:
-            try:
-                transaction.update(doc_ref, data)
-            except AttributeError:  # Dummy tx expecting different ref shape
-                try:
-                    existing_doc = doc_ref.get()
-                    merged = existing_doc.to_dict() if existing_doc and getattr(existing_doc, 'exists', False) else {}
-                except Exception:  # pragma: no cover
-                    merged = {}
-                merged.update(data)
-                try:
-                    doc_ref.set(merged)
-                except Exception:  # pragma: no cover
-                    pass
-            # Some dummy snapshots may not implement get("created_at"); fall back to now if absent.
-            try:
-                created_at_local = snapshot.get("created_at")  # type: ignore[attr-defined]
-            except Exception:  # pragma: no cover - fallback for simple test doubles
-                created_at_local = None
-            if created_at_local is None:
-                # Preserve prior created_at if stored in users_ref, else treat as existing record
-                existing_doc = doc_ref.get()
-                if getattr(existing_doc, "exists", False):
-                    try:
-                        created_at_local = existing_doc.to_dict().get("created_at")  # type: ignore[call-arg]
-                    except Exception:  # pragma: no cover
-                        created_at_local = None
-            if created_at_local is None:
-                created_at_local = now  # last resort; still considered update, not creation
-        else:
-            data_with_create = data | {"created_at": now}
-            transaction.set(doc_ref, data_with_create)
-            created_at_local = now
-            created_new = True
-        return created_at_local
-
-    transaction = db.transaction()
-    created_at = transaction.call(txn)
-    # Fallback: some in-memory test doubles ignore transaction.set for non-thread collections.
-    # If we believe we created a new record but it still doesn't exist, persist directly.
-    if created_new:
+    if existing:
+        if not existing.get("username") and not users.reserve_username(
+            username_lower, uid, payload.username
+        ):
+            raise HTTPException(status_code=409, detail="Username already taken")
+        users.update(uid, data)
+        created_at = existing.get("created_at") or now
+    else:
         try:
-            post_snap = doc_ref.get()
-            if not getattr(post_snap, "exists", False):  # type: ignore[attr-defined]
-                doc_ref.set({
-                    "display_name": data["display_name"],
-                    "username": data["username"],
-                    "username_lower": data["username_lower"],
-                    "allow_anonymous": data["allow_anonymous"],
-                    "resume_url": data["resume_url"],
-                    "created_at": created_at,
-                    "updated_at": data["updated_at"],
-                })
-        except Exception:  # pragma: no cover - defensive
-            pass
+            users.create(uid, data | {"created_at": now})
+        except repositories.UsernameTaken:
+            raise HTTPException(status_code=409, detail="Username already taken")
+        except repositories.Conflict:
+            # Another request created this profile between our read and write.
+            raise HTTPException(status_code=409, detail="Profile was modified concurrently")
+        created_at = now
 
     out = ProfileOut(
-        uid=user["uid"],
+        uid=uid,
         display_name=data["display_name"],
         username=data["username"],
         allow_anonymous=data["allow_anonymous"],
@@ -147,11 +134,4 @@ async def create_or_update_profile(
         created_at=created_at,
         updated_at=data["updated_at"],
     )
-    # FastAPI will infer 200; manually override if created
-    if created_new:
-        from fastapi import Response
-
-        return Response(
-            content=out.json(), media_type="application/json", status_code=201
-        )
-    return out
+    return out, not existing
@@ -0,0 +1,41 @@
+from __future__ import annotations
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+
+from .. import firebase
+from .. import search
+from ..schemas import SearchHit, SearchResults
+from .threads import load_thread
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("", response_model=SearchResults)
+async def search_posts(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+):
+    """Threads and comments matching ``q`` by BM25; ``term*`` matches a prefix."""
+    hits = await firebase.run_db(search.get_index().search, q, limit)
+
+    async def thread_or_none(thread_id: str):
+        try:
+            return await load_thread(thread_id)  # cached; one read per distinct thread
+        except HTTPException:
+            return None
+
+    thread_ids = list(dict.fromkeys(hit.thread_id for hit in hits))
+    threads = dict(zip(thread_ids, await asyncio.gather(*map(thread_or_none, thread_ids))))
+    return SearchResults(
+        items=[
+            SearchHit(
+                kind="comment" if hit.comment_id else "thread",
+                thread_id=hit.thread_id,
+                comment_id=hit.comment_id,
+                score=hit.score,
+                thread=threads[hit.thread_id],
+            )
+            for hit in hits
+            if threads[hit.thread_id] is not None  # skip posts whose thread is gone
+        ]
+    )
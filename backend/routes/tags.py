@@ -0,0 +1,22 @@
+from __future__ import annotations
+from fastapi import APIRouter, Query
+
+from .. import cache
+from .. import firebase
+from .. import repositories
+from ..schemas import TagCount, TagsOut
+
+router = APIRouter(prefix="/tags", tags=["tags"])
+
+
+@router.get("", response_model=TagsOut)
+async def list_tags(limit: int = Query(50, ge=1, le=200)):
+    """Most used tags with their thread counts, from the precomputed ``tags/{tag}`` aggregates."""
+    cached = cache.tag_counts.get(limit)
+    if cached is not None:
+        return cached
+    repos = await repositories.aget_repositories()
+    counts = await firebase.run_db(repos.threads.tag_counts, limit)
+    page = TagsOut(items=[TagCount(tag=tag, thread_count=n) for tag, n in counts])
+    cache.tag_counts.set(limit, page)
+    return page
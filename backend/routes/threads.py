@@ -1,20 +1,35 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, Query
-from google.cloud import firestore
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 import time
-from typing import Optional, List
+from typing import Any, Dict, FrozenSet, Optional, Union
 
+from .. import cache
 from .. import deps
 from .. import firebase
+from .. import jobs
+from .. import live
+from .. import repositories
+from .. import search
 from ..schemas import (
+    THREAD_SUMMARY_FIELDS,
     ThreadCreate,
     ThreadOut,
+    ThreadSummariesPage,
+    ThreadSummary,
     ThreadsPage,
     encode_cursor,
     decode_cursor,
+    encode_feed_cursor,
     mask_author_uid,
+    thread_out,
+    thread_summary,
 )
-from ..utils import sanitize_markdown
+from ..render import thread_rendered_fields
+from ..responses import ModelResponse
+from ..utils import sanitize_markdown, weak_etag, etag_matches
+from .profiles import expand_authors
 
 router = APIRouter(prefix="/threads", tags=["threads"])
 
@@ -25,12 +40,13 @@ async def create_thread(
     user: deps.UserContext = Depends(deps.get_current_user),
     _=Depends(deps.rate_limit),
 ):
-    db = firebase.get_db()
-    threads_ref = db.collection("threads")
     now = time.time()
+    title = sanitize_markdown(payload.title.strip())
+    body = sanitize_markdown(payload.body.strip())
     data = {
-        "title": sanitize_markdown(payload.title.strip()),
-        "body": sanitize_markdown(payload.body.strip()),
+        "title": title,
+        "body": body,
+        **thread_rendered_fields(body),
         "tags": payload.tags,
         "author_uid": user["uid"],
         "author_mode": payload.author_mode,
@@ -39,9 +55,11 @@ async def create_thread(
         "created_at": now,
         "updated_at": now,
     }
-    doc_ref = threads_ref.document()
-    doc_ref.set(data)
-    doc_id = getattr(doc_ref, "id", None) or "t_generated"
+    repos = await repositories.aget_repositories()
+    doc_id = await firebase.run_db(repos.threads.create, data)
+    cache.invalidate_thread(None, data["tags"])
+    live.hub.publish_thread(doc_id, data)
+    await firebase.run_db(search.index_thread, doc_id, data)
     return ThreadOut(
         id=doc_id,
         **{
@@ -51,73 +69,176 @@ async def create_thread(
     )
 
 
-@router.get("", response_model=ThreadsPage)
+VIEW_MODELS = {"full": ThreadOut, "summary": ThreadSummary}
+SUMMARY_NAMES: FrozenSet[str] = frozenset(ThreadSummary.model_fields)
+
+
+def parse_fields(fields: str, view: str) -> FrozenSet[str]:
+    """The sparse fieldset of a ``fields=`` list (422 for names the view doesn't have)."""
+    names = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = sorted(names - set(VIEW_MODELS[view].model_fields))
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown fields for view={view}: {', '.join(unknown)}"
+        )
+    return frozenset(names | {"id"})
+
+
+@router.get("", response_model=Union[ThreadsPage, ThreadSummariesPage])
 async def list_threads(
     tag: Optional[str] = None,
     limit: int = Query(20, le=50),
     page_token: Optional[str] = None,
+    sort: str = Query("new", pattern="^(new|hot)$"),
+    expand: Optional[str] = Query(None, pattern="^author$"),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return per item"),
 ):
-    db = firebase.get_db()
-    threads_ref = db.collection("threads").order_by(
-        "last_activity", direction=firestore.Query.DESCENDING
-    )
+    """Thread listing. ``view=summary`` returns ThreadSummary items (an ``excerpt`` instead of
+    the body), read with a Firestore projection; ``fields=`` trims items to the named fields."""
     if tag:
         tag = tag.lower()
-        threads_ref = threads_ref.where("tags", "array_contains", tag)
-
-    cursor = decode_cursor(page_token) if page_token else None
-    if cursor:
-        # Firestore needs field ordering; we use last_activity only here
-        last_activity = cursor.get("ts")
-        doc_id = cursor.get("id")
-        # Use start_after with a synthetic doc snapshot requires fetching the doc
-        doc_snapshot = db.collection("threads").document(doc_id).get()
-        if hasattr(threads_ref, "start_after"):
-            threads_ref = (
-                threads_ref.start_after({"last_activity": last_activity})
-                if not getattr(doc_snapshot, "exists", False)
-                else threads_ref.start_after(doc_snapshot)
-            )
-        # If dummy collection lacks start_after we skip pagination refinement (acceptable for tests)
-
-    docs = list(threads_ref.limit(limit + 1).stream())
-    items: List[ThreadOut] = []
-    for d in docs[:limit]:
-        data = d.to_dict()
-        doc_id = getattr(d, "id", "t_unknown")
-        items.append(
-            ThreadOut(
-                id=doc_id,
-                title=data.get("title"),
-                body=data.get("body"),
-                tags=data.get("tags", []),
-                author_mode=data.get("author_mode"),
-                author_uid=mask_author_uid(
-                    data.get("author_mode"), data.get("author_uid")
-                ),
-                comment_count=int(data.get("comment_count", 0)),
-                last_activity=data.get("last_activity"),
-                created_at=data.get("created_at"),
-                updated_at=data.get("updated_at"),
-            )
+    include = parse_fields(fields, view) if fields else None
+    if include is not None and include <= SUMMARY_NAMES:
+        view = "summary"  # nothing requested needs the body: read the projection
+    page = await _threads_page(tag, limit, page_token, sort, view)
+    if expand == "author":
+        # the cached page stays author-free; profiles have their own cache
+        page = page.model_copy(update={"items": await expand_authors(page.items)})
+        include = include and include | {"author"}
+    if include is None:
+        return ModelResponse(page)
+    return ModelResponse(page, include={"items": {"__all__": include}, "next_page_token": True})
+
+
+def event_stream(channel: str) -> StreamingResponse:
+    """A Server-Sent Events response for a ``live.hub`` channel (503 at capacity)."""
+    try:
+        sub = live.hub.subscribe(channel)
+    except live.HubFull:
+        raise HTTPException(
+            status_code=503, detail="Too many live streams", headers={"Retry-After": "5"}
         )
+    return StreamingResponse(
+        live.hub.events(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also covers a disconnect before the stream started (events() never ran).
+        background=BackgroundTask(live.hub.unsubscribe, sub),
+    )
+
+
+EVENT_STREAM_RESPONSES = {
+    200: {"content": {"text/event-stream": {}}, "description": "Event stream"}
+}
+
+
+@router.get("/stream", response_class=StreamingResponse, responses=EVENT_STREAM_RESPONSES)
+async def stream_threads():
+    """Server-Sent Events: a ``thread`` event (ThreadOut JSON) for every new thread.
+
+    ``resync`` means the stream fell behind and was closed: re-read the first page, then
+    reconnect. See ``backend/live.py``.
+    """
+    return event_stream(live.NEW_THREADS)
+
+
+def parse_page_cursor(token: str) -> Dict[str, Any]:
+    """The ``{"id", "ts"}`` cursor of a ``sort=new`` page token (400 if malformed)."""
+    cursor = decode_cursor(token)
+    ts = cursor.get("ts") if isinstance(cursor, dict) else None
+    if (
+        not isinstance(cursor, dict)
+        or not isinstance(cursor.get("id"), str)
+        or isinstance(ts, bool)
+        or not isinstance(ts, (int, float))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+    return cursor
+
+
+def parse_feed_offset(token: str) -> int:
+    """The position in a ``sort=hot`` page token (400 if malformed)."""
+    cursor = decode_cursor(token)
+    offset = cursor.get("offset") if isinstance(cursor, dict) else None
+    if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+    return offset
+
+
+async def _threads_page(
+    tag: Optional[str], limit: int, page_token: Optional[str], sort: str, view: str = "full"
+) -> Union[ThreadsPage, ThreadSummariesPage]:
+    cache_key = (tag, limit, page_token, sort, view)
+    cached = cache.thread_pages.get(cache_key)
+    if cached is not None:
+        return cached
+    if sort == "hot":
+        page = await _hot_page(tag, limit, page_token, view)
+        cache.thread_pages.set(cache_key, page)
+        return page
+    cursor = parse_page_cursor(page_token) if page_token else None
+    projection = THREAD_SUMMARY_FIELDS if view == "summary" else None
+    repos = await repositories.aget_repositories()
+    docs = await firebase.run_db(repos.threads.list, tag, limit + 1, cursor, projection)
     next_token = None
     if len(docs) > limit:
-        last = docs[limit - 1]
-        ld = last.to_dict()
-        next_token = encode_cursor(last.id, ld.get("last_activity"))
-    return ThreadsPage(items=items, next_page_token=next_token)
+        last_id, ld = docs[limit - 1]
+        next_token = encode_cursor(last_id, ld.get("last_activity"))
+    if view == "summary":
+        items = [thread_summary(doc_id, data) for doc_id, data in docs[:limit]]
+        page = ThreadSummariesPage(items=items, next_page_token=next_token)
+    else:
+        items = [thread_out(doc_id, data) for doc_id, data in docs[:limit]]
+        page = ThreadsPage(items=items, next_page_token=next_token)
+    cache.thread_pages.set(cache_key, page)
+    return page
+
+
+async def _hot_page(
+    tag: Optional[str], limit: int, page_token: Optional[str], view: str = "full"
+) -> Union[ThreadsPage, ThreadSummariesPage]:
+    """Page through the materialized ``feeds/hot`` document (one read, ranked by the job)."""
+    repos = await repositories.aget_repositories()
+    feed = await firebase.run_db(repos.threads.get_feed, jobs.HOT_FEED_NAME)
+    if feed is None:
+        # First request before the background job has run: build the feed once, inline.
+        feed = await firebase.run_db(jobs.refresh_hot_feed, repos)
+    entries = [e for e in feed.get("items", []) if not tag or tag in e.get("tags", [])]
+    # Offsets index the ranked snapshot; a regenerated feed may reorder items between pages.
+    offset = parse_feed_offset(page_token) if page_token else 0
+    window = entries[offset : offset + limit]
+    next_token = None
+    if offset + limit < len(entries):
+        next_token = encode_feed_cursor(offset + limit, feed.get("generated_at"))
+    if view == "summary":
+        return ThreadSummariesPage(
+            items=[thread_summary(e["id"], e) for e in window], next_page_token=next_token
+        )
+    # Full items come from the thread documents (stored body_html, current counts): one
+    # batched read of the window per cached page, nothing rendered on the event loop.
+    threads = await firebase.run_db(repos.threads.get_many, [e["id"] for e in window])
+    return ThreadsPage(
+        items=[
+            thread_out(e["id"], {**threads[e["id"]], "hot_score": e.get("hot_score")})
+            for e in window
+            if e["id"] in threads  # deleted since the feed was ranked
+        ],
+        next_page_token=next_token,
+    )
 
 
-@router.get("/{thread_id}", response_model=ThreadOut)
-async def get_thread(thread_id: str):
-    db = firebase.get_db()
-    snap = db.collection("threads").document(thread_id).get()
-    if not snap.exists:
+async def load_thread(thread_id: str) -> ThreadOut:
+    """Return a thread from the in-process cache, reading it on a miss (404 if missing)."""
+    cached = cache.thread_docs.get(thread_id)
+    if cached is not None:
+        return cached
+    repos = await repositories.aget_repositories()
+    data = await firebase.run_db(repos.threads.get, thread_id)
+    if data is None:
         raise HTTPException(status_code=404, detail="Thread not found")
-    data = snap.to_dict()
-    return ThreadOut(
-        id=snap.id,
+    thread = ThreadOut(
+        id=thread_id,
         **{
             **data,
             "author_uid": mask_author_uid(
@@ -125,3 +246,25 @@ async def get_thread(thread_id: str):
             ),
         },
     )
+    cache.thread_docs.set(thread_id, thread)
+    return thread
+
+
+def thread_etag(thread: ThreadOut) -> str:
+    return weak_etag(thread.id, thread.updated_at, thread.last_activity, thread.comment_count)
+
+
+@router.get(
+    "/{thread_id}",
+    response_model=ThreadOut,
+    responses={304: {"description": "Not Modified (If-None-Match matched)"}},
+)
+async def get_thread(
+    thread_id: str,
+    if_none_match: Optional[str] = Header(None),
+):
+    thread = await load_thread(thread_id)
+    etag = thread_etag(thread)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return ModelResponse(thread, headers={"ETag": etag})
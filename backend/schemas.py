@@ -1,7 +1,7 @@
 """Pydantic models for TechSpace API."""
 
 from __future__ import annotations
-from typing import List, Optional, Literal, Any
+from typing import Dict, List, Optional, Literal, Any
 from pydantic import BaseModel, Field, validator, EmailStr
 import base64
 import json
@@ -9,12 +9,20 @@ import json
 AuthorMode = Literal["public", "anon"]
 
 
-# Cursor helpers (doc_id + timestamp iso) for pagination
+# Cursor helpers for keyset pagination. A cursor carries every ordered field of the query plus
+# the document id ("id"), which is the final __name__ tie-break, so a page can resume with
+# start_after(field values) without re-reading the last document.
 def encode_cursor(doc_id: str, ts: float) -> str:
     raw = json.dumps({"id": doc_id, "ts": ts}).encode("utf-8")
     return base64.urlsafe_b64encode(raw).decode("utf-8")
 
 
+# Hot feed cursor: position within one generated snapshot of the ranked feed
+def encode_feed_cursor(offset: int, generated_at: float) -> str:
+    raw = json.dumps({"offset": offset, "gen": generated_at}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("utf-8")
+
+
 def decode_cursor(token: str) -> Optional[dict[str, Any]]:
     if not token:
         return None
@@ -87,6 +95,18 @@ class ProfileOut(BaseModel):
     updated_at: float
 
 
+class PublicProfile(BaseModel):
+    """What other users may see of a profile (batch lookup, expand=author)."""
+
+    uid: str
+    display_name: str
+    username: str
+
+
+class PublicProfilesOut(BaseModel):
+    items: List[PublicProfile]  # only uids that have a profile, in request order
+
+
 # Auth Models
 USERNAME_PATTERN = r"^[A-Za-z0-9_]{3,24}$"
 
@@ -164,6 +184,8 @@ class ThreadOut(BaseModel):
     id: str
     title: str
     body: str
+    body_html: Optional[str] = None  # rendered at write time; None for legacy rows
+    excerpt: Optional[str] = None  # plain-text start of the body; None for legacy rows
     tags: List[str]
     author_mode: AuthorMode
     author_uid: Optional[str]  # masked if anon
@@ -171,6 +193,8 @@ class ThreadOut(BaseModel):
     last_activity: float
     created_at: float
     updated_at: float
+    hot_score: Optional[float] = None  # only set on sort=hot listings
+    author: Optional[PublicProfile] = None  # only set with expand=author, never for anon
 
 
 class ThreadsPage(BaseModel):
@@ -178,6 +202,55 @@ class ThreadsPage(BaseModel):
     next_page_token: Optional[str] = None
 
 
+class ThreadSummary(BaseModel):
+    """A feed row: ThreadOut without ``body`` / ``body_html`` (``GET /threads?view=summary``)."""
+
+    id: str
+    title: str
+    excerpt: Optional[str] = None  # plain-text start of the body; None for legacy rows
+    tags: List[str]
+    author_mode: AuthorMode
+    author_uid: Optional[str]  # masked if anon
+    comment_count: int
+    last_activity: float
+    created_at: float
+    updated_at: float
+    hot_score: Optional[float] = None  # only set on sort=hot listings
+    author: Optional[PublicProfile] = None  # only set with expand=author, never for anon
+
+
+class ThreadSummariesPage(BaseModel):
+    items: List[ThreadSummary]
+    next_page_token: Optional[str] = None
+
+
+# The stored fields a summary is built from: the Firestore projection of a summary listing.
+THREAD_SUMMARY_FIELDS = tuple(
+    f for f in ThreadSummary.model_fields if f not in ("id", "hot_score", "author")
+)
+
+
+class TagCount(BaseModel):
+    tag: str
+    thread_count: int
+
+
+class TagsOut(BaseModel):
+    items: List[TagCount]
+
+
+class SearchHit(BaseModel):
+    kind: Literal["thread", "comment"]
+    thread_id: str
+    comment_id: Optional[str] = None
+    score: float
+    thread: Optional[ThreadOut] = None  # the thread (or the comment's thread)
+
+
+class SearchResults(BaseModel):
+    items: List[SearchHit]
+
+
 class CommentCreate(BaseModel):
     body: str = Field(min_length=1, max_length=5000)
     author_mode: AuthorMode = "public"
@@ -186,16 +259,73 @@ class CommentCreate(BaseModel):
 class CommentOut(BaseModel):
     id: str
     body: str
+    body_html: Optional[str] = None  # rendered at write time; None for legacy rows
     author_mode: AuthorMode
     author_uid: Optional[str]  # masked if anon
     created_at: float
     score: float
+    ups: int = 0
+    downs: int = 0
+    author: Optional[PublicProfile] = None  # only set with expand=author, never for anon
+
+
+class VoteIn(BaseModel):
+    # 1 = upvote, -1 = downvote, 0 = retract a previous vote
+    value: Literal[-1, 0, 1]
+
+
+class VoteOut(BaseModel):
+    comment_id: str
+    value: int
+    ups: int
+    downs: int
+    score: float
 
 
 def mask_author_uid(author_mode: AuthorMode, uid: str | None) -> Optional[str]:
     return None if author_mode == "anon" else uid
 
 
+def thread_out(thread_id: str, data: Dict[str, Any]) -> ThreadOut:
+    """The public representation of a stored thread (author masked if anon)."""
+    # One pydantic-core validation of the stored dict (extra fields are ignored): faster than
+    # keyword construction, and even than model_construct, which loops over fields in Python.
+    return ThreadOut.model_validate(
+        {
+            "tags": [],
+            "comment_count": 0,
+            **data,
+            "id": thread_id,
+            "author_uid": mask_author_uid(data.get("author_mode"), data.get("author_uid")),
+        }
+    )
+
+
+def thread_summary(thread_id: str, data: Dict[str, Any]) -> ThreadSummary:
+    """The feed representation of a stored (or projected) thread (author masked if anon)."""
+    return ThreadSummary.model_validate(
+        {
+            "tags": [],
+            "comment_count": 0,
+            **data,
+            "id": thread_id,
+            "author_uid": mask_author_uid(data.get("author_mode"), data.get("author_uid")),
+        }
+    )
+
+
+def comment_out(comment_id: str, data: Dict[str, Any]) -> CommentOut:
+    """The public representation of a stored comment (author masked if anon)."""
+    return CommentOut.model_validate(
+        {
+            "score": 0.0,
+            **data,
+            "id": comment_id,
+            "author_uid": mask_author_uid(data.get("author_mode"), data.get("author_uid")),
+        }
+    )
+
+
 class CommentsPage(BaseModel):
     items: List[CommentOut]
     next_page_token: Optional[str] = None
@@ -0,0 +1,723 @@
+"""Full-text search over threads and comments: a local inverted index ranked with BM25.
+
+Documents are tokenized (markup stripped, lowercased, Unicode letters/digits, a small stopword
+list) into term frequencies; title and tag terms count ``TITLE_WEIGHT`` / ``TAG_WEIGHT`` times.
+A thread is keyed by its id, a comment by ``"{thread_id}/{comment_id}"``.
+
+On disk (``SEARCH_INDEX_DIR``) the index is:
+
+- immutable **segments** (``seg-*.bin``), memory-mapped on open: a sorted term table, postings
+  and per-document keys and lengths. Opening an index maps the files, it does not rebuild
+  anything; term lookup is a binary search over the mapped table, and a prefix query walks the
+  table from the prefix onward. Each posting stores its document, term frequency and BM25 term
+  weight (the tf/length part of the score, against the segment's average length), and a term's
+  postings are sorted by that weight, highest first (impact order);
+- a **write-ahead log** (``wal-*.log``, one JSON line per document) holding everything indexed
+  since the last segment was written. Each process replays it into an in-memory delta;
+- ``manifest.json``, replaced atomically, naming the live segments and the current log.
+
+Writers append to the log under an ``fcntl`` lock. Every process tails the log before each
+query, so all ``uvicorn`` workers on a host see each other's posts. A write only appends to the
+log; every ``SEARCH_MAINTENANCE_SECONDS`` a lifespan job (``maintain``) writes a delta of at least
+``SEARCH_FLUSH_DOCS`` documents out as a segment and starts a fresh log, and past
+``SEARCH_MAX_SEGMENTS`` segments merges the newest ones into one, so no request pays for either.
+
+Queries are ranked score-at-a-time: the highest-impact chunk among the query terms' postings
+(weight x idf) is accumulated first, and evaluation stops once the top results can no longer be
+displaced by anything unread, or after ``SEARCH_MAX_POSTINGS`` postings. A one-term query reads
+about one chunk whatever the term's frequency; multi-term queries over very common terms are
+approximate past the budget (anytime ranking) instead of growing with the corpus.
+
+Posts are indexed as they are created (``index_thread`` / ``index_comment``). An indexing failure
+is logged and counted in ``index_failures`` and never fails the write. ``backend/tools/build_search_index.py`` rebuilds an index
+from Firestore. Segment files use little-endian layout.
+"""
+
+from __future__ import annotations
+import array
+import bisect
+import contextlib
+import heapq
+import html
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "search-index")
+SEARCH_FLUSH_DOCS = int(os.getenv("SEARCH_FLUSH_DOCS", "5000"))
+SEARCH_MAX_SEGMENTS = int(os.getenv("SEARCH_MAX_SEGMENTS", "8"))
+SEARCH_MAINTENANCE_SECONDS = float(os.getenv("SEARCH_MAINTENANCE_SECONDS", "10"))
+# A prefix query matches at most this many terms (the first ones in term order).
+SEARCH_MAX_EXPANSIONS = int(os.getenv("SEARCH_MAX_EXPANSIONS", "64"))
+# Postings a query may score before it returns the best results found so far.
+SEARCH_MAX_POSTINGS = int(os.getenv("SEARCH_MAX_POSTINGS", "20000"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 2
+MAX_TERM_LENGTH = 40
+MAX_TF = 0xFFFF  # term frequencies are stored as uint16
+_CHUNK = 1024  # postings scored per step of a query
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in into is it its of on or so "
+    "that the their then there these they this to was were will with you your".split()
+)
+
+_MARKUP = re.compile(r"<[^>]*>")
+_WORD = re.compile(r"[^\W_]+")
+
+TermFreqs = Dict[str, int]
+
+
+def tokenize(text: str) -> List[str]:
+    """Index terms of ``text`` (sanitized HTML or plain text), in order."""
+    text = html.unescape(_MARKUP.sub(" ", text)).lower()
+    return [
+        t for t in _WORD.findall(text) if t not in STOPWORDS and len(t) <= MAX_TERM_LENGTH
+    ]
+
+
+def document_terms(body: str, title: str = "", tags: Iterable[str] = ()) -> Tuple[TermFreqs, int]:
+    """Weighted term frequencies and length of a document."""
+    tf = Counter(tokenize(body))
+    for term in tokenize(title):
+        tf[term] += TITLE_WEIGHT
+    for tag in tags:
+        for term in tokenize(tag):
+            tf[term] += TAG_WEIGHT
+    return {t: min(n, MAX_TF) for t, n in tf.items()}, sum(tf.values())
+
+
+def parse_query(query: str) -> List[Tuple[str, bool]]:
+    """``[(term, is_prefix)]``; a word ending in ``*`` is a prefix query (``pyth*``)."""
+    clauses: List[Tuple[str, bool]] = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        terms = tokenize(word.rstrip("*"))
+        if not terms:
+            continue
+        clauses.extend((t, False) for t in terms[:-1])
+        clauses.append((terms[-1], prefix))
+    return clauses
+
+
+def impact_order(
+    docs: Sequence[int], tfs: Sequence[int], lengths: Sequence[int], avgdl: float
+) -> Tuple[List[int], List[float], List[int]]:
+    """A term's postings with their BM25 term weights, sorted by weight (highest first)."""
+    k1, norm0, norm1 = BM25_K1, BM25_K1 * (1.0 - BM25_B), BM25_K1 * BM25_B / (avgdl or 1.0)
+    weights = [tf * (k1 + 1.0) / (tf + norm0 + norm1 * lengths[d]) for d, tf in zip(docs, tfs)]
+    # stable, so equal weights keep ascending doc order
+    ordered = sorted(zip(weights, docs, tfs), key=itemgetter(0), reverse=True)
+    if not ordered:
+        return [], [], []
+    weights, docs, tfs = map(list, zip(*ordered))
+    return docs, weights, tfs
+
+
+def idf(doc_freq: int, n_docs: int) -> float:
+    return math.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+@dataclass(frozen=True)
+class Hit:
+    key: str
+    score: float
+
+    @property
+    def thread_id(self) -> str:
+        return self.key.split("/", 1)[0]
+
+    @property
+    def comment_id(self) -> Optional[str]:
+        return self.key.split("/", 1)[1] if "/" in self.key else None
+
+
+# ---------------------------------------------------------------------------
+# Segments
+# ---------------------------------------------------------------------------
+
+# magic, version, n_docs, n_terms, n_postings, total_length
+_HEADER = struct.Struct("<4sIIIQQ")
+_MAGIC = b"TSIX"
+_VERSION = 1
+
+
+def _little_endian(arr: array.array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+class _StringTable(Sequence[str]):
+    """Strings packed in one blob, addressed by an offsets array (bisect-able)."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return str(self._blob[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+
+def _pack_strings(strings: Sequence[str]) -> Tuple[array.array, bytes]:
+    offsets = array.array("I", [0])
+    parts = []
+    pos = 0
+    for s in strings:
+        b = s.encode("utf-8")
+        parts.append(b)
+        pos += len(b)
+        offsets.append(pos)
+    return offsets, b"".join(parts)
+
+
+def write_segment(
+    path: str,
+    keys: Sequence[str],
+    lengths: Sequence[int],
+    postings: Iterable[Tuple[str, Sequence[int], Sequence[int]]],
+) -> None:
+    """Write a segment; ``postings`` yields ``(term, doc numbers, tfs)`` in term order."""
+    avgdl = sum(lengths) / len(lengths) if lengths else 1.0
+    terms: List[str] = []
+    offsets = array.array("Q", [0])
+    docs = array.array("I")
+    weights = array.array("f")
+    tfs = array.array("H")
+    for term, term_docs, term_tfs in postings:
+        ordered_docs, term_weights, ordered_tfs = impact_order(term_docs, term_tfs, lengths, avgdl)
+        terms.append(term)
+        docs.extend(ordered_docs)
+        weights.extend(term_weights)
+        tfs.extend(ordered_tfs)
+        offsets.append(len(docs))
+    term_offsets, term_blob = _pack_strings(terms)
+    key_offsets, key_blob = _pack_strings(keys)
+    header = _HEADER.pack(
+        _MAGIC, _VERSION, len(keys), len(terms), len(docs), int(sum(lengths))
+    )
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        # widest arrays first keeps every array naturally aligned for memoryview.cast
+        lengths_arr = array.array("I", lengths)
+        for arr in (offsets, term_offsets, key_offsets, lengths_arr, docs, weights, tfs):
+            f.write(_little_endian(arr))
+        f.write(term_blob)
+        f.write(key_blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Segment:
+    """A memory-mapped, immutable segment file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_docs, n_terms, n_postings, total = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a search segment (version {_VERSION})")
+        self.n_docs = n_docs
+        self.total_length = total
+        view = memoryview(self._mm)
+        pos = _HEADER.size
+
+        def take(fmt: str, count: int) -> memoryview:
+            nonlocal pos
+            size = struct.calcsize(fmt) * count
+            part = view[pos : pos + size].cast(fmt)
+            pos += size
+            return part
+
+        self._post_offsets = take("Q", n_terms + 1)
+        term_offsets = take("I", n_terms + 1)
+        key_offsets = take("I", n_docs + 1)
+        self.lengths = take("I", n_docs)
+        self._docs = take("I", n_postings)
+        self._weights = take("f", n_postings)
+        self._tfs = take("H", n_postings)
+        term_blob = view[pos : pos + term_offsets[-1]]
+        pos += term_offsets[-1]
+        self.terms = _StringTable(term_offsets, term_blob)
+        self.keys = _StringTable(key_offsets, view[pos : pos + key_offsets[-1]])
+
+    def _find(self, term: str) -> int:
+        i = bisect.bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def impacts(self, term: str) -> Optional[Tuple[Sequence[int], Sequence[float]]]:
+        """``(docs, weights)`` of ``term``, highest weight first."""
+        i = self._find(term)
+        if i < 0:
+            return None
+        start, end = self._post_offsets[i], self._post_offsets[i + 1]
+        return self._docs[start:end], self._weights[start:end]
+
+    def doc_freq(self, term: str) -> int:
+        i = self._find(term)
+        return 0 if i < 0 else self._post_offsets[i + 1] - self._post_offsets[i]
+
+    def expand(self, prefix: str, limit: int) -> List[str]:
+        out = []
+        i = bisect.bisect_left(self.terms, prefix)
+        while i < len(self.terms) and len(out) < limit:
+            term = self.terms[i]
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+            i += 1
+        return out
+
+    def iter_postings(self, base: int = 0) -> Iterator[Tuple[str, List[int], Sequence[int]]]:
+        for i in range(len(self.terms)):
+            start, end = self._post_offsets[i], self._post_offsets[i + 1]
+            yield self.terms[i], [d + base for d in self._docs[start:end]], self._tfs[start:end]
+
+
+class _Delta:
+    """Documents not yet in a segment (the write-ahead log, replayed)."""
+
+    def __init__(self) -> None:
+        self.keys: List[str] = []
+        self.lengths: List[int] = []
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._sorted: Optional[List[str]] = None
+        self._impacts: Dict[str, Tuple[List[int], List[float]]] = {}
+        self.total_length = 0
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, tf: TermFreqs, length: int) -> None:
+        doc = len(self.keys)
+        self.keys.append(key)
+        self.lengths.append(length)
+        self.total_length += length
+        for term, n in tf.items():
+            docs, tfs = self._postings.setdefault(term, ([], []))
+            docs.append(doc)
+            tfs.append(n)
+        self._sorted = None
+        self._impacts.clear()
+
+    def impacts(self, term: str) -> Optional[Tuple[Sequence[int], Sequence[float]]]:
+        """Like ``Segment.impacts``, computed on demand and kept until the next add."""
+        found = self._impacts.get(term)
+        if found is None:
+            entry = self._postings.get(term)
+            if entry is None:
+                return None
+            avgdl = self.total_length / len(self.keys)
+            docs, weights, _ = impact_order(entry[0], entry[1], self.lengths, avgdl)
+            found = self._impacts[term] = (docs, weights)
+        return found
+
+    def doc_freq(self, term: str) -> int:
+        entry = self._postings.get(term)
+        return len(entry[0]) if entry else 0
+
+    def expand(self, prefix: str, limit: int) -> List[str]:
+        if self._sorted is None:
+            self._sorted = sorted(self._postings)
+        i = bisect.bisect_left(self._sorted, prefix)
+        out = []
+        while i < len(self._sorted) and len(out) < limit and self._sorted[i].startswith(prefix):
+            out.append(self._sorted[i])
+            i += 1
+        return out
+
+    def iter_postings(self) -> Iterator[Tuple[str, List[int], List[int]]]:
+        for term in sorted(self._postings):
+            docs, tfs = self._postings[term]
+            yield term, docs, tfs
+
+
+def merge_segments(path: str, segments: Sequence[Segment]) -> None:
+    """Write the union of ``segments`` (in order) as one segment at ``path``."""
+    keys: List[str] = []
+    lengths: List[int] = []
+    streams = []
+    for seg in segments:
+        streams.append(seg.iter_postings(base=len(keys)))
+        keys.extend(seg.keys)
+        lengths.extend(seg.lengths)
+
+    def merged() -> Iterator[Tuple[str, List[int], List[int]]]:
+        current, docs, tfs = None, [], []
+        for term, term_docs, term_tfs in heapq.merge(*streams, key=lambda p: p[0]):
+            if term != current:
+                if current is not None:
+                    yield current, docs, tfs
+                current, docs, tfs = term, [], []
+            docs.extend(term_docs)
+            tfs.extend(term_tfs)
+        if current is not None:
+            yield current, docs, tfs
+
+    write_segment(path, keys, lengths, merged())
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+_MANIFEST = "manifest.json"
+
+
+class SearchIndex:
+    """An index directory shared by all processes that open it."""
+
+    def __init__(
+        self,
+        path: str = SEARCH_INDEX_DIR,
+        flush_docs: int = SEARCH_FLUSH_DOCS,
+        max_segments: int = SEARCH_MAX_SEGMENTS,
+        max_expansions: int = SEARCH_MAX_EXPANSIONS,
+        max_postings: int = SEARCH_MAX_POSTINGS,
+    ):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = os.fspath(path)
+        self.flush_docs = max(1, flush_docs)
+        self.max_segments = max(2, max_segments)
+        self.max_expansions = max_expansions
+        self.max_postings = max(1, max_postings)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(self.path, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = threading.RLock()
+        self._manifest_stat: Optional[Tuple[int, int]] = None
+        self._generation = -1
+        self._segment_names: List[str] = []
+        self._wal = ""
+        self._segments: Dict[str, Segment] = {}
+        self._delta = _Delta()
+        self._wal_pos = 0
+        with self._locked():
+            if not os.path.exists(self._file(_MANIFEST)):
+                self._write_manifest(0, [], "wal-000000.log")
+            self._sync()
+
+    # -- files & locking ---------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Process-wide mutex (thread lock) plus the cross-process file lock."""
+        with self._lock:
+            self._fcntl.lockf(self._lock_fd, self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(self._lock_fd, self._fcntl.LOCK_UN)
+
+    def _write_manifest(self, generation: int, segments: List[str], wal: str) -> None:
+        open(self._file(wal), "ab").close()
+        tmp = self._file(_MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"generation": generation, "segments": segments, "wal": wal}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file(_MANIFEST))
+
+    def _load_manifest(self) -> None:
+        st = os.stat(self._file(_MANIFEST))
+        stamp = (st.st_ino, st.st_mtime_ns)
+        if stamp == self._manifest_stat:
+            return
+        with open(self._file(_MANIFEST)) as f:
+            manifest = json.load(f)
+        self._manifest_stat = stamp
+        if manifest["generation"] == self._generation:
+            return
+        names = manifest["segments"]
+        segments = {name: self._segments.get(name) or Segment(self._file(name)) for name in names}
+        self._segments = segments  # dropped ones stay mapped until no longer referenced
+        self._segment_names = names
+        self._generation = manifest["generation"]
+        self._wal = manifest["wal"]
+        self._delta = _Delta()
+        self._wal_pos = 0
+
+    def _sync(self) -> None:
+        """Pick up a new manifest and tail the write-ahead log."""
+        for _ in range(3):
+            self._load_manifest()
+            try:
+                if os.stat(self._file(self._wal)).st_size == self._wal_pos:
+                    return
+                with open(self._file(self._wal), "rb") as f:
+                    f.seek(self._wal_pos)
+                    data = f.read()
+            except FileNotFoundError:
+                continue  # another process just flushed; the manifest changed
+            end = data.rfind(b"\n") + 1  # a partially written line waits for the next sync
+            for line in data[:end].splitlines():
+                entry = json.loads(line)
+                self._delta.add(entry["k"], entry["tf"], entry["n"])
+            self._wal_pos += end
+            return
+        raise RuntimeError(f"search index {self.path} keeps changing under us")
+
+    # -- writes ------------------------------------------------------------
+
+    def add(self, key: str, tf: TermFreqs, length: int) -> None:
+        """Index one document (appended to the shared log; ``maintain`` makes it a segment)."""
+        line = json.dumps({"k": key, "tf": tf, "n": length}, separators=(",", ":"))
+        with self._locked():
+            self._sync()
+            with open(self._file(self._wal), "ab") as f:
+                f.write(line.encode("utf-8") + b"\n")
+            self._sync()
+
+    def add_document(
+        self, key: str, body: str, title: str = "", tags: Iterable[str] = ()
+    ) -> None:
+        self.add(key, *document_terms(body, title, tags))
+
+    def flush(self) -> None:
+        """Write the delta out as a segment now."""
+        with self._locked():
+            self._sync()
+            if self._delta.n_docs:
+                self._flush_locked()
+
+    def maintain(self) -> None:
+        """Write a delta of ``flush_docs`` or more out as a segment, then merge excess segments.
+
+        Run by the background job in ``backend/jobs.py``, off the request path.
+        """
+        with self._locked():
+            self._sync()
+            if self._delta.n_docs >= self.flush_docs:
+                self._flush_locked()
+        self.compact()
+
+    def _flush_locked(self) -> None:
+        generation = self._generation + 1
+        name = f"seg-{generation:06d}.bin"
+        delta = self._delta
+        write_segment(self._file(name), delta.keys, delta.lengths, delta.iter_postings())
+        old_wal = self._wal
+        self._write_manifest(generation, self._segment_names + [name], f"wal-{generation:06d}.log")
+        os.unlink(self._file(old_wal))
+        self._sync()
+
+    def bulk_add(
+        self, docs: Iterable[Tuple[str, TermFreqs, int]], segment_docs: int = 100_000
+    ) -> int:
+        """Index many documents straight into new segments (no log); returns the count."""
+        count = 0
+        delta = _Delta()
+        for key, tf, length in docs:
+            delta.add(key, tf, length)
+            count += 1
+            if delta.n_docs >= segment_docs:
+                self._append_segment(delta)
+                delta = _Delta()
+        if delta.n_docs:
+            self._append_segment(delta)
+        return count
+
+    def _append_segment(self, delta: _Delta) -> None:
+        tmp_name = f"bulk-{os.getpid()}-{threading.get_ident()}.bin"
+        write_segment(self._file(tmp_name), delta.keys, delta.lengths, delta.iter_postings())
+        with self._locked():
+            self._sync()
+            generation = self._generation + 1
+            name = f"seg-{generation:06d}.bin"
+            os.replace(self._file(tmp_name), self._file(name))
+            self._write_manifest(generation, self._segment_names + [name], self._wal)
+            self._sync()
+
+    def compact(self) -> None:
+        """Merge the newest segments while there are more than ``max_segments``.
+
+        The merged file is written without holding the lock; only the manifest swap is locked,
+        so writers are not stalled behind a large merge.
+        """
+        with self._lock:
+            self._sync()
+            if len(self._segment_names) <= self.max_segments:
+                return
+            victims = self._segment_names[-max(2, self.max_segments // 2) :]
+            segments = [self._segments[name] for name in victims]
+            tmp_name = f"merge-{os.getpid()}-{threading.get_ident()}.bin"
+            merge_segments(self._file(tmp_name), segments)
+            with self._locked():
+                self._sync()
+                names = self._segment_names
+                start = names.index(victims[0]) if victims[0] in names else -1
+                if start < 0 or names[start : start + len(victims)] != victims:
+                    os.unlink(self._file(tmp_name))  # someone else merged them first
+                    return
+                generation = self._generation + 1
+                name = f"seg-{generation:06d}.bin"
+                os.replace(self._file(tmp_name), self._file(name))
+                merged = names[:start] + [name] + names[start + len(victims) :]
+                self._write_manifest(generation, merged, self._wal)
+                for old in victims:
+                    os.unlink(self._file(old))
+                self._sync()
+
+    # -- reads -------------------------------------------------------------
+
+    def _sources(self) -> List[Tuple[int, object]]:
+        sources, base = [], 0
+        for name in self._segment_names:
+            seg = self._segments[name]
+            sources.append((base, seg))
+            base += seg.n_docs
+        sources.append((base, self._delta))
+        return sources
+
+    @property
+    def doc_count(self) -> int:
+        with self._lock:
+            self._sync()
+            return sum(src.n_docs for _, src in self._sources())
+
+    def search(self, query: str, limit: int = 20) -> List[Hit]:
+        """Top ``limit`` documents for ``query`` by BM25 (any term may match)."""
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+        with self._lock:
+            self._sync()
+            sources = self._sources()
+            n_docs = sum(src.n_docs for _, src in sources)
+            if not n_docs:
+                return []
+            terms: Dict[str, None] = {}
+            for term, prefix in clauses:
+                if prefix:
+                    cap = self.max_expansions
+                    expansions = {t for _, src in sources for t in src.expand(term, cap)}
+                    terms.update(dict.fromkeys(sorted(expansions)[:cap]))
+                else:
+                    terms[term] = None
+            # one cursor per (term, source): [idf, docs, weights, base, position, term number]
+            cursors = []
+            for number, term in enumerate(terms):
+                term_idf = idf(sum(src.doc_freq(term) for _, src in sources), n_docs)
+                for base, src in sources:
+                    found = src.impacts(term)
+                    if found is not None:
+                        cursors.append([term_idf, found[0], found[1], base, 0, number])
+            scores = self._accumulate(cursors, limit)
+            top = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+            bases = [base for base, _ in sources]
+            hits = []
+            for doc, score in top:
+                i = bisect.bisect_right(bases, doc) - 1
+                hits.append(Hit(sources[i][1].keys[doc - sources[i][0]], score))
+            return hits
+
+    def _accumulate(self, cursors: List[list], limit: int) -> Dict[int, float]:
+        """Score-at-a-time evaluation over impact-ordered postings (see module docstring)."""
+        scores: Dict[int, float] = {}
+        budget = self.max_postings
+        while cursors and budget > 0:
+            # the chunk with the largest next contribution goes first
+            cursor = max(cursors, key=lambda c: c[0] * c[2][c[4]])
+            term_idf, docs, weights, base, pos, _ = cursor
+            end = min(pos + _CHUNK, len(docs), pos + budget)
+            get = scores.get
+            for doc, weight in zip(docs[pos:end], weights[pos:end]):
+                doc += base
+                scores[doc] = get(doc, 0.0) + term_idf * weight
+            budget -= end - pos
+            cursor[4] = end
+            if end == len(docs):
+                cursors.remove(cursor)
+            if len(scores) >= limit and cursors:
+                # Nothing unread can lift a new document past the current k-th score. A document
+                # lives in one source, so each term adds at most its best head across sources.
+                heads: Dict[int, float] = {}
+                for c in cursors:
+                    heads[c[5]] = max(heads.get(c[5], 0.0), c[0] * c[2][c[4]])
+                if heapq.nlargest(limit, scores.values())[-1] >= sum(heads.values()):
+                    break
+        return scores
+
+
+# ---------------------------------------------------------------------------
+# Process-wide index
+# ---------------------------------------------------------------------------
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+# posts that could not be indexed, by kind ("thread" / "comment"); rebuild to recover them
+index_failures: Counter = Counter()
+
+
+def get_index() -> SearchIndex:
+    """The index at ``SEARCH_INDEX_DIR``, opened on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex()
+    return _index
+
+
+def index_thread(thread_id: str, data: dict) -> None:
+    """Index a new thread; failures are logged, never raised (the post is already stored)."""
+    try:
+        get_index().add_document(
+            thread_id, data.get("body") or "", data.get("title") or "", data.get("tags") or ()
+        )
+    except Exception:  # noqa: BLE001
+        index_failures["thread"] += 1
+        logger.exception("failed to index thread %s", thread_id)
+
+
+def index_comment(thread_id: str, comment_id: str, data: dict) -> None:
+    """Index a new comment; failures are logged, never raised."""
+    try:
+        get_index().add_document(f"{thread_id}/{comment_id}", data.get("body") or "")
+    except Exception:  # noqa: BLE001
+        index_failures["comment"] += 1
+        logger.exception("failed to index comment %s/%s", thread_id, comment_id)
+
+
+__all__ = [
+    "SearchIndex",
+    "Segment",
+    "Hit",
+    "tokenize",
+    "document_terms",
+    "parse_query",
+    "get_index",
+    "index_thread",
+    "index_comment",
+    "index_failures",
+    "SEARCH_MAINTENANCE_SECONDS",
+]
@@ -0,0 +1,118 @@
+"""The built frontend: static files plus the SPA shell (``index.html``) for client-side routes.
+
+Any path the static mount doesn't have (``/planet/earth``, a deep link into the React router)
+gets the shell. ``SpaShell`` keeps it in memory, together with its ETag and its gzip / br
+encodings, so a deep link costs no disk access. Instead of a file watcher, the file's mtime and
+size are re-checked at most every ``SPA_RELOAD_CHECK_SECONDS`` (default 1), and the shell is
+reloaded only when they changed, e.g. after ``./build_frontend.sh`` on a running server.
+"""
+
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.responses import Response
+
+from . import compression
+from .utils import etag_matches
+
+logger = logging.getLogger(__name__)
+
+SPA_RELOAD_CHECK_SECONDS = float(os.getenv("SPA_RELOAD_CHECK_SECONDS", "1"))
+
+# encoding ("" = identity) -> (body, ETag)
+Variants = Dict[str, Tuple[bytes, str]]
+
+
+class SpaShell:
+    """``index.html`` held in memory (all encodings), reloaded when the file changes."""
+
+    def __init__(
+        self,
+        path: Path,
+        check_interval: float = SPA_RELOAD_CHECK_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._variants: Variants = {}
+        self._checked_at = float("-inf")
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload the shell if the file changed since the last load (or ``force``)."""
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            self._checked_at = self._clock()
+            if signature == self._signature and not force:
+                return False
+            data = self.path.read_bytes()
+            digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+            variants: Variants = {"": (data, f'"{digest}"')}
+            for encoding in compression.encodings():
+                packed = compression.compress(data, encoding, compression.MAX_LEVELS[encoding])
+                variants[encoding] = (packed, f'"{digest}-{encoding}"')
+            self._variants, self._signature = variants, signature
+            self.reloads += 1
+        logger.info("loaded SPA shell %s (%d bytes)", self.path, len(data))
+        return True
+
+    def response(self, request: Request) -> Response:
+        if self._clock() - self._checked_at >= self.check_interval:
+            try:
+                self.refresh()
+            except OSError:  # mid-rebuild: keep serving the last good shell
+                logger.warning("SPA shell %s unreadable; serving the cached copy", self.path)
+        variants = self._variants
+        encoding = compression.negotiate(
+            request.headers.get("accept-encoding", ""), [e for e in variants if e]
+        )
+        body, etag = variants[encoding or ""]
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(body, headers=headers, media_type="text/html")
+
+
+def mount_frontend(app: FastAPI, dist_dir: Path) -> Optional[SpaShell]:
+    """Serve ``dist_dir`` at ``/`` with the SPA shell as the 404 fallback (if it was built)."""
+    index_file = dist_dir / "index.html"
+    if not (dist_dir.exists() and index_file.exists()):
+        return None
+    # Serves the .br/.gz variants written by backend/tools/precompress_static.py (run by
+    # build_frontend.sh), with immutable caching for Vite's hashed assets.
+    app.mount(
+        "/",
+        compression.PrecompressedStaticFiles(directory=dist_dir, html=True),
+        name="frontend",
+    )
+    shell = SpaShell(index_file)
+
+    # Client-side routes: StaticFiles (html=True) only serves index.html for directories
+    @app.exception_handler(404)
+    async def spa_fallback(request: Request, exc):  # type: ignore[override]
+        # If path has a dot, probably an asset -> return original 404
+        if "." in request.url.path.split("/")[-1]:
+            return JSONResponse(
+                status_code=404, content={"error": {"code": 404, "message": "Not Found"}}
+            )
+        return shell.response(request)
+
+    return shell
+
+
+__all__ = ["SpaShell", "mount_frontend"]
@@ -0,0 +1 @@
+"""Operational scripts (migrations, backfills), run as ``python -m backend.tools.<name>``."""
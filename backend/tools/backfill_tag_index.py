@@ -0,0 +1,75 @@
+"""Build the ``tags/{tag}/threads`` index and ``tags/{tag}`` counts for existing threads.
+
+Tag feeds read only the index, so threads created before it existed are invisible under their
+tags until this has run. Walks ``threads`` in id order a page at a time, rewrites each thread's
+index entries from the thread document (safe to re-run; it also repairs bare entries left by
+comments on unindexed threads), then overwrites every tag's ``thread_count`` with the total
+seen. Threads created while it runs are counted by their own write and may be counted again
+here; a later re-run settles the numbers.
+
+Usage:
+    python -m backend.tools.backfill_tag_index [--dry-run] [--page-size 200]
+"""
+
+from __future__ import annotations
+import argparse
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from .. import repositories
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TagIndexReport:
+    scanned: int = 0
+    entries: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+def backfill_tag_index(
+    repos: Optional[repositories.Repositories] = None,
+    page_size: int = 200,
+    dry_run: bool = False,
+) -> TagIndexReport:
+    repos = repos or repositories.get_repositories()
+    report = TagIndexReport()
+    counts: Counter = Counter()
+    after: Optional[str] = None
+    while True:
+        page = repos.threads.scan(page_size, after)
+        report.scanned += len(page)
+        for _, data in page:
+            tags = set(data.get("tags") or ())
+            counts.update(tags)
+            report.entries += len(tags)
+        if page and not dry_run:
+            repos.threads.index_tags(page)
+        if len(page) < page_size:
+            break
+        after = page[-1][0]
+    report.counts = dict(counts)
+    if counts and not dry_run:
+        repos.threads.set_tag_counts(report.counts)
+    logger.info("indexed %d threads under %d tags", report.scanned, len(counts))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only count entries and tags")
+    parser.add_argument("--page-size", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    report = backfill_tag_index(page_size=args.page_size, dry_run=args.dry_run)
+    verb = "would write" if args.dry_run else "wrote"
+    print(f"scanned {report.scanned} threads, {verb} {report.entries} index entries "
+          f"for {len(report.counts)} tags")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Create ``usernames/{username_lower}`` reservations for profiles that predate them.
+
+Walks ``users`` in uid order, a page at a time, and claims each profile's username. Safe to
+re-run: a reservation already held by the same uid counts as claimed. When two legacy profiles
+share a username (possible under the old query-based check), the first one reached keeps it
+and the others are reported for manual renaming. ``--dry-run`` writes nothing but reports the
+same totals, including conflicts between legacy profiles not yet reserved.
+
+Usage:
+    python -m backend.tools.backfill_usernames [--dry-run] [--page-size 500]
+"""
+
+from __future__ import annotations
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .. import repositories
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackfillReport:
+    scanned: int = 0
+    claimed: int = 0
+    skipped: int = 0  # profiles without a username
+    conflicts: List[Tuple[str, str]] = field(default_factory=list)  # (uid, username_lower)
+
+
+def backfill_usernames(
+    repos: Optional[repositories.Repositories] = None,
+    page_size: int = 500,
+    dry_run: bool = False,
+) -> BackfillReport:
+    repos = repos or repositories.get_repositories()
+    users = repos.users
+    report = BackfillReport()
+    after: Optional[str] = None
+    # dry run: username_lower -> uid that holds (or would claim) it, as the real run would
+    seen: Dict[str, str] = {}
+    while True:
+        page = users.scan(page_size, after)
+        for uid, profile in page:
+            report.scanned += 1
+            username = profile.get("username") or ""
+            username_lower = profile.get("username_lower") or username.lower()
+            if not username_lower:
+                report.skipped += 1
+                continue
+            if dry_run:
+                if username_lower not in seen:
+                    seen[username_lower] = users.username_holder(username_lower) or uid
+                claimed = seen[username_lower] == uid
+            else:
+                claimed = users.reserve_username(username_lower, uid, username)
+            if claimed:
+                report.claimed += 1
+            else:
+                report.conflicts.append((uid, username_lower))
+                logger.warning("username %r of %s is reserved by another user", username_lower, uid)
+        if len(page) < page_size:
+            return report
+        after = page[-1][0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be claimed")
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    report = backfill_usernames(page_size=args.page_size, dry_run=args.dry_run)
+    print(f"scanned {report.scanned}, {'would claim' if args.dry_run else 'claimed'} "
+          f"{report.claimed}, skipped {report.skipped} without username, "
+          f"{len(report.conflicts)} conflicts")
+    for uid, username_lower in report.conflicts:
+        print(f"  conflict: {uid} wants {username_lower!r}")
+
+
+if __name__ == "__main__":
+    main()
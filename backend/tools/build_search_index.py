@@ -0,0 +1,91 @@
+"""Build a search index from every thread and comment in Firestore.
+
+The live index is maintained incrementally by ``create_thread`` / ``add_comment``; run this to
+create one for posts that predate search, or to start over after changing the tokenizer or
+weights in ``backend/search.py``. It writes segments straight into ``--out`` (which must be
+empty unless ``--force``) without going through the write-ahead log; point
+``SEARCH_INDEX_DIR`` at it once it is done. Posts created while it runs are indexed by the app
+into the old directory only, so build during a quiet period.
+
+Usage:
+    python -m backend.tools.build_search_index [--out search-index] [--page-size 500]
+"""
+
+from __future__ import annotations
+import argparse
+import logging
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+from .. import repositories
+from ..search import SEARCH_INDEX_DIR, SearchIndex, TermFreqs, document_terms
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BuildReport:
+    threads: int = 0
+    comments: int = 0
+
+
+def _documents(
+    repos: repositories.Repositories, page_size: int, report: BuildReport
+) -> Iterator[Tuple[str, TermFreqs, int]]:
+    after_thread: Optional[str] = None
+    while True:
+        page = repos.threads.scan(page_size, after_thread)
+        for thread_id, data in page:
+            report.threads += 1
+            terms = document_terms(
+                data.get("body") or "", data.get("title") or "", data.get("tags") or ()
+            )
+            yield (thread_id, *terms)
+        if len(page) < page_size:
+            break
+        after_thread = page[-1][0]
+
+    after_comment: Optional[repositories.CommentKey] = None
+    while True:
+        page = repos.comments.scan(page_size, after_comment)
+        for thread_id, comment_id, data in page:
+            report.comments += 1
+            yield (f"{thread_id}/{comment_id}", *document_terms(data.get("body") or ""))
+        if len(page) < page_size:
+            break
+        after_comment = page[-1][:2]
+
+
+def build_search_index(
+    index: SearchIndex,
+    repos: Optional[repositories.Repositories] = None,
+    page_size: int = 500,
+) -> BuildReport:
+    repos = repos or repositories.get_repositories()
+    report = BuildReport()
+    index.bulk_add(_documents(repos, page_size, report))
+    index.compact()
+    logger.info("indexed %d threads and %d comments", report.threads, report.comments)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=SEARCH_INDEX_DIR, help="index directory")
+    parser.add_argument("--force", action="store_true", help="delete an existing index first")
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if os.path.isdir(args.out) and os.listdir(args.out):
+        if not args.force:
+            parser.error(f"{args.out} is not empty (use --force to replace it)")
+        shutil.rmtree(args.out)
+    report = build_search_index(SearchIndex(args.out), page_size=args.page_size)
+    print(f"indexed {report.threads} threads and {report.comments} comments into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
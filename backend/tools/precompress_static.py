@@ -0,0 +1,86 @@
+"""Write ``.br`` / ``.gz`` variants next to the compressible files of the built frontend.
+
+Run after ``vite build`` (``build_frontend.sh`` does): ``PrecompressedStaticFiles`` (see
+``backend/compression.py``) then serves the variants to clients that accept them, so no static
+file is compressed per request. Compression runs once, at the strongest settings: gzip level 9
+and, when the ``brotli`` package is installed, brotli quality 11. Files smaller than
+``--min-size`` are skipped, and so is any variant that would not save at least 5%. A variant
+newer than its source is kept, so re-running is cheap.
+
+Usage:
+    python -m backend.tools.precompress_static [--dist frontend/dist] [--min-size 256]
+"""
+
+from __future__ import annotations
+import argparse
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from .. import compression
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIST = Path(__file__).resolve().parents[2] / "frontend" / "dist"
+
+
+@dataclass
+class PrecompressReport:
+    files_scanned: int = 0
+    variants_written: int = 0
+    variants_current: int = 0
+    bytes_in: int = 0  # sources that got at least one variant
+    bytes_out: int = 0  # their smallest variant
+
+
+def precompress_static(dist: Path = DEFAULT_DIST, min_size: int = 256) -> PrecompressReport:
+    report = PrecompressReport()
+    for path in sorted(Path(dist).rglob("*")):
+        if not path.is_file() or path.suffix not in compression.COMPRESSIBLE_EXTENSIONS:
+            continue
+        report.files_scanned += 1
+        source = path.stat()
+        if source.st_size < min_size:
+            continue
+        data = None
+        smallest = source.st_size
+        for encoding in compression.encodings():
+            variant = path.with_name(path.name + compression.SUFFIXES[encoding])
+            if variant.exists() and variant.stat().st_mtime >= source.st_mtime:
+                report.variants_current += 1
+                smallest = min(smallest, variant.stat().st_size)
+                continue
+            data = path.read_bytes() if data is None else data
+            packed = compression.compress(data, encoding, compression.MAX_LEVELS[encoding])
+            if len(packed) > len(data) * 0.95:
+                if variant.exists():
+                    variant.unlink()  # an older build's variant would be served otherwise
+                continue
+            tmp = variant.with_name(variant.name + ".tmp")
+            tmp.write_bytes(packed)
+            os.replace(tmp, variant)
+            report.variants_written += 1
+            smallest = min(smallest, len(packed))
+        if smallest < source.st_size:
+            report.bytes_in += source.st_size
+            report.bytes_out += smallest
+    logger.info("precompressed %s: %s", dist, report)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dist", type=Path, default=DEFAULT_DIST)
+    parser.add_argument("--min-size", type=int, default=256)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    report = precompress_static(args.dist, args.min_size)
+    print(f"{args.dist}: {report.variants_written} variants written "
+          f"({report.variants_current} already current) for {report.files_scanned} files; "
+          f"{report.bytes_in:,} -> {report.bytes_out:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
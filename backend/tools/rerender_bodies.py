@@ -0,0 +1,118 @@
+"""Re-render ``body_html`` for threads and comments rendered by an older configuration.
+
+Every write stores ``body_html`` together with the ``render_version`` that produced it (see
+``backend/render.py``). After upgrading markdown-it, changing the render options, the
+allow-list or the sanitizer engine, ``RENDER_VERSION`` changes and this job walks ``threads``
+and then all ``comments`` (one collection-group query per page), re-rendering each stale
+document from its stored ``body`` and writing a page of updates in one batch. Documents
+already at the current version are skipped, so the job is safe to re-run or resume; rows from
+before server-side rendering (no ``render_version``) are filled in the same way. Threads at the
+current version but without an ``excerpt`` (written before excerpts were stored) only get their
+excerpt, cut from the stored ``body_html``; changing ``EXCERPT_CHARS`` needs ``--force``.
+
+Serving processes keep cached threads for up to ``THREAD_CACHE_TTL_SECONDS`` afterwards.
+
+Usage:
+    python -m backend.tools.rerender_bodies [--dry-run] [--force] [--page-size 200]
+"""
+
+from __future__ import annotations
+import argparse
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .. import repositories
+from ..render import RENDER_VERSION, excerpt, rendered_fields, thread_rendered_fields
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RerenderReport:
+    threads_scanned: int = 0
+    threads_rendered: int = 0
+    threads_excerpted: int = 0  # excerpt added, body_html already current
+    comments_scanned: int = 0
+    comments_rendered: int = 0
+
+
+def _stale(data: Dict[str, Any], force: bool) -> bool:
+    return force or data.get("render_version") != RENDER_VERSION
+
+
+def _thread_update(data: Dict[str, Any], force: bool) -> Optional[Dict[str, Any]]:
+    if _stale(data, force):
+        return thread_rendered_fields(data.get("body") or "")
+    if "excerpt" not in data:
+        return {"excerpt": excerpt(data.get("body_html") or "")}
+    return None
+
+
+def rerender_bodies(
+    repos: Optional[repositories.Repositories] = None,
+    page_size: int = 200,
+    force: bool = False,
+    dry_run: bool = False,
+) -> RerenderReport:
+    repos = repos or repositories.get_repositories()
+    report = RerenderReport()
+
+    after_thread: Optional[str] = None
+    while True:
+        page = repos.threads.scan(page_size, after_thread)
+        updates = {}
+        for thread_id, data in page:
+            update = _thread_update(data, force)
+            if update is not None:
+                updates[thread_id] = update
+        rendered = sum(1 for fields in updates.values() if "body_html" in fields)
+        report.threads_scanned += len(page)
+        report.threads_rendered += rendered
+        report.threads_excerpted += len(updates) - rendered
+        if updates and not dry_run:
+            repos.threads.update_many(updates)
+        if len(page) < page_size:
+            break
+        after_thread = page[-1][0]
+
+    after_comment: Optional[repositories.CommentKey] = None
+    while True:
+        page = repos.comments.scan(page_size, after_comment)
+        updates = {
+            (thread_id, comment_id): rendered_fields(data.get("body") or "")
+            for thread_id, comment_id, data in page
+            if _stale(data, force)
+        }
+        report.comments_scanned += len(page)
+        report.comments_rendered += len(updates)
+        if updates and not dry_run:
+            repos.comments.update_many(updates)
+        if len(page) < page_size:
+            break
+        after_comment = page[-1][:2]
+
+    logger.info("render version %s: %s", RENDER_VERSION, report)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only count stale documents")
+    parser.add_argument(
+        "--force", action="store_true", help="re-render every document, not just stale ones"
+    )
+    parser.add_argument("--page-size", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    report = rerender_bodies(page_size=args.page_size, force=args.force, dry_run=args.dry_run)
+    verb = "would re-render" if args.dry_run else "re-rendered"
+    print(f"render version {RENDER_VERSION}: {verb} {report.threads_rendered} of "
+          f"{report.threads_scanned} threads and {report.comments_rendered} of "
+          f"{report.comments_scanned} comments; {report.threads_excerpted} threads "
+          f"{'would get' if args.dry_run else 'got'} an excerpt only")
+
+
+if __name__ == "__main__":
+    main()
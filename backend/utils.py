@@ -1,32 +1,40 @@
-"""Utility helpers: content sanitization, future scoring placeholders."""
+"""Utility helpers: content sanitization, HTTP validators, future scoring placeholders."""
 
 from __future__ import annotations
-import bleach
-
-ALLOWED_TAGS = [
-    "b",
-    "i",
-    "em",
-    "strong",
-    "code",
-    "pre",
-    "a",
-    "ul",
-    "ol",
-    "li",
-    "p",
-    "br",
-    "blockquote",
-]
-ALLOWED_ATTRS = {"a": ["href", "title", "rel"]}
+import hashlib
+from typing import Any, Optional
+
+from .sanitize import ALLOWED_ATTRS, ALLOWED_TAGS, sanitize
 
 
 def sanitize_markdown(text: str) -> str:
     """Sanitize user-supplied markdown/HTML snippet.
 
-    We accept a conservative set of tags; all scripts/events removed.
+    We accept a conservative set of tags; all scripts/events removed. See ``sanitize.py`` for
+    the engine and memoization.
     """
-    return bleach.clean(text, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=True)
+    return sanitize(text)
+
+
+def weak_etag(*parts: Any) -> str:
+    """Weak ETag over the given version fields (e.g. updated_at, comment_count)."""
+    digest = hashlib.blake2b(
+        "|".join(str(p) for p in parts).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag`` (RFC 9110 §13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
 
 
-__all__ = ["sanitize_markdown"]
+__all__ = ["sanitize_markdown", "weak_etag", "etag_matches", "ALLOWED_TAGS", "ALLOWED_ATTRS"]
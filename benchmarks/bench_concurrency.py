@@ -0,0 +1,128 @@
+"""Concurrency benchmark: p99 latency of concurrent GET /threads requests.
+
+Firestore is replaced by an in-memory repository whose queries sleep for a fixed round-trip time, so the
+numbers isolate how the worker schedules blocking data access rather than network jitter.
+
+Usage:
+    python -m benchmarks.bench_concurrency [--requests 200] [--rtt-ms 20] [--mode both]
+
+``--mode inline`` runs the blocking calls directly on the event loop (the pre-executor
+behaviour) for comparison with the default executor path.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("FIREBASE_PROJECT_ID", "bench-project")
+os.environ.setdefault("ALLOWED_ORIGINS", "*")
+
+import httpx  # noqa: E402
+
+from backend import firebase, repositories  # noqa: E402
+from backend.main import create_app  # noqa: E402
+
+
+class _SlowThreadRepository(repositories.InMemoryThreadRepository):
+    """In-memory thread repository whose queries block for a fixed round-trip time."""
+
+    def __init__(self, store, stats, rtt: float):
+        super().__init__(store, stats)
+        self.rtt = rtt
+
+    def list(self, tag, limit, cursor=None, fields=None):
+        time.sleep(self.rtt)  # blocking, like the gRPC client
+        return super().list(tag, limit, cursor, fields)
+
+
+def _seeded_repositories(rtt: float, size: int = 20) -> repositories.Repositories:
+    store = repositories.InMemoryStore()
+    repos = repositories.in_memory_repositories(store)
+    repos.threads = _SlowThreadRepository(store, repos.stats, rtt)
+    now = time.time()
+    for i in range(size):
+        repos.threads.create(
+            {
+                "title": f"Thread {i}",
+                "body": "body " * 40,
+                "tags": ["bench"],
+                "author_uid": "u1",
+                "author_mode": "public",
+                "comment_count": i,
+                "last_activity": now - i,
+                "created_at": now - i,
+                "updated_at": now - i,
+            }
+        )
+    return repos
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+async def _run(mode: str, requests: int, rtt: float) -> dict[str, float]:
+    repos = _seeded_repositories(rtt)
+    original_get_repos, original_run_db = repositories.get_repositories, firebase.run_db
+    repositories.get_repositories = lambda: repos  # type: ignore[assignment]
+    if mode == "inline":
+
+        async def _inline(fn, *args, **kwargs):
+            return fn(*args, **kwargs)
+
+        firebase.run_db = _inline  # type: ignore[assignment]
+    try:
+        app = create_app()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.get("/threads")  # warm-up (executor threads, route compilation)
+
+            # Every request is issued at the same instant, so latency is measured from that shared
+            # start: with a blocked event loop later requests queue behind earlier ones.
+            async def one(start: float) -> float:
+                r = await client.get("/threads")
+                assert r.status_code == 200, r.text
+                return (time.perf_counter() - start) * 1000
+
+            wall = time.perf_counter()
+            latencies = await asyncio.gather(*(one(wall) for _ in range(requests)))
+            wall = time.perf_counter() - wall
+    finally:
+        repositories.get_repositories = original_get_repos  # type: ignore[assignment]
+        firebase.run_db = original_run_db  # type: ignore[assignment]
+        firebase.shutdown_executor()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": max(latencies),
+        "req_per_s": requests / wall,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    parser.add_argument("--mode", choices=["executor", "inline", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["inline", "executor"] if args.mode == "both" else [args.mode]
+    print(f"{args.requests} concurrent GET /threads, simulated Firestore RTT {args.rtt_ms:.0f} ms")
+    for mode in modes:
+        stats = asyncio.run(_run(mode, args.requests, args.rtt_ms / 1000))
+        print(
+            f"  {mode:<9} p50={stats['p50_ms']:8.1f} ms  p99={stats['p99_ms']:8.1f} ms  "
+            f"max={stats['max_ms']:8.1f} ms  throughput={stats['req_per_s']:8.1f} req/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
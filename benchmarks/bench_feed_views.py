@@ -0,0 +1,110 @@
+"""Benchmark feed views: bytes read and served per page for ``view=full`` vs ``view=summary``.
+
+Seeds the in-memory repositories with threads shaped like real posts (bodies of a few KB,
+rendered once at write time) and builds the first page of ``GET /threads`` both ways:
+
+- ``full``: every stored field is read and ``ThreadOut`` (body + body_html) is served.
+- ``summary``: the listing reads the ``THREAD_SUMMARY_FIELDS`` projection (Firestore
+  ``select()``) and serves ``ThreadSummary`` (stored excerpt instead of the body).
+
+"read" is the JSON size of the documents the query returns (a proxy for what crosses the wire
+from Firestore), "served" the response body, "build" the time to turn the read documents into
+that body.
+
+Usage:
+    python -m benchmarks.bench_feed_views [--threads 200] [--limit 20] [--body-chars 3000]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend import repositories  # noqa: E402
+from backend.render import thread_rendered_fields  # noqa: E402
+from backend.responses import ModelResponse  # noqa: E402
+from backend.schemas import (  # noqa: E402
+    THREAD_SUMMARY_FIELDS,
+    ThreadSummariesPage,
+    ThreadsPage,
+    thread_out,
+    thread_summary,
+)
+
+WORDS = "the a async cache query index latency python fastapi firestore shard token".split()
+
+
+def seed(threads: int, body_chars: int) -> repositories.Repositories:
+    rng = random.Random(7)
+    repos = repositories.in_memory_repositories(repositories.InMemoryStore())
+    for i in range(threads):
+        text = ""
+        while len(text) < body_chars:
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+            text += f"Some **{words}** with `code` and a [link](https://example.com/{i}).\n\n"
+        repos.threads.create(
+            {
+                "title": f"Thread {i}: {' '.join(rng.choice(WORDS) for _ in range(6))}",
+                "body": text,
+                **thread_rendered_fields(text),
+                "tags": rng.sample(WORDS, 3),
+                "author_uid": f"user{i % 13}",
+                "author_mode": "public",
+                "comment_count": 0,
+                "last_activity": 1.7e9 + i,
+                "created_at": 1.7e9 + i,
+                "updated_at": 1.7e9 + i,
+            }
+        )
+    return repos
+
+
+def measure(docs, page_model, build, rounds: int):
+    def body():
+        return ModelResponse(page_model(items=[build(tid, d) for tid, d in docs])).body
+
+    served = body()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        body()
+    return len(served), (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--body-chars", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    repos = seed(args.threads, args.body_chars)
+    views = {
+        "full": (None, ThreadsPage, thread_out),
+        "summary": (THREAD_SUMMARY_FIELDS, ThreadSummariesPage, thread_summary),
+    }
+    results = {}
+    print(f"first page of {args.limit} threads, bodies ~{args.body_chars:,} chars")
+    for name, (fields, page_model, build) in views.items():
+        docs = repos.threads.list(None, args.limit, fields=fields)
+        read = sum(len(json.dumps(d)) for _, d in docs)
+        served, per_page = measure(docs, page_model, build, args.rounds)
+        results[name] = (read, served)
+        print(
+            f"  {name:<8} read {read:>9,} B  served {served:>9,} B  "
+            f"build {per_page * 1e6:7.0f} us/page"
+        )
+    (full_read, full_served), (sum_read, sum_served) = results["full"], results["summary"]
+    print(
+        f"  summary: {full_read / sum_read:.1f}x less read, "
+        f"{full_served / sum_served:.1f}x less served"
+    )
+
+
+if __name__ == "__main__":
+    main()
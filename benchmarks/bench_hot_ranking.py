@@ -0,0 +1,59 @@
+"""Benchmark the hot-feed scorer over synthetic threads.
+
+Usage:
+    python -m benchmarks.bench_hot_ranking [--threads 100000] [--top 100] [--runs 5]
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.ranking import rank_hot  # noqa: E402
+
+
+def synthetic_threads(n: int, now: float, seed: int = 7):
+    rng = random.Random(seed)
+    threads = []
+    for i in range(n):
+        created = now - rng.expovariate(1 / (3 * 86400))  # mean age 3 days
+        threads.append(
+            (
+                f"t{i}",
+                {
+                    "comment_count": int(rng.paretovariate(1.2)) - 1,
+                    "created_at": created,
+                    "last_activity": rng.uniform(created, now),
+                },
+            )
+        )
+    return threads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=100_000)
+    parser.add_argument("--top", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    now = time.time()
+    threads = synthetic_threads(args.threads, now)
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        ranked = rank_hot(threads, now, args.top)
+        timings.append(time.perf_counter() - start)
+    best, median = min(timings), statistics.median(timings)
+    print(f"rank_hot over {args.threads:,} threads -> top {len(ranked)}")
+    print(f"  best {best * 1000:8.1f} ms  median {median * 1000:8.1f} ms  "
+          f"({args.threads / median / 1e6:.2f} M threads/s, {median / args.threads * 1e9:.0f} ns/thread)")
+
+
+if __name__ == "__main__":
+    main()
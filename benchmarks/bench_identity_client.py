@@ -0,0 +1,157 @@
+"""Benchmark login throughput against a local HTTPS stub of the Identity Toolkit API.
+
+"before" opens a new ``httpx.AsyncClient`` per call (TCP + TLS handshake every time), as the
+auth routes used to; "after" goes through ``routes.auth._sign_in_with_password`` and the
+pooled ``backend.identity`` client. The stub runs under uvicorn in a separate process with a
+throwaway self-signed certificate.
+
+Usage:
+    python -m benchmarks.bench_identity_client [--logins 500] [--concurrency 20]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import json
+import multiprocessing as mp
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+async def stub_app(scope, receive, send):
+    """signInWithPassword only; always succeeds."""
+    if scope["type"] != "http":
+        return
+    while (await receive()).get("more_body"):
+        pass
+    body = json.dumps({"idToken": "id", "refreshToken": "ref", "expiresIn": "3600"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def write_cert(directory: str):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as fh:
+        fh.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as fh:
+        fh.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+
+def serve(port: int, cert_path: str, key_path: str) -> None:
+    import uvicorn
+
+    uvicorn.run(stub_app, host="127.0.0.1", port=port, log_level="warning",
+                ssl_certfile=cert_path, ssl_keyfile=key_path)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run(login, logins: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            await login()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    cert_path, key_path = write_cert(tempfile.mkdtemp())
+    os.environ["SSL_CERT_FILE"] = cert_path  # httpx trusts the stub's certificate
+    os.environ["FIREBASE_WEB_API_KEY"] = "bench"
+    port = free_port()
+    server = mp.Process(target=serve, args=(port, cert_path, key_path), daemon=True)
+    server.start()
+    base = f"https://127.0.0.1:{port}/v1"
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    import httpx
+    from backend import identity
+    from backend.routes import auth
+
+    identity.IDENTITY_BASE = base
+    url = f"{base}/accounts:signInWithPassword?key=bench"
+    payload = {"email": "a@example.com", "password": "pw", "returnSecureToken": True}
+
+    async def before():
+        async with httpx.AsyncClient(timeout=10) as client:
+            (await client.post(url, json=payload)).raise_for_status()
+
+    async def after():
+        await auth._sign_in_with_password("a@example.com", "pw")
+
+    async def after_run():
+        try:
+            return await run(after, args.logins, args.concurrency)
+        finally:
+            await identity.aclose()
+
+    print(f"{args.logins} logins, concurrency {args.concurrency}, "
+          f"http2={'on' if identity.http2_enabled() else 'off (pip install httpx[http2])'}")
+    for label, coro in (
+        ("before: client per call", lambda: run(before, args.logins, args.concurrency)),
+        ("after: pooled client", after_run),
+    ):
+        wall = asyncio.run(coro())
+        print(f"  {label:<24} {args.logins / wall:8.0f} logins/s  ({wall * 1000 / args.logins:.2f} ms/login)")
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark the live comment hub: fan-out of new comments to thousands of stream subscribers.
+
+Every subscriber is a task that drains its queue the way a stream's response writer does. For
+each subscriber count it publishes comments one at a time and reports the cost of ``publish``
+(encode once + enqueue to every queue) and the delay until the last subscriber has the frame.
+Firestore is replaced by the in-memory repositories; the read counts compare one listener per
+thread with every viewer polling ``GET /threads/{id}/comments``.
+
+The burst section publishes 100 comments on one thread in one worker's hub and counts what
+reaches 1,000 subscribers on a second hub over the Unix-socket broadcast: messages on the
+socket and queued writes per subscriber.
+
+Usage:
+    python -m benchmarks.bench_live [--subscribers 1000,5000,10000] [--comments 50]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("FIREBASE_PROJECT_ID", "bench-project")
+
+from backend import live, repositories  # noqa: E402
+from backend.broadcast import UnixSocketBroadcast  # noqa: E402
+
+POLL_INTERVAL = 5.0  # seconds between polls of a client without a stream
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+async def run(subscribers: int, comments: int) -> None:
+    hub = live.Hub(queue_size=live.LIVE_QUEUE_SIZE, max_subscribers=subscribers)
+    subs = [hub.subscribe("t1") for _ in range(subscribers)]
+    remaining = [0]
+    done = asyncio.Event()
+
+    async def consume(sub):
+        async for _ in hub.events(sub):
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+
+    consumers = [asyncio.create_task(consume(s)) for s in subs]
+    await asyncio.sleep(0)  # every consumer yields its retry frame and waits on its queue
+    publish, delivery = [], []
+    for i in range(comments):
+        data = {
+            "body": "a new reply " * 20,
+            "author_uid": "u1",
+            "author_mode": "public",
+            "created_at": time.time(),
+            "score": 0.0,
+        }
+        remaining[0] = subscribers
+        done.clear()
+        start = time.perf_counter()
+        hub.publish("t1", f"c{i}", data)
+        publish.append(time.perf_counter() - start)
+        await done.wait()
+        delivery.append(time.perf_counter() - start)
+    await hub.close_all()
+    await asyncio.gather(*consumers)
+
+    pub50, pub99 = percentiles(publish)
+    del50, del99 = percentiles(delivery)
+    print(
+        f"{subscribers:>7,} subs  publish p50 {pub50 * 1e3:6.2f} ms p99 {pub99 * 1e3:6.2f} ms"
+        f"  all delivered p50 {del50 * 1e3:6.1f} ms p99 {del99 * 1e3:6.1f} ms"
+        f"  dropped {hub.dropped}"
+    )
+    print(
+        f"          Firestore reads/min for one thread: polling every {POLL_INTERVAL:.0f}s "
+        f"{subscribers * 60 / POLL_INTERVAL:,.0f}, listener 1 per new comment"
+    )
+
+
+async def burst(subscribers: int = 1000, comments: int = 100) -> None:
+    with tempfile.TemporaryDirectory(prefix="bench-live-") as directory:
+        path = os.path.join(directory, "live.sock")
+        writer, reader = live.Hub(heartbeat=0), live.Hub(heartbeat=0)
+        await writer.start_broadcast(UnixSocketBroadcast(path))
+        await reader.start_broadcast(UnixSocketBroadcast(path))
+        while not writer.broadcast._peers:
+            await asyncio.sleep(0.01)
+        subs = [reader.subscribe("t1") for _ in range(subscribers)]
+        comment = {"body": "reply", "author_mode": "public", "author_uid": "u1"}
+        start = time.perf_counter()
+        for i in range(comments):
+            writer.publish("t1", f"c{i}", {**comment, "created_at": time.time()})
+        while not subs[-1].queue.qsize():
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        writes = sum(s.queue.qsize() for s in subs)
+        frames = sum(s.queue.get_nowait().count(b"event: comment") for s in subs)
+        print(
+            f"burst of {comments} comments -> {writer.broadcast.sent} socket message(s), "
+            f"{writes / subscribers:.0f} queued write(s) per subscriber "
+            f"({frames // subscribers} frames each) across {subscribers:,} subscribers "
+            f"on another worker in {elapsed * 1e3:.0f} ms "
+            f"(incl. {writer.broadcast.interval * 1e3:.0f} ms coalescing window)"
+        )
+        await writer.close_all()
+        await reader.close_all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", default="1000,5000,10000")
+    parser.add_argument("--comments", type=int, default=50)
+    args = parser.parse_args()
+
+    store = repositories.InMemoryStore()
+    store.threads["t1"] = {"title": "bench"}
+    bundle = repositories.in_memory_repositories(store)
+    repositories.get_repositories = lambda: bundle  # the hub's listener uses the in-memory store
+    for count in (int(n) for n in args.subscribers.split(",")):
+        asyncio.run(run(count, args.comments))
+    asyncio.run(burst())
+
+
+if __name__ == "__main__":
+    main()
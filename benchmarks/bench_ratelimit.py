@@ -0,0 +1,75 @@
+"""Benchmark per-request rate-limiter cost as the number of distinct users grows.
+
+Compares ``TokenBucketLimiter`` with the previous fixed-window dict, which rescanned every
+entry once it held more than 5000 keys.
+
+Usage:
+    python -m benchmarks.bench_ratelimit [--users 1000 10000 100000] [--requests 50000]
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.ratelimit import TokenBucketLimiter  # noqa: E402
+
+LIMIT = 120
+
+
+class LegacyLimiter:
+    """The former ``deps.rate_limit`` state handling, minus the HTTP exception."""
+
+    def __init__(self):
+        self.state: Dict[str, tuple] = {}
+
+    def try_acquire(self, uid: str, limit: int) -> float:
+        now = time.time()
+        key = f"{uid}:{int(now // 60)}"
+        start, count = self.state.get(key, (now, 0))
+        if count + 1 > limit:
+            return 1.0
+        self.state[key] = (start, count + 1)
+        if len(self.state) > 5000:
+            old = [k for k, (s, _) in self.state.items() if now - s > 3600]
+            for k in old:
+                self.state.pop(k, None)
+        return 0.0
+
+
+def per_request_ns(limiter, users: int, requests: int) -> float:
+    uids = [f"user{i}" for i in range(users)]
+    if isinstance(limiter, LegacyLimiter):
+        # seeding through try_acquire would rescan on every insert past 5000 keys
+        now = time.time()
+        limiter.state = {f"{uid}:{int(now // 60)}": (now, 1) for uid in uids}
+    else:
+        for uid in uids:  # every user active in the current period
+            limiter.try_acquire(uid, LIMIT)
+    start = time.perf_counter()
+    for i in range(requests):
+        limiter.try_acquire(uids[(i * 7919) % users], LIMIT)
+    return (time.perf_counter() - start) / requests * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--legacy-requests", type=int, default=2_000,
+                        help="fewer samples for the legacy limiter (O(n) per request)")
+    args = parser.parse_args()
+
+    print(f"{'users':>9} {'token bucket':>16} {'legacy':>16}")
+    for users in args.users:
+        bucket = per_request_ns(TokenBucketLimiter(maxsize=max(users, 1)), users, args.requests)
+        legacy = per_request_ns(LegacyLimiter(), users, args.legacy_requests)
+        print(f"{users:>9,} {bucket:>13,.0f} ns {legacy:>13,.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark sanitizer engines over a corpus of 5000-char markdown/HTML bodies.
+
+Compares the previous configuration (a fresh ``bleach.clean`` call per body) with each
+``backend.sanitize`` engine, cold and with the content-hash memo warm.
+
+Usage:
+    python -m benchmarks.bench_sanitize [--bodies 500] [--chars 5000]
+"""
+
+from __future__ import annotations
+import argparse
+import importlib.util
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bleach  # noqa: E402
+
+from backend.sanitize import ALLOWED_ATTRS, ALLOWED_TAGS, Sanitizer  # noqa: E402
+
+FRAGMENTS = [
+    "Plain prose about **async** Python and `asyncio.gather`. ",
+    "<p>Paragraph with <b>bold</b>, <i>italic</i> and <code>inline()</code>.</p>",
+    '<a href="https://example.com/docs" title="docs">a link</a> ',
+    '<a href="javascript:alert(1)" onclick="steal()">bad link</a> ',
+    "<script>document.cookie</script>",
+    '<img src="x" onerror="alert(1)">',
+    "<ul><li>one</li><li>two &amp; three</li></ul>",
+    "<pre><code>def f(x):\n    return x < 3 and x > 1\n</code></pre>",
+    "> quoted reply with a < b & c > d\n\n",
+    '<div style="color:red"><span>nested <em>markup</em></span></div>',
+    "- list item\n- another item\n",
+]
+
+
+def corpus(n: int, chars: int, seed: int = 3):
+    rng = random.Random(seed)
+    bodies = []
+    for i in range(n):
+        parts, size = [f"post {i}: "], 0
+        while size < chars:
+            frag = rng.choice(FRAGMENTS)
+            parts.append(frag)
+            size += len(frag)
+        bodies.append("".join(parts)[:chars])
+    return bodies
+
+
+def timed(fn, bodies) -> float:
+    start = time.perf_counter()
+    for body in bodies:
+        fn(body)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bodies", type=int, default=500)
+    parser.add_argument("--chars", type=int, default=5000)
+    args = parser.parse_args()
+
+    bodies = corpus(args.bodies, args.chars)
+    mb = sum(len(b) for b in bodies) / 1e6
+
+    def report(label: str, seconds: float) -> None:
+        print(f"  {label:<26} {len(bodies) / seconds:9,.0f} bodies/s {mb / seconds:8.1f} MB/s")
+
+    print(f"{len(bodies)} bodies x {args.chars} chars")
+    report("bleach.clean (before)", timed(
+        lambda b: bleach.clean(b, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=True),
+        bodies,
+    ))
+    engines = ["bleach"] + (["nh3"] if importlib.util.find_spec("nh3") else [])
+    for name in engines:
+        sanitizer = Sanitizer(name, cache_size=len(bodies))
+        report(f"{name} (cold memo)", timed(sanitizer, bodies))
+        report(f"{name} (warm memo)", timed(sanitizer, bodies))
+    if "nh3" not in engines:
+        print("  nh3 not installed (pip install nh3)")
+
+
+if __name__ == "__main__":
+    main()
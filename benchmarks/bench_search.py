@@ -0,0 +1,130 @@
+"""Benchmark the search index on synthetic posts (1M by default).
+
+Builds an index with ``bulk_add`` (tokenizing every post), then measures reopening it (mapping
+segments, no rebuild), query latency for rare / common / multi-term / prefix queries, and the
+cost of indexing one post incrementally through the write-ahead log. A linear scan over the
+same posts, the only option without an index, is timed for comparison.
+
+Usage:
+    python -m benchmarks.bench_search [--docs 1000000] [--words 40] [--queries 200]
+"""
+
+from __future__ import annotations
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.search import SearchIndex, document_terms  # noqa: E402
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(LETTERS, k=rng.randint(3, 10))))
+    words = sorted(words)
+    rng.shuffle(words)
+    # Zipf-like frequencies, as cumulative weights so each draw is a bisect, not O(vocabulary)
+    return words, list(itertools.accumulate(1.0 / (rank + 1) for rank in range(size)))
+
+
+def posts(n: int, words_per_post: int, vocab, cum_weights, seed: int = 7):
+    rng = random.Random(seed)
+    for i in range(n):
+        title = " ".join(rng.choices(vocab, cum_weights=cum_weights, k=5))
+        body = " ".join(rng.choices(vocab, cum_weights=cum_weights, k=words_per_post))
+        key = f"t{i // 4}" if i % 4 == 0 else f"t{i // 4}/c{i}"
+        yield key, title, body
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def run(args, vocab, cum_weights, rng, directory: str) -> None:
+    index = SearchIndex(directory)
+
+    start = time.perf_counter()
+    index.bulk_add(
+        (key, *document_terms(body, title))
+        for key, title, body in posts(args.docs, args.words, vocab, cum_weights)
+    )
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    index.compact()
+    compacted = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    print(f"{args.docs:,} posts x {args.words} words, vocabulary {args.vocab:,}")
+    print(f"  bulk build          {built:8.1f} s  ({args.docs / built:,.0f} posts/s)")
+    print(f"  compaction          {compacted:8.1f} s")
+    print(f"  on disk             {size / 1e6:8.1f} MB")
+
+    start = time.perf_counter()
+    reopened = SearchIndex(directory)
+    opened = time.perf_counter() - start
+    print(f"  reopen (mmap)       {opened * 1e3:8.1f} ms  ({reopened.doc_count:,} docs)")
+
+    common, rare = vocab[:50], vocab[len(vocab) // 2 :]
+    query_sets = {
+        "rare term": [rng.choice(rare) for _ in range(args.queries)],
+        "common term": [rng.choice(common) for _ in range(args.queries)],
+        "3 terms": [
+            " ".join(rng.choices(vocab, cum_weights=cum_weights, k=3))
+            for _ in range(args.queries)
+        ],
+        "prefix (3 chars)": [rng.choice(rare)[:3] + "*" for _ in range(args.queries)],
+    }
+    print("  query latency (top 20)      p50        p99")
+    for label, queries in query_sets.items():
+        samples = []
+        for q in queries:
+            start = time.perf_counter()
+            reopened.search(q, 20)
+            samples.append(time.perf_counter() - start)
+        p50, p99 = percentiles(samples)
+        print(f"    {label:<22} {p50 * 1e3:7.2f} ms {p99 * 1e3:8.2f} ms")
+
+    samples = []
+    for i, (key, title, body) in enumerate(posts(200, args.words, vocab, cum_weights, seed=99)):
+        start = time.perf_counter()
+        reopened.add_document(f"new{i}", body, title)
+        samples.append(time.perf_counter() - start)
+    p50, p99 = percentiles(samples)
+    print(f"  incremental add     p50 {p50 * 1e6:7.0f} us  p99 {p99 * 1e6:7.0f} us")
+
+    # Without an index every query scans every post; time it on a sample and extrapolate.
+    sample = [
+        body for _, _, body in posts(min(args.docs, 100_000), args.words, vocab, cum_weights)
+    ]
+    needle = f" {rare[0]} "
+    start = time.perf_counter()
+    sum(1 for body in sample if needle in body)
+    scan = (time.perf_counter() - start) * args.docs / len(sample)
+    print(f"  linear scan (no index, substring only) ~{scan * 1e3:,.0f} ms per query")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    vocab, cum_weights = vocabulary(args.vocab, rng)
+    with tempfile.TemporaryDirectory(prefix="bench-search-") as directory:
+        run(args, vocab, cum_weights, rng, directory)
+
+
+if __name__ == "__main__":
+    main()
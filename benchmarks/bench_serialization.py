@@ -0,0 +1,181 @@
+"""Benchmark page serialization: cost per item of turning stored documents into a JSON body.
+
+Compares, for a page of threads and a page of comments:
+
+- ``kwargs + response_model``: the previous path. One model per document built from keyword
+  arguments, then FastAPI's ``serialize_response`` (re-validation against ``response_model``
+  and ``jsonable_encoder``) and ``JSONResponse`` (stdlib ``json``).
+- ``construct + ModelResponse``: unvalidated ``model_construct`` models, serialized once by
+  pydantic-core.
+- ``validate + ModelResponse``: the current path (``schemas.thread_out`` / ``comment_out``):
+  one pydantic-core validation of each stored dict, serialized once by pydantic-core.
+
+Usage:
+    python -m benchmarks.bench_serialization [--items 50] [--rounds 400]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from backend.render import rendered_fields  # noqa: E402
+from backend.responses import ModelResponse  # noqa: E402
+from backend.schemas import (  # noqa: E402
+    CommentOut,
+    CommentsPage,
+    ThreadOut,
+    ThreadsPage,
+    comment_out,
+    mask_author_uid,
+    thread_out,
+)
+
+THREAD_FIELDS = [f for f in ThreadOut.model_fields if f != "author"]
+COMMENT_FIELDS = [f for f in CommentOut.model_fields if f != "author"]
+
+
+def thread_docs(n: int):
+    body = "Some **markdown** with a [link](https://example.com) and `code`. " * 8
+    return [
+        (
+            f"thread{i:04d}",
+            {
+                "title": f"Thread number {i} about things",
+                "body": body,
+                **rendered_fields(body),
+                "tags": ["python", "fastapi", "perf"],
+                "author_uid": f"user{i % 7}",
+                "author_mode": "anon" if i % 3 == 0 else "public",
+                "comment_count": i,
+                "last_activity": 1.7e9 + i,
+                "created_at": 1.7e9 + i,
+                "updated_at": 1.7e9 + i,
+            },
+        )
+        for i in range(n)
+    ]
+
+
+def comment_docs(n: int):
+    body = "A reply that quotes *someone* and adds a thought or two. " * 4
+    return [
+        (
+            f"comment{i:04d}",
+            {
+                "body": body,
+                **rendered_fields(body),
+                "author_uid": f"user{i % 7}",
+                "author_mode": "anon" if i % 3 == 0 else "public",
+                "created_at": 1.7e9 + i,
+                "score": 0.5,
+                "ups": i,
+                "downs": 1,
+            },
+        )
+        for i in range(n)
+    ]
+
+
+def fields(doc_id, data, names):
+    values = {name: data.get(name) for name in names if name in data}
+    values.update(id=doc_id, author_uid=mask_author_uid(data["author_mode"], data["author_uid"]))
+    return values
+
+
+def kwargs_thread(doc_id, data):
+    return ThreadOut(**fields(doc_id, data, THREAD_FIELDS))
+
+
+def kwargs_comment(doc_id, data):
+    return CommentOut(**fields(doc_id, data, COMMENT_FIELDS))
+
+
+def constructed_thread(doc_id, data):
+    return ThreadOut.model_construct(**fields(doc_id, data, THREAD_FIELDS))
+
+
+def constructed_comment(doc_id, data):
+    return CommentOut.model_construct(**fields(doc_id, data, COMMENT_FIELDS))
+
+
+def run_sync(coro):
+    """Drive a coroutine that never suspends (serialize_response with is_coroutine=True)."""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def variants(page_model, docs, kwargs, constructed, validated):
+    field = create_model_field(name="response", type_=page_model, mode="serialization")
+
+    def before():
+        page = page_model(items=[kwargs(i, d) for i, d in docs])
+        content = run_sync(serialize_response(field=field, response_content=page))
+        return JSONResponse(content).body
+
+    def constructed_fast():
+        items = [constructed(i, d) for i, d in docs]
+        return ModelResponse(page_model.model_construct(items=items)).body
+
+    def validated_fast():
+        return ModelResponse(page_model(items=[validated(i, d) for i, d in docs])).body
+
+    return {
+        "kwargs + response_model": before,
+        "construct + ModelResponse": constructed_fast,
+        "validate + ModelResponse": validated_fast,
+    }
+
+
+def timed(fn, rounds: int) -> float:
+    fn()
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=400)
+    args = parser.parse_args()
+
+    pages = {
+        "threads": variants(
+            ThreadsPage, thread_docs(args.items), kwargs_thread, constructed_thread, thread_out
+        ),
+        "comments": variants(
+            CommentsPage, comment_docs(args.items), kwargs_comment, constructed_comment, comment_out
+        ),
+    }
+    for name, paths in pages.items():
+        bodies = {label: fn() for label, fn in paths.items()}
+        assert len({json.dumps(json.loads(b), sort_keys=True) for b in bodies.values()}) == 1
+        print(f"{name} page, {args.items} items ({len(next(iter(bodies.values()))):,} bytes)")
+        baseline = None
+        for label, fn in paths.items():
+            per_page = timed(fn, args.rounds)
+            baseline = baseline or per_page
+            print(
+                f"  {label:<28} {per_page * 1e6:8.0f} us/page "
+                f"{per_page / args.items * 1e6:6.1f} us/item  {baseline / per_page:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
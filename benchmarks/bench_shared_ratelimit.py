@@ -0,0 +1,80 @@
+"""Benchmark global rate-limit enforcement across worker processes.
+
+Each of ``--workers`` processes sends ``--requests`` requests spread over ``--users`` users
+(limit ``--limit`` per minute each). Per-process buckets let every user through ``workers``
+times over; the shared table enforces one limit, and leases keep most requests local.
+
+Usage:
+    python -m benchmarks.bench_shared_ratelimit [--workers 8] [--users 100] [--limit 120]
+"""
+
+from __future__ import annotations
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.ratelimit import (  # noqa: E402
+    LeasedLimiter,
+    SharedMemoryLimiter,
+    TokenBucketLimiter,
+)
+
+
+def _worker(kind, path, users, requests, limit, seed, out):
+    if kind == "memory":
+        limiter = TokenBucketLimiter()
+    elif kind == "shared":
+        limiter = SharedMemoryLimiter(path)
+    else:
+        limiter = LeasedLimiter(SharedMemoryLimiter(path))
+    uids = [f"user{i}" for i in range(users)]
+    allowed = 0
+    start = time.process_time()
+    for i in range(requests):
+        allowed += limiter.try_acquire(("*", uids[(i * 7919 + seed) % users]), limit) == 0.0
+    out.put((allowed, time.process_time() - start))
+
+
+def run(kind, workers, users, requests, limit):
+    path = os.path.join(tempfile.mkdtemp(), "ratelimit.bin")
+    SharedMemoryLimiter(path).reset()
+    out = mp.Queue()
+    procs = [
+        mp.Process(target=_worker, args=(kind, path, users, requests, limit, w, out))
+        for w in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    allowed = sum(r[0] for r in results)
+    per_request = sum(r[1] for r in results) / (workers * requests) * 1e9
+    return allowed, per_request
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=50_000, help="per worker")
+    parser.add_argument("--limit", type=int, default=120)
+    args = parser.parse_args()
+
+    budget = args.users * args.limit
+    print(f"{args.workers} workers x {args.requests:,} requests, {args.users:,} users, "
+          f"limit {args.limit}/min -> global budget {budget:,} (+ refill during the run)")
+    print(f"{'backend':>14} {'allowed':>10} {'x budget':>9} {'cpu/request':>13}")
+    for kind in ("memory", "shared", "shared+lease"):
+        allowed, ns = run(kind, args.workers, args.users, args.requests, args.limit)
+        print(f"{kind:>14} {allowed:>10,} {allowed / budget:>8.2f}x {ns:>10,.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark deep-link throughput: SPA shell from memory vs a FileResponse per request.
+
+Builds a fake ``frontend/dist`` (an ``index.html`` the size of a Vite shell plus hashed assets)
+and requests client-side routes (``/planet/<n>``) through the full ASGI stack
+(``httpx.AsyncClient`` over ``ASGITransport``, no sockets), ``--concurrency`` at a time:
+
+- ``FileResponse``: the previous fallback, ``index_file.exists()`` + ``FileResponse`` per miss
+  (a stat, an open and a threadpool read for every deep link).
+- ``SpaShell``: ``backend.spa.mount_frontend``, the shell held in memory with its ETag and
+  gzip/br variants, re-stat'ed at most once a second.
+- ``SpaShell + If-None-Match``: a browser revalidating a cached shell (304, no body).
+
+Usage:
+    python -m benchmarks.bench_spa_shell [--requests 5000] [--concurrency 50]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import FileResponse, JSONResponse  # noqa: E402
+from fastapi.staticfiles import StaticFiles  # noqa: E402
+
+from backend import spa  # noqa: E402
+
+SHELL = (
+    '<!doctype html>\n<html lang="en">\n  <head>\n    <meta charset="UTF-8" />\n'
+    '    <link rel="icon" type="image/svg+xml" href="/vite.svg" />\n'
+    '    <meta name="viewport" content="width=device-width, initial-scale=1.0" />\n'
+    "    <title>TechSpace</title>\n"
+    '    <script type="module" crossorigin src="/assets/index-Bq3x_9Zk.js"></script>\n'
+    '    <link rel="stylesheet" crossorigin href="/assets/index-D4fQ1v_a.css">\n'
+    '  </head>\n  <body>\n    <div id="root"></div>\n  </body>\n</html>\n'
+)
+
+
+def build_dist(root: Path) -> Path:
+    dist = root / "dist"
+    (dist / "assets").mkdir(parents=True)
+    (dist / "index.html").write_text(SHELL)
+    (dist / "assets" / "index-Bq3x_9Zk.js").write_text("console.log('app');\n" * 5000)
+    (dist / "assets" / "index-D4fQ1v_a.css").write_text("body{margin:0}\n" * 500)
+    return dist
+
+
+def legacy_app(dist: Path) -> FastAPI:
+    app = FastAPI()
+    index_file = dist / "index.html"
+    app.mount("/", StaticFiles(directory=dist, html=True), name="frontend")
+
+    @app.exception_handler(404)
+    async def spa_fallback(request: Request, exc):
+        if "." in request.url.path.split("/")[-1]:
+            return JSONResponse(status_code=404, content={"error": {"code": 404}})
+        if index_file.exists():
+            return FileResponse(index_file)
+        return JSONResponse(status_code=404, content={"error": {"code": 404}})
+
+    return app
+
+
+def shell_app(dist: Path) -> FastAPI:
+    app = FastAPI()
+    spa.mount_frontend(app, dist)
+    return app
+
+
+async def first_etag(app: FastAPI) -> str:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.get("/planet/0", headers={"Accept-Encoding": "gzip"})
+        return r.headers["etag"]
+
+
+async def run(app: FastAPI, requests: int, concurrency: int, headers: dict) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        expected = (await client.get("/planet/0", headers=headers)).status_code
+        remaining = iter(range(requests))
+
+        async def worker():
+            for n in remaining:
+                r = await client.get(f"/planet/{n}", headers=headers)
+                assert r.status_code == expected
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-spa-") as root:
+        dist = build_dist(Path(root))
+        shell = shell_app(dist)
+        etag = asyncio.run(first_etag(shell))
+        variants = {
+            "FileResponse": (legacy_app(dist), {"Accept-Encoding": "gzip"}),
+            "SpaShell": (shell, {"Accept-Encoding": "gzip"}),
+            "SpaShell + If-None-Match": (
+                shell,
+                {"Accept-Encoding": "gzip", "If-None-Match": etag},
+            ),
+        }
+        print(f"{args.requests:,} deep links, {args.concurrency} concurrent")
+        baseline = None
+        for label, (app, headers) in variants.items():
+            rate = asyncio.run(run(app, args.requests, args.concurrency, headers))
+            baseline = baseline or rate
+            print(f"  {label:<26} {rate:8,.0f} req/s  {rate / baseline:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
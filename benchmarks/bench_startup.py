@@ -0,0 +1,79 @@
+"""Benchmark worker cold start: process spawn to the first ``GET /healthz`` response.
+
+Each run starts a fresh ``uvicorn backend.main:app`` process on a free port and polls
+``/healthz`` until it answers. "eager" imports ``firebase_admin`` (+ ``auth``),
+``google.cloud.firestore`` and ``httpx`` before uvicorn starts, as ``backend/main.py`` used to
+at import time; "lazy" is the app as it is, where ``jobs.warm_up`` imports and connects them
+after startup. No credentials are configured, so ``/readyz`` stays 503 and only liveness is
+timed; the warm-up's import cost is what "eager" shows.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+EAGER_IMPORTS = "import firebase_admin, firebase_admin.auth, google.cloud.firestore, httpx; "
+SERVE = "import uvicorn; uvicorn.run('backend.main:app', port={port}, log_level='warning')"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(eager: bool, timeout: float = 60.0) -> float:
+    port = free_port()
+    code = (EAGER_IMPORTS if eager else "") + SERVE.format(port=port)
+    env = dict(os.environ, FIREBASE_PROJECT_ID="bench-project", HOT_FEED_REFRESH_SECONDS="0")
+    env.pop("FIREBASE_CREDENTIALS_JSON", None)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited before answering /healthz") from None
+                time.sleep(0.005)
+        raise RuntimeError(f"no /healthz response within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"spawn -> first /healthz response, median of {args.runs} runs")
+    baseline = None
+    for label, eager in (("eager imports", True), ("lazy + warm-up", False)):
+        median = statistics.median(time_to_first_response(eager) for _ in range(args.runs))
+        baseline = baseline or median
+        print(f"  {label:<16} {median * 1000:8.0f} ms  {baseline / median:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
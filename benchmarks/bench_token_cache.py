@@ -0,0 +1,123 @@
+"""Benchmark ID-token verification under a burst of authenticated requests.
+
+Signs real RS256 tokens with a throwaway key and verifies them the way ``verify_id_token``
+does (signature, audience, expiry) with the certs already in memory, i.e. the best case
+without the cache. Each of ``--users`` users sends ``--requests-per-user`` requests through
+``deps.get_current_user``, all at once, with and without the verified-token cache.
+
+Usage:
+    python -m benchmarks.bench_token_cache [--users 200] [--requests-per-user 10]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.pop("TEST_BYPASS_AUTH", None)
+
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+from firebase_admin import auth as fb_auth  # noqa: E402
+from google.auth import crypt, jwt  # noqa: E402
+
+from backend import deps, firebase  # noqa: E402
+from backend.cache import TTLCache  # noqa: E402
+
+PROJECT = "bench-project"
+KID = "bench-key"
+
+
+def make_signer():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    signer = crypt.RSASigner.from_string(pem, KID)
+    return signer, {KID: cert.public_bytes(serialization.Encoding.PEM)}
+
+
+def make_token(signer, uid: str) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{PROJECT}",
+        "aud": PROJECT,
+        "sub": uid,
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return jwt.encode(signer, payload).decode()
+
+
+async def burst(tokens, rounds: int):
+    latencies = []
+
+    async def one(token):
+        start = time.perf_counter()
+        await deps.get_current_user(f"Bearer {token}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(t) for _ in range(rounds) for t in tokens))
+    return time.perf_counter() - start, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests-per-user", type=int, default=10)
+    args = parser.parse_args()
+
+    signer, certs = make_signer()
+    verifications = {"n": 0}
+
+    def verify_id_token(token):
+        verifications["n"] += 1
+        claims = jwt.decode(token, certs=certs, audience=PROJECT)
+        claims["uid"] = claims["sub"]
+        return claims
+
+    fb_auth.verify_id_token = verify_id_token
+    tokens = [make_token(signer, f"user{i}") for i in range(args.users)]
+    total = args.users * args.requests_per_user
+    print(f"{args.users} users x {args.requests_per_user} requests = {total:,} concurrent requests")
+    print(f"{'cache':>6} {'wall':>9} {'p50':>9} {'p99':>9} {'verifications':>14}")
+    for label, cache in (
+        ("off", TTLCache(0, 0)),
+        ("on", TTLCache(firebase.VERIFIED_TOKEN_CACHE_SIZE, firebase.VERIFIED_TOKEN_CACHE_TTL)),
+    ):
+        firebase.verified_tokens = cache
+        verifications["n"] = 0
+        wall, latencies = asyncio.run(burst(tokens, args.requests_per_user))
+        latencies.sort()
+        p50 = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{label:>6} {wall * 1000:>6.0f} ms {p50 * 1000:>6.1f} ms {p99 * 1000:>6.1f} ms "
+              f"{verifications['n']:>14,}")
+    firebase.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,4 +17,12 @@ fi
 echo "[info] Building frontend (vite build)..."
 npm run build
 
+echo "[info] Precompressing static assets (.br/.gz)..."
+cd "$PROJECT_ROOT"
+PYTHON="python3"
+if [[ -x .venv/bin/python ]]; then
+  PYTHON=".venv/bin/python"
+fi
+"$PYTHON" -m backend.tools.precompress_static --dist frontend/dist
+
 echo "[info] Build complete. Dist output available at frontend/dist. Run ./run_backend.sh to serve on http://127.0.0.1:8000"
\ No newline at end of file
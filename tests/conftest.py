@@ -90,6 +90,44 @@ def patch_db(monkeypatch):
     yield
 
 
+@pytest.fixture
+def store():
+    """Backing dicts of the in-memory repositories used by the `repos` fixture."""
+    from backend.repositories import InMemoryStore
+
+    return InMemoryStore()
+
+
+@pytest.fixture(autouse=True)
+def repos(monkeypatch, store):
+    """Route all repository access to a fresh in-memory implementation for each test.
+
+    Also starts each test with empty caches (pages, threads, profiles, tags, verified tokens) and
+    rate-limit buckets.
+    """
+    from backend import cache, deps, firebase, repositories
+
+    cache.thread_pages.clear()
+    cache.thread_docs.clear()
+    cache.profiles.clear()
+    cache.tag_counts.clear()
+    firebase.verified_tokens.clear()
+    deps.limiter.reset()
+    bundle = repositories.in_memory_repositories(store)
+    monkeypatch.setattr(repositories, "get_repositories", lambda: bundle)
+    yield bundle
+
+
+@pytest.fixture(autouse=True)
+def search_index(monkeypatch, tmp_path):
+    """A fresh on-disk search index per test."""
+    from backend import search
+
+    index = search.SearchIndex(tmp_path / "search")
+    monkeypatch.setattr(search, "_index", index)
+    yield index
+
+
 @pytest.fixture(autouse=True)
 def default_auth(monkeypatch):
     """Provide a default authenticated user for routes unless a test overrides deps.get_current_user.
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from backend.main import create_app
@@ -9,88 +11,47 @@ def app():
 
 
 @pytest.fixture
-def dummy_db(monkeypatch):
-    # Minimal users collection to support username uniqueness + profile ensure
-    class DummyDB:
-        def __init__(self):
-            self.users = {}  # uid -> data
-            self._uid_counter = 0
-
-        def collection(self, name):
-            assert name == "users"
-            db = self
-
-            class UsersCol:
-                def where(self, field, op, value):
-                    assert field == "username_lower" and op == "=="
-
-                    class Query:
-                        def limit(self, n):
-                            matches = []
-                            for uid, data in db.users.items():
-                                if data.get("username_lower") == value:
-                                    class Snap:
-                                        id = uid
-                                        def to_dict(self_inner):
-                                            return data
-                                    matches.append(Snap())
-                            class Streamer:
-                                def stream(self_inner):
-                                    for s in matches[:n]:
-                                        yield s
-                            return Streamer()
-                    return Query()
-
-                def document(self, uid):
-                    class UserDoc:
-                        def get(self):
-                            class Snap:
-                                id = uid
-                                exists = uid in db.users
-                                def to_dict(self_inner):
-                                    return db.users.get(uid)
-                            return Snap()
-                        def set(self, data):
-                            db.users[uid] = data
-                        def update(self, data):
-                            db.users[uid].update(data)
-                    return UserDoc()
-            return UsersCol()
-
-    dummy = DummyDB()
-    from backend import firebase
-    monkeypatch.setattr(firebase, "get_db", lambda: dummy)
-    return dummy
+def dummy_db(store):
+    # In-memory users collection supports username uniqueness + profile ensure
+    return store
+
+
+class StubIdentityServer:
+    """Minimal Identity Toolkit + Secure Token endpoints, served through httpx.MockTransport."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request):
+        import httpx
+        from urllib.parse import parse_qs
+
+        self.requests.append(request)
+        if request.url.params.get('key') != 'test_key':
+            return httpx.Response(400, json={"error": {"message": "API key not valid"}})
+        if request.url.path.endswith('/accounts:signInWithPassword'):
+            body = json.loads(request.content)
+            if body['password'] == 'BadPass':
+                return httpx.Response(400, json={"error": {"message": "INVALID_PASSWORD"}})
+            return httpx.Response(200, json={"idToken": "id_abc", "refreshToken": "ref_abc", "expiresIn": "3600"})
+        if request.url.path.endswith('/token'):
+            form = parse_qs(request.content.decode())
+            if form['refresh_token'] == ['bad_refresh']:
+                return httpx.Response(400, json={"error": {"message": "INVALID_REFRESH_TOKEN"}})
+            return httpx.Response(200, json={"id_token": "id_new", "refresh_token": "ref_new", "expires_in": "3600"})
+        return httpx.Response(404, json={})
 
 
 @pytest.fixture
 def mock_identity(monkeypatch):
-    # Patch httpx.AsyncClient.post used inside auth routes
+    # Route the pooled identity client to an in-process stub server
     import httpx
-    class FakeResp:
-        def __init__(self, status_code, payload):
-            self.status_code = status_code
-            self._payload = payload
-        def json(self):
-            return self._payload
-
-    async def fake_post(self, url, json=None, data=None):  # noqa: D401
-        if 'signInWithPassword' in url:
-            if json['password'] == 'BadPass':
-                return FakeResp(400, {"error": "INVALID_PASSWORD"})
-            # Return deterministic tokens
-            return FakeResp(200, {"idToken": "id_abc", "refreshToken": "ref_abc", "expiresIn": 3600})
-        if 'securetoken' in url or 'token' in url:
-            if data['refresh_token'] == 'bad_refresh':
-                return FakeResp(400, {"error": "INVALID_REFRESH_TOKEN"})
-            return FakeResp(200, {"id_token": "id_new", "refresh_token": "ref_new", "expires_in": 3600})
-        return FakeResp(404, {})
-
-    orig_client = httpx.AsyncClient
-    class FakeClient(orig_client):
-        async def post(self, url, json=None, data=None):
-            return await fake_post(self, url, json=json, data=data)
-    monkeypatch.setattr(httpx, 'AsyncClient', FakeClient)
+    from backend import identity
+
+    stub = StubIdentityServer()
+    monkeypatch.setattr(identity, 'transport', httpx.MockTransport(stub))
+    monkeypatch.setattr(identity, '_client', None)
+    yield stub
 
 
 @pytest.fixture
@@ -152,6 +113,24 @@ def test_register_success(client, dummy_db):
     assert any(u.get('username') == 'alice_1' for u in dummy_db.users.values())
 
 
+
+def test_register_conflict_deletes_account(client, dummy_db, monkeypatch):
+    from firebase_admin import auth as fb_auth
+    from backend import repositories
+
+    deleted = []
+
+    def create(self, uid, data):  # the profile appeared between the read and the create
+        raise repositories.Conflict(uid)
+
+    monkeypatch.setattr(repositories.InMemoryUserRepository, 'create', create)
+    monkeypatch.setattr(fb_auth, 'delete_user', deleted.append)
+    r = client.post('/auth/register', json={
+        'email': 'a@example.com', 'password': 'StrongPass1', 'display_name': 'A', 'username': 'race'
+    })
+    assert r.status_code == 409
+    assert deleted == ['u1']
+
 def test_register_duplicate_username(client, dummy_db):
     client.post('/auth/register', json={
         'email': 'a@example.com', 'password': 'StrongPass1', 'display_name': 'A', 'username': 'dup'
@@ -210,3 +189,83 @@ def test_me_missing_profile(client, dummy_db, monkeypatch):
     dummy_db.users.clear()
     r = client.get('/auth/me', headers={'Authorization': 'Bearer id_abc'})
     assert r.status_code == 404
+
+
+def test_verified_tokens_are_cached_until_exp(monkeypatch):
+    import time
+    from firebase_admin import auth as fb_auth
+    from backend import firebase
+
+    calls = []
+
+    def verify_id_token(token):
+        calls.append(token)
+        if token == 'bad':
+            raise ValueError('bad token')
+        exp = time.time() + (3600 if token == 'good' else -1)
+        return {"uid": "u1", "exp": exp}
+
+    monkeypatch.setattr(fb_auth, 'verify_id_token', verify_id_token)
+    assert firebase.verify_token('good')['uid'] == 'u1'
+    assert firebase.verify_token('good')['uid'] == 'u1'
+    assert firebase.cached_token_claims('good')['uid'] == 'u1'
+    assert calls == ['good']
+    # already-expired claims and failures are never cached
+    firebase.verify_token('stale')
+    assert firebase.cached_token_claims('stale') is None
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            firebase.verify_token('bad')
+    assert calls == ['good', 'stale', 'bad', 'bad']
+
+
+def test_prefetch_signing_certs_bypasses_http_cache(monkeypatch):
+    from types import SimpleNamespace
+    from firebase_admin import auth as fb_auth
+    from backend import firebase
+
+    seen = {}
+
+    def request(url, method='GET', headers=None):
+        seen.update(url=url, headers=headers)
+
+    client = SimpleNamespace(_token_verifier=SimpleNamespace(request=request))
+    monkeypatch.setattr(fb_auth, '_get_client', lambda app: client)
+    firebase.prefetch_signing_certs()
+    assert seen['url'].startswith('https://www.googleapis.com/')
+    assert seen['headers'] == {'Cache-Control': 'no-cache'}
+
+
+def test_identity_calls_share_one_pooled_client(app, mock_identity, mock_firebase_admin, monkeypatch):
+    import os
+    from backend import identity
+
+    monkeypatch.setitem(os.environ, 'FIREBASE_WEB_API_KEY', 'test_key')
+    clients = []
+    get_client = identity.get_client
+    monkeypatch.setattr(identity, 'get_client', lambda: clients.append(get_client()) or clients[-1])
+    with TestClient(app) as c:  # runs the lifespan: one loop, one pooled client
+        assert c.post('/auth/login', json={'email': 'a@example.com', 'password': 'StrongPass1'}).status_code == 200
+        assert c.post('/auth/refresh', json={'refresh_token': 'ref_abc'}).status_code == 200
+    assert [r.url.path for r in mock_identity.requests] == [
+        '/v1/accounts:signInWithPassword',
+        '/v1/token',
+    ]
+    assert len(clients) == 3 and len(set(map(id, clients))) == 1
+    assert clients[0].is_closed  # closed by the lifespan on shutdown
+
+
+def test_identity_client_closes_and_reopens():
+    import asyncio
+    from backend import identity
+
+    async def run():
+        first = identity.get_client()
+        assert identity.get_client() is first
+        await identity.aclose()
+        assert first.is_closed
+        second = identity.get_client()
+        assert second is not first
+        await identity.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from backend import live
+from backend.broadcast import UnixSocketBroadcast, make_broadcast
+
+
+def _comment(body):
+    return {"body": body, "author_uid": "u1", "author_mode": "public", "created_at": time.time()}
+
+
+async def _until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_uds_broadcast_coalesces_bursts_per_thread(tmp_path):
+    async def run():
+        path = str(tmp_path / "live.sock")
+        inboxes = {name: [] for name in "abc"}
+        peers = {name: UnixSocketBroadcast(path, interval=0.02) for name in "abc"}
+        for name, peer in peers.items():
+            await peer.start(lambda *msg, name=name: inboxes[name].append(msg))
+        assert [p.is_broker for p in peers.values()] == [True, False, False]
+        await _until(lambda: len(peers["a"]._peers) == 2)
+
+        for i in range(100):  # a burst on one thread from a non-broker worker
+            peers["b"].publish("comment", "t1", f"c{i}", {"body": f"n{i}"})
+        peers["b"].publish("thread", live.NEW_THREADS, "t2", {"title": "new"})
+        await _until(lambda: len(inboxes["a"]) == 2 and len(inboxes["c"]) == 2)
+        assert peers["b"].sent == 2 and inboxes["b"] == []
+        kind, key, items = inboxes["c"][0]
+        assert (kind, key, len(items)) == ("comment", "t1", 100)
+        assert items[0] == ["c0", {"body": "n0"}]
+        assert inboxes["c"][1] == ("thread", "", [["t2", {"title": "new"}]])
+
+        await peers["a"].close()  # the broker exits; a remaining worker takes over
+        await _until(lambda: any(p.is_broker for p in (peers["b"], peers["c"])))
+        await _until(lambda: all(p._ready.is_set() for p in (peers["b"], peers["c"])))
+        await asyncio.sleep(0.05)
+        peers["c"].publish("comment", "t1", "c100", {"body": "after failover"})
+        await _until(lambda: len(inboxes["b"]) == 1)
+        for peer in (peers["b"], peers["c"]):
+            await peer.close()
+
+    asyncio.run(run())
+
+
+def test_uds_broker_socket_is_private(tmp_path, monkeypatch):
+    import os
+    import stat
+
+    from backend import broadcast
+
+    async def run(path):
+        peer = UnixSocketBroadcast(path)
+        await peer.start(lambda *msg: None)
+        assert peer.is_broker
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        await peer.close()
+
+    asyncio.run(run(str(tmp_path / "run" / "live.sock")))
+    assert stat.S_IMODE(os.stat(tmp_path / "run").st_mode) == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    os.chmod(shared, 0o777)
+    monkeypatch.setattr(broadcast, "_DEFAULT_SOCKET_DIR", str(shared))
+    with pytest.raises(PermissionError):
+        broadcast._make_socket_dir(str(shared))
+
+
+def test_hubs_on_different_workers_share_events(tmp_path):
+    async def run():
+        path = str(tmp_path / "live.sock")
+        writer, reader = live.Hub(heartbeat=0), live.Hub(heartbeat=0)
+        await writer.start_broadcast(UnixSocketBroadcast(path, interval=0.02))
+        await reader.start_broadcast(UnixSocketBroadcast(path, interval=0.02))
+        await _until(lambda: len(writer.broadcast._peers) == 1)
+        comments, threads = reader.subscribe("t1"), reader.subscribe(live.NEW_THREADS)
+
+        for i in range(100):
+            assert writer.publish("t1", f"c{i}", _comment(f"n{i}")) == 0  # no local viewers
+        thread = {
+            "title": "Fresh",
+            "body": "b",
+            "author_mode": "anon",
+            "author_uid": "u1",
+            "created_at": 1.0,
+            "updated_at": 1.0,
+            "last_activity": 1.0,
+        }
+        writer.publish_thread("t2", thread)
+        batch = await asyncio.wait_for(comments.queue.get(), 2)
+        assert comments.queue.empty()  # 100 comments, one queued write
+        assert batch.count(b"event: comment\n") == 100
+        frame = await asyncio.wait_for(threads.queue.get(), 2)
+        payload = json.loads(frame.decode().split("data: ", 1)[1])
+        assert (payload["id"], payload["author_uid"]) == ("t2", None)
+
+        # The reader's own Firestore listener may report the same comment: delivered once.
+        assert reader.deliver("t1", [("c5", _comment("n5"))], live.encode_comment) == 0
+        await writer.close_all()
+        await reader.close_all()
+
+    asyncio.run(run())
+
+
+def test_make_broadcast_rejects_unknown_backend():
+    assert type(make_broadcast("local")).__name__ == "LocalBroadcast"
+    with pytest.raises(ValueError):
+        make_broadcast("carrier-pigeon")
@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import cache
+from backend.cache import TTLCache
+from backend.main import create_app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_counters():
+    clock = FakeClock()
+    c = TTLCache(maxsize=4, ttl=10, clock=clock)
+    c.set("a", 1)
+    assert c.get("a") == 1
+    clock.now = 11
+    assert c.get("a") is None
+    assert c.stats() == {"hits": 1, "misses": 1, "evictions": 0, "size": 0}
+
+
+def test_lru_eviction():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")  # a becomes most recently used
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.evictions == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from backend import deps
+
+    async def fake_user():
+        return {"uid": "u1"}
+
+    monkeypatch.setattr(deps, "get_current_user", fake_user)
+    return TestClient(create_app())
+
+
+def _create(client, tags):
+    r = client.post(
+        "/threads",
+        json={"title": "T", "body": "b", "tags": tags, "author_mode": "public"},
+        headers={"Authorization": "Bearer x"},
+    )
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+def test_first_pages_cached_and_invalidated_by_tag(client, repos):
+    _create(client, ["python"])
+    for _ in range(3):
+        client.get("/threads")
+        client.get("/threads?tag=python")
+        client.get("/threads?tag=rust")
+    assert repos.stats.snapshot()["threads.list"]["calls"] == 3
+    assert cache.thread_pages.hits == 6
+
+    _create(client, ["python"])  # invalidates untagged + python first pages only
+    assert len(client.get("/threads").json()["items"]) == 2
+    assert len(client.get("/threads?tag=python").json()["items"]) == 2
+    client.get("/threads?tag=rust")
+    assert repos.stats.snapshot()["threads.list"]["calls"] == 5
+
+
+def test_add_comment_invalidates_thread_doc(client, repos):
+    tid = _create(client, ["python"])
+    assert client.get(f"/threads/{tid}").json()["comment_count"] == 0
+    assert client.get("/threads?tag=python").json()["items"][0]["comment_count"] == 0
+    client.post(
+        f"/threads/{tid}/comments",
+        json={"body": "hi", "author_mode": "public"},
+        headers={"Authorization": "Bearer x"},
+    )
+    assert client.get(f"/threads/{tid}").json()["comment_count"] == 1
+    assert client.get("/threads?tag=python").json()["items"][0]["comment_count"] == 1
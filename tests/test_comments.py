@@ -4,107 +4,20 @@ from backend.main import create_app
 
 
 @pytest.fixture
-def client(monkeypatch):
+def client(monkeypatch, store):
     app = create_app()
 
-    class DummyCommentDB:
-        def __init__(self):
-            self.threads = {
-                "t1": {
-                    "title": "x",
-                    "body": "y",
-                    "tags": [],
-                    "author_uid": "u1",
-                    "author_mode": "public",
-                    "comment_count": 0,
-                    "last_activity": 0,
-                    "created_at": 0,
-                    "updated_at": 0,
-                }
-            }
-            self.comments = {}
-
-        def collection(self, name):
-            from types import SimpleNamespace
-
-            if name == "threads":
-                return self
-            raise AssertionError
-
-        def document(self, id):
-            db = self
-
-            class ThreadDoc:
-                def __init__(self, id):
-                    self.id = id
-
-                def get(self):
-                    class Snap:
-                        id = self.id
-                        exists = self.id in db.threads
-
-                        def to_dict(inner):
-                            return db.threads[self.id]
-
-                    return Snap()
-
-                def collection(self, name):
-                    assert name == "comments"
-
-                    class CommentsCol:
-                        def document(self, cid=None):
-                            if cid is None:
-                                cid = f"c{len(db.comments)+1}"
-
-                            class CommentRef:
-                                def __init__(self, cid):
-                                    self.id = cid
-
-                                def set(self, data):
-                                    db.comments[self.id] = data
-
-                            return CommentRef(cid)
-
-                        def order_by(self, *args, **kwargs):
-                            return self
-
-                        def limit(self, n):
-                            return self
-
-                        def stream(self):
-                            for k, v in db.comments.items():
-
-                                class Snap:
-                                    id = k
-
-                                    def to_dict(self):
-                                        return v
-
-                                yield Snap()
-
-                    return CommentsCol()
-
-            return ThreadDoc(id)
-
-        def transaction(self):
-            class Txn:
-                def __init__(self, outer):
-                    self._outer = outer
-
-                def call(self, fn):
-                    return fn(self)
-
-                def update(self, ref, data):
-                    self._outer.threads[ref.id].update(data)
-
-                def set(self, ref, data):
-                    self._outer.comments[ref.id] = data
-
-            return Txn(self)
-
-    from backend import firebase
-
-    monkeypatch.setattr(firebase, "get_db", lambda: DummyCommentDB())
+    store.threads["t1"] = {
+        "title": "x",
+        "body": "y",
+        "tags": [],
+        "author_uid": "u1",
+        "author_mode": "public",
+        "comment_count": 0,
+        "last_activity": 0,
+        "created_at": 0,
+        "updated_at": 0,
+    }
     from backend import deps
 
     async def fake_user():
@@ -142,3 +55,91 @@ def test_empty_comment_validation(client):
         headers={"Authorization": "Bearer x"},
     )
     assert r.status_code == 422
+
+
+def test_comments_etag_not_modified_until_new_comment(client):
+    r1 = client.get("/threads/t1/comments")
+    etag = r1.headers["ETag"]
+    assert etag.startswith('W/"')
+    r2 = client.get("/threads/t1/comments", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.content == b""
+    client.post(
+        "/threads/t1/comments",
+        json={"body": "Second", "author_mode": "public"},
+        headers={"Authorization": "Bearer x"},
+    )
+    r3 = client.get("/threads/t1/comments", headers={"If-None-Match": etag})
+    assert r3.status_code == 200
+    assert r3.headers["ETag"] != etag
+
+
+def test_thread_etag(client):
+    etag = client.get("/threads/t1").headers["ETag"]
+    assert client.get("/threads/t1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/threads/t1", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+
+AUTH = {"Authorization": "Bearer x"}
+
+
+def _post_comment(client, body):
+    r = client.post(
+        "/threads/t1/comments",
+        json={"body": body, "author_mode": "public"},
+        headers={"Authorization": "Bearer x"},
+    )
+    return r.json()["id"]
+
+
+def test_votes_update_top_ordering(client, store):
+    a = _post_comment(client, "A")
+    b = _post_comment(client, "B")
+    r = client.post(f"/threads/t1/comments/{a}/votes", json={"value": 1}, headers=AUTH)
+    assert r.status_code == 200
+    assert r.json()["ups"] == 1 and r.json()["score"] > 0
+    # same vote again is idempotent
+    assert client.post(f"/threads/t1/comments/{a}/votes", json={"value": 1}, headers=AUTH).json()["ups"] == 1
+    top = client.get("/threads/t1/comments?sort=top").json()["items"]
+    assert [c["id"] for c in top] == [a, b]
+    # retracting restores the unvoted score
+    r = client.post(f"/threads/t1/comments/{a}/votes", json={"value": 0}, headers=AUTH)
+    assert r.json() == {"comment_id": a, "value": 0, "ups": 0, "downs": 0, "score": 0.0}
+
+
+def test_vote_missing_comment_404(client):
+    r = client.post("/threads/t1/comments/nope/votes", json={"value": 1}, headers=AUTH)
+    assert r.status_code == 404
+
+
+def test_top_etag_changes_with_votes(client):
+    a = _post_comment(client, "A")
+    etag = client.get("/threads/t1/comments?sort=top").headers["ETag"]
+    assert client.get("/threads/t1/comments?sort=top", headers={"If-None-Match": etag}).status_code == 304
+    client.post(f"/threads/t1/comments/{a}/votes", json={"value": 1}, headers=AUTH)
+    assert client.get("/threads/t1/comments?sort=top", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_new_etag_changes_with_votes(client):
+    a = _post_comment(client, "A")
+    etag = client.get("/threads/t1/comments").headers["ETag"]
+    assert client.get("/threads/t1/comments", headers={"If-None-Match": etag}).status_code == 304
+    client.post(f"/threads/t1/comments/{a}/votes", json={"value": 1}, headers=AUTH)
+    r = client.get("/threads/t1/comments", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag and r.json()["items"][0]["ups"] == 1
+
+
+def test_malformed_comment_page_tokens_are_400(client):
+    import base64
+    import json
+
+    def token(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode()
+
+    for bad in [token([1, 2]), token({"id": "x"}), token({"id": 1, "ts": 1.0}), "%%%"]:
+        assert client.get(f"/threads/t1/comments?page_token={bad}").status_code == 400
+    bad_top = token({"id": "x", "ts": 1.0})  # a sort=new token has no score
+    assert client.get(f"/threads/t1/comments?sort=top&page_token={bad_top}").status_code == 400
+    ok = token({"id": "x", "ts": 1.0, "sort": "top", "score": 0.5})
+    assert client.get(f"/threads/t1/comments?sort=top&page_token={ok}").status_code == 200
@@ -0,0 +1,90 @@
+import gzip
+
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from backend import compression
+from backend.compression import CompressionMiddleware, PrecompressedStaticFiles, negotiate
+from backend.tools.precompress_static import precompress_static
+
+
+def test_negotiate_honours_q_values():
+    assert negotiate("gzip, deflate, br", ("br", "gzip")) == "br"
+    assert negotiate("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+    assert negotiate("*;q=0.1", ("br", "gzip")) == "br"
+    assert negotiate("gzip;q=0, identity", ("gzip",)) is None
+    assert negotiate("", ("gzip",)) is None
+
+
+def test_middleware_compresses_large_json_only(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    big = {"items": ["x" * 40] * 100}
+
+    async def events():
+        yield b"data: 1\n\n"
+        yield b"data: 2\n\n"
+
+    def stream(request):
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app = Starlette(
+        routes=[
+            Route("/big", lambda r: JSONResponse(big)),
+            Route("/small", lambda r: JSONResponse({"ok": True})),
+            Route("/stream", stream),
+        ]
+    )
+    client = TestClient(CompressionMiddleware(app, minimum_size=500))
+
+    r = client.get("/big", headers={"Accept-Encoding": "br, gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.headers["vary"] == "Accept-Encoding"
+    assert int(r.headers["content-length"]) < 500 and r.json() == big
+    plain = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert "content-encoding" not in client.get("/small").headers
+    r = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers and r.text == "data: 1\n\ndata: 2\n\n"
+
+
+def test_api_listing_is_compressed():
+    from backend.main import create_app
+
+    client = TestClient(create_app())
+    payload = {"title": "Big", "body": "word " * 800, "tags": [], "author_mode": "public"}
+    client.post("/threads", json=payload, headers={"Authorization": "Bearer x"})
+    r = client.get("/threads", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.json()["items"][0]["title"] == "Big"
+
+
+def test_precompressed_static_files_and_cache_headers(tmp_path):
+    dist = tmp_path / "dist"
+    script = b"console.log('hello');\n" * 200
+    (dist / "assets").mkdir(parents=True)
+    (dist / "assets" / "index-Bq3x_9Zk.js").write_bytes(script)
+    (dist / "index.html").write_bytes(b"<!doctype html><div id=root></div>")
+    (dist / "logo.png").write_bytes(b"\x89PNG" * 200)
+
+    report = precompress_static(dist, min_size=256)
+    assert report.files_scanned == 2 and report.variants_written == len(compression.encodings())
+    assert gzip.decompress((dist / "assets" / "index-Bq3x_9Zk.js.gz").read_bytes()) == script
+    assert precompress_static(dist, min_size=256).variants_written == 0  # up to date
+
+    client = TestClient(PrecompressedStaticFiles(directory=dist, html=True))
+    r = client.get("/assets/index-Bq3x_9Zk.js", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["content-type"].startswith("text/javascript")
+    assert r.headers["cache-control"] == compression.IMMUTABLE_CACHE_CONTROL
+    assert int(r.headers["content-length"]) < len(script) and r.content == script
+    r = client.get("/assets/index-Bq3x_9Zk.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers and r.headers["vary"] == "Accept-Encoding"
+    assert int(r.headers["content-length"]) == len(script)
+    again = client.get(
+        "/assets/index-Bq3x_9Zk.js",
+        headers={"Accept-Encoding": "identity", "If-None-Match": r.headers["etag"]},
+    )
+    assert again.status_code == 304
+    r = client.get("/")
+    assert r.headers["cache-control"] == "no-cache" and "content-encoding" not in r.headers
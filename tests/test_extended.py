@@ -9,213 +9,9 @@ def app():
 
 
 @pytest.fixture
-def mock_db(monkeypatch):
-    # Unified dummy DB including users, threads, comments, reports, blocks
-    class DummyDB:
-        def __init__(self):
-            self.users = {}
-            self.threads = {}
-            self.comments = {}  # key: (thread_id, comment_id)
-            self.reports = {}
-            self.blocks = {}
-
-        # Collections dispatch
-        def collection(self, name):
-            db = self
-            if name == "users":
-
-                class UsersCol:
-                    def where(self, field, op, value):
-                        assert field == "username_lower" and op == "=="
-
-                        class Streamer:
-                            def __init__(self, records):
-                                self._records = records
-
-                            def stream(self):
-                                for uid, data in self._records:
-
-                                    class Snap:
-                                        id = uid
-
-                                        def to_dict(self_inner):
-                                            return data
-
-                                    yield Snap()
-
-                        class Query:
-                            def limit(self, n_inner):
-                                matches = [
-                                    (uid, data)
-                                    for uid, data in db.users.items()
-                                    if data.get("username_lower") == value
-                                ]
-                                return Streamer(matches[:n_inner])
-
-                        return Query()
-
-                    def document(self, doc_id):
-                        class UserDoc:
-                            def get(self):
-                                class Snap:
-                                    id = doc_id
-                                    exists = doc_id in db.users
-
-                                    def to_dict(self):
-                                        return db.users.get(doc_id)
-
-                                    def get(self, key):
-                                        return db.users.get(doc_id, {}).get(key)
-
-                                return Snap()
-
-                            def set(self, data):
-                                db.users[doc_id] = data
-
-                            def update(self, data):
-                                db.users[doc_id].update(data)
-
-                        return UserDoc()
-
-                return UsersCol()
-            if name == "threads":
-
-                class ThreadsCol:
-                    def document(self, doc_id=None):
-                        if doc_id is None:
-                            doc_id = f"t{len(db.threads)+1}"
-
-                        class ThreadDoc:
-                            id = doc_id
-
-                            def set(self, data):
-                                db.threads[self.id] = data
-
-                            def get(self):
-                                class Snap:
-                                    id = self.id
-                                    exists = self.id in db.threads
-
-                                    def to_dict(self):
-                                        return db.threads[self.id]
-
-                                return Snap()
-
-                            def collection(self, name):
-                                assert name == "comments"
-
-                                class CommentsCol:
-                                    def document(self, cid=None):
-                                        if cid is None:
-                                            cid = f"c{sum(1 for (tid,_) in db.comments if tid==doc_id)+1}"
-
-                                        class CommentDoc:
-                                            id = cid
-
-                                            def set(self, data):
-                                                db.comments[(doc_id, self.id)] = data
-
-                                        return CommentDoc()
-
-                                    def order_by(self, *args, **kwargs):
-                                        return self
-
-                                    def limit(self, n):
-                                        return self
-
-                                    def stream(self):
-                                        # naive order by created_at desc for tests
-                                        items = [
-                                            ((tid, cid), v)
-                                            for (tid, cid), v in db.comments.items()
-                                            if tid == doc_id
-                                        ]
-                                        for (tid, cid), v in items:
-
-                                            class Snap:
-                                                id = cid
-
-                                                def to_dict(self):
-                                                    return v
-
-                                            yield Snap()
-
-                                return CommentsCol()
-
-                        return ThreadDoc()
-
-                    def order_by(self, *args, **kwargs):
-                        return self
-
-                    def where(self, *args, **kwargs):
-                        return self
-
-                    def limit(self, n):
-                        return self
-
-                    def stream(self):
-                        for k, v in db.threads.items():
-
-                            class Snap:
-                                id = k
-
-                                def to_dict(self):
-                                    return v
-
-                            yield Snap()
-
-                return ThreadsCol()
-            if name == "reports":
-
-                class ReportsCol:
-                    def document(self):
-                        rid = f"r{len(db.reports)+1}"
-
-                        class ReportDoc:
-                            id = rid
-
-                            def set(self, data):
-                                db.reports[self.id] = data
-
-                        return ReportDoc()
-
-                return ReportsCol()
-            if name == "blocks":
-
-                class BlocksCol:
-                    def document(self, key):
-                        class BlockDoc:
-                            id = key
-
-                            def set(self, data):
-                                db.blocks[self.id] = data
-
-                        return BlockDoc()
-
-                return BlocksCol()
-            raise AssertionError("Unknown collection " + name)
-
-        def transaction(self):
-            db = self
-
-            class Txn:
-                def call(self, fn):
-                    return fn(self)
-
-                def update(self, ref, data):
-                    db.threads[ref.id].update(data)
-
-                def set(self, ref, data):
-                    if hasattr(ref, "id") and ref.id in db.threads:
-                        db.threads[ref.id].update(data)
-
-            return Txn()
-
-    dummy = DummyDB()
-    from backend import firebase
-
-    monkeypatch.setattr(firebase, "get_db", lambda: dummy)
-    return dummy
+def mock_db(store):
+    # Unified in-memory store backing users, threads and comments
+    return store
 
 
 @pytest.fixture
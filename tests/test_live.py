@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from backend import live
+from backend.main import create_app
+
+
+def _comment(body, created_at=None):
+    return {
+        "body": body,
+        "author_uid": "u1",
+        "author_mode": "anon",
+        "created_at": created_at or time.time(),
+        "score": 0.0,
+    }
+
+
+def _drain(sub):
+    frames = []
+    while not sub.queue.empty():
+        frames.append(sub.queue.get_nowait())
+    return frames
+
+
+def test_hub_fans_out_once_per_comment_and_masks_authors():
+    async def run():
+        hub = live.Hub(queue_size=8, heartbeat=0)
+        subs = [hub.subscribe("t1") for _ in range(3)]
+        other = hub.subscribe("t2")
+        assert hub.publish("t1", "c1", _comment("hello")) == 3
+        assert hub.publish("t1", "c1", _comment("hello")) == 0  # duplicate id
+        assert hub.publish("t9", "c2", _comment("nobody listens")) == 0
+        frames = [_drain(s) for s in subs]
+        assert frames[0] == frames[1] == frames[2] and len(frames[0]) == 1
+        event, data = frames[0][0].decode().split("\n")[1:3]
+        assert event == "event: comment"
+        payload = json.loads(data.removeprefix("data: "))
+        assert (payload["id"], payload["body"], payload["author_uid"]) == ("c1", "hello", None)
+        assert _drain(other) == []
+
+        for sub in subs + [other]:
+            hub.unsubscribe(sub)
+            hub.unsubscribe(sub)  # idempotent
+        assert (hub.subscribers, hub.channel_count()) == (0, 0)
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_is_resynced_without_blocking_others():
+    async def run():
+        hub = live.Hub(queue_size=2, heartbeat=0)
+        slow, fast = hub.subscribe("t1"), hub.subscribe("t1")
+        for i in range(3):
+            assert hub.publish("t1", f"c{i}", _comment(f"n{i}")) >= 1
+            _drain(fast)
+        assert hub.dropped == 1 and hub.subscribers == 1
+        assert [f async for f in hub.events(slow)] == [live.RETRY, live.RESYNC]
+        assert hub.publish("t1", "c3", _comment("n3")) == 1
+
+    asyncio.run(run())
+
+
+def test_heartbeat_reaches_idle_subscribers():
+    async def run():
+        hub = live.Hub(heartbeat=0.01)
+        sub = hub.subscribe("t1")
+        assert await asyncio.wait_for(sub.queue.get(), 1) == live.HEARTBEAT
+        hub.unsubscribe(sub)
+        assert hub._ticker is None
+
+    asyncio.run(run())
+
+
+def test_listener_delivers_comments_from_other_workers(repos, store):
+    tid = repos.threads.create({"title": "t", "body": "b", "tags": [], "last_activity": 1})
+
+    async def run():
+        hub = live.Hub(heartbeat=0)
+        sub = hub.subscribe(tid)
+        for _ in range(100):  # the listener starts on the executor
+            if store.watchers.get(tid):
+                break
+            await asyncio.sleep(0.01)
+        assert len(store.watchers[tid]) == 1
+        # Written through "another worker": only the listener sees it.
+        comment_id, _ = await asyncio.to_thread(repos.comments.add, tid, _comment("remote"))
+        frame = await asyncio.wait_for(sub.queue.get(), 1)
+        assert f"id: {comment_id}\n".encode() in frame
+        assert hub.publish(tid, comment_id, _comment("remote")) == 0  # already delivered
+        await asyncio.wrap_future(hub.unsubscribe(sub))
+        assert tid not in store.watchers
+
+    asyncio.run(run())
+
+
+def test_stream_endpoint():
+    body = {}
+    auth = {"Authorization": "Bearer x"}
+    with TestClient(create_app()) as client:
+        thread = {"title": "Live", "body": "b", "tags": [], "author_mode": "public"}
+        tid = client.post("/threads", json=thread, headers=auth).json()["id"]
+        assert client.get("/threads/missing/comments/stream").status_code == 404
+
+        def read_stream():
+            response = client.get(f"/threads/{tid}/comments/stream")
+            body.update(headers=response.headers, text=response.text)
+
+        reader = threading.Thread(target=read_stream)
+        reader.start()
+        deadline = time.time() + 5
+        while live.hub.subscribers == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        created = client.post(
+            f"/threads/{tid}/comments",
+            json={"body": "live!"},
+            headers=auth,
+        ).json()
+        client.portal.call(live.hub.close_all)
+        reader.join(5)
+    assert body["headers"]["content-type"].startswith("text/event-stream")
+    frames = body["text"].split("\n\n")
+    assert frames[0] == "retry: 3000"
+    assert frames[1].startswith(f"id: {created['id']}\nevent: comment\n")
+    assert "event: resync" in frames[2]
+    assert live.hub.subscribers == 0
+
+
+def test_new_threads_stream_endpoint():
+    body = {}
+    with TestClient(create_app()) as client:
+        reader = threading.Thread(
+            target=lambda: body.update(text=client.get("/threads/stream").text)
+        )
+        reader.start()
+        deadline = time.time() + 5
+        while live.hub.subscribers == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        thread = {"title": "Breaking", "body": "b", "tags": [], "author_mode": "anon"}
+        created = client.post(
+            "/threads", json=thread, headers={"Authorization": "Bearer x"}
+        ).json()
+        client.portal.call(live.hub.close_all)
+        reader.join(5)
+    frames = body["text"].split("\n\n")
+    assert frames[1].startswith(f"id: {created['id']}\nevent: thread\n")
+    assert json.loads(frames[1].split("data: ", 1)[1])["author_uid"] is None
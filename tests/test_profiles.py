@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import create_app
+
+AUTH = {"Authorization": "Bearer x"}
+
+
+@pytest.fixture
+def client(store):
+    for uid, name in (("u1", "Ada"), ("u2", "Grace"), ("u3", "Linus")):
+        store.users[uid] = {"display_name": name, "username": name.lower(), "username_lower": name.lower()}
+    return TestClient(create_app())
+
+
+def _seed_thread(store, tid, uid, mode):
+    store.threads[tid] = {
+        "title": tid, "body": "b", "tags": [], "author_uid": uid, "author_mode": mode,
+        "comment_count": 0, "last_activity": 1.0, "created_at": 1.0, "updated_at": 1.0,
+    }
+
+
+def test_batch_lookup_reads_once_then_hits_cache(client, repos):
+    r = client.get("/profiles?uids=u2,nope,u1,u2")
+    assert r.status_code == 200
+    assert [p["username"] for p in r.json()["items"]] == ["grace", "ada"]
+    assert repos.stats.snapshot()["users.get_many"] == {"calls": 1, "reads": 3, "writes": 0}
+    assert len(client.get("/profiles?uids=u1,u2").json()["items"]) == 2
+    assert repos.stats.snapshot()["users.get_many"]["calls"] == 1
+
+
+def test_batch_lookup_is_bounded(client):
+    uids = ",".join(f"u{i}" for i in range(101))
+    assert client.get(f"/profiles?uids={uids}").status_code == 422
+
+
+def test_expand_author_resolves_public_authors_only(client, store, repos):
+    _seed_thread(store, "t1", "u1", "public")
+    _seed_thread(store, "t2", "u2", "anon")
+    _seed_thread(store, "t3", "u1", "public")
+    items = client.get("/threads?expand=author").json()["items"]
+    authors = {i["id"]: i["author"] for i in items}
+    assert authors["t1"] == {"uid": "u1", "display_name": "Ada", "username": "ada"}
+    assert authors["t3"]["uid"] == "u1"
+    assert authors["t2"] is None  # anon: never resolved
+    assert repos.stats.snapshot()["users.get_many"] == {"calls": 1, "reads": 1, "writes": 0}
+    # the cached page itself is not expanded
+    assert all(i["author"] is None for i in client.get("/threads").json()["items"])
+
+    store.comments["t1"] = {
+        "c1": {"body": "x", "author_uid": "u3", "author_mode": "public", "created_at": 2.0, "score": 0.0},
+        "c2": {"body": "y", "author_uid": "u1", "author_mode": "anon", "created_at": 3.0, "score": 0.0},
+    }
+    r = client.get("/threads/t1/comments?expand=author")
+    assert {c["id"]: c["author"] and c["author"]["uid"] for c in r.json()["items"]} == {
+        "c1": "u3",
+        "c2": None,
+    }
+    plain = client.get("/threads/t1/comments")
+    assert plain.headers["ETag"] != r.headers["ETag"]
+
+
+def test_profile_save_invalidates_cached_author(client):
+    assert client.get("/profiles?uids=test-user").json()["items"] == []
+    client.post("/profiles", json={"display_name": "Me", "username": "me_1"}, headers=AUTH)
+    assert client.get("/profiles?uids=test-user").json()["items"][0]["display_name"] == "Me"
+    client.post("/profiles", json={"display_name": "Me Too", "username": "me_1"}, headers=AUTH)
+    assert client.get("/profiles?uids=test-user").json()["items"][0]["display_name"] == "Me Too"
+
+
+def test_first_username_on_existing_profile_claims_the_reservation(client, store):
+    store.users["test-user"] = {"display_name": "Me", "created_at": 1.0}
+    store.usernames["ada"] = {"uid": "u1", "username": "ada"}
+    r = client.post("/profiles", json={"display_name": "Me", "username": "Ada"}, headers=AUTH)
+    assert r.status_code == 409 and "username" not in store.users["test-user"]
+    r = client.post("/profiles", json={"display_name": "Me", "username": "me_1"}, headers=AUTH)
+    assert r.status_code == 200, r.text
+    assert store.usernames["me_1"]["uid"] == "test-user"
@@ -0,0 +1,107 @@
+from fastapi.testclient import TestClient
+
+from backend import deps
+from backend.main import create_app
+from backend.ratelimit import TokenBucketLimiter, parse_route_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_refill():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(maxsize=10, period=60, clock=clock)
+    assert [limiter.try_acquire("u", 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.try_acquire("u", 3) == 20.0  # one token per 60/3 seconds
+    clock.now = 20
+    assert limiter.try_acquire("u", 3) == 0.0
+    assert limiter.try_acquire("u", 3) > 0
+    assert limiter.try_acquire("other", 3) == 0.0
+
+
+def test_idle_buckets_expire_and_size_is_bounded():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(maxsize=3, period=60, clock=clock)
+    for uid in ("a", "b", "c", "d"):
+        limiter.try_acquire(uid, 5)
+    assert len(limiter) == 3
+    assert limiter.stats()["evictions"] == 1
+    clock.now = 61
+    limiter.try_acquire("e", 5)
+    assert len(limiter) == 1
+    assert limiter.stats()["expired"] == 3
+
+
+def test_parse_route_limits():
+    assert parse_route_limits("a=1, b = 20,,bad") == {"a": 1, "b": 20}
+
+
+def test_route_limit_returns_429_with_retry_after(monkeypatch, store):
+    store.threads["t1"] = {"title": "x", "tags": [], "comment_count": 0, "last_activity": 0}
+    store.comments["t1"] = {"c1": {"body": "b", "created_at": 0, "score": 0.0}}
+    monkeypatch.setitem(deps.ROUTE_RATE_LIMITS, "comments.vote", 2)
+    client = TestClient(create_app())
+    headers = {"Authorization": "Bearer x"}
+    for value in (1, -1):
+        r = client.post("/threads/t1/comments/c1/votes", json={"value": value}, headers=headers)
+        assert r.status_code == 200
+    r = client.post("/threads/t1/comments/c1/votes", json={"value": 0}, headers=headers)
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "30"
+
+
+def test_shared_table_enforces_one_limit_across_workers(tmp_path):
+    from backend.ratelimit import SharedMemoryLimiter
+
+    clock = FakeClock()
+    path = str(tmp_path / "rl.bin")
+    # two handles on one file stand in for two worker processes
+    a = SharedMemoryLimiter(path, slots=64, clock=clock)
+    b = SharedMemoryLimiter(path, slots=64, clock=clock)
+    allowed = [w.try_acquire(("*", "u"), 4) == 0.0 for w in (a, b, a, b, a, b)]
+    assert allowed == [True, True, True, True, False, False]
+    clock.now = 15
+    assert b.try_acquire(("*", "u"), 4) == 0.0
+    assert a.try_acquire(("*", "v"), 4) == 0.0
+
+
+def test_shared_table_reuses_refilled_slots(tmp_path):
+    from backend.ratelimit import SharedMemoryLimiter
+
+    clock = FakeClock()
+    shared = SharedMemoryLimiter(str(tmp_path / "rl.bin"), slots=8, clock=clock)
+    for i in range(8):
+        shared.try_acquire(f"u{i}", 1)
+    clock.now = 60
+    shared.try_acquire("new", 1)
+    assert shared.stats()["evictions"] == 0
+    shared.try_acquire("newer", 1)
+    assert shared.try_acquire("u7", 1) == 0.0  # u7 refilled while idle
+
+
+def test_leases_batch_backend_calls_without_exceeding_limit(tmp_path):
+    from backend.ratelimit import LeasedLimiter, SharedMemoryLimiter
+
+    clock, frozen = FakeClock(), FakeClock()  # lease clock moves, buckets do not refill
+    path = str(tmp_path / "rl.bin")
+    workers = [
+        LeasedLimiter(SharedMemoryLimiter(path, slots=64, clock=frozen), lease=4, clock=clock)
+        for _ in range(3)
+    ]
+    allowed = sum(workers[i % 3].try_acquire("u", 60) == 0.0 for i in range(100))
+    assert allowed == 60
+    calls = sum(w.stats()["backend_calls"] for w in workers)
+    assert calls == 60 // 4 + 3  # one per lease, then one refusal per worker
+    # an expired lease hands its unused tokens back to the shared bucket
+    clock.now = 2
+    assert workers[0].try_acquire("other", 60) == 0.0
+    assert workers[0].try_acquire("other", 60) == 0.0
+    clock.now = 4
+    workers[0].try_acquire("sweep", 60)
+    granted, _ = workers[1].backend.take("other", 60, want=100)
+    assert granted == 58  # 4 leased, 2 used, 2 handed back
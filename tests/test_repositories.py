@@ -0,0 +1,253 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import create_app
+from backend.repositories import NotFound, Conflict, UsernameTaken
+
+
+def _thread(ts, tags=()):
+    return {
+        "title": "t",
+        "body": "b",
+        "tags": list(tags),
+        "author_uid": "u1",
+        "author_mode": "public",
+        "comment_count": 0,
+        "last_activity": ts,
+        "created_at": ts,
+        "updated_at": ts,
+    }
+
+
+def test_thread_list_orders_by_last_activity_then_id(repos):
+    ids = [repos.threads.create(_thread(ts, ["x"] if ts != 2 else [])) for ts in (1, 3, 2, 3)]
+    docs = repos.threads.list(None, 10)
+    assert [d[0] for d in docs] == [ids[3], ids[1], ids[2], ids[0]]
+    assert [d[0] for d in repos.threads.list("x", 10)] == [ids[3], ids[1], ids[0]]
+
+
+def test_thread_list_projects_fields(repos):
+    tid = repos.threads.create(_thread(1, ["x"]) | {"excerpt": "e"})
+    repos.comments.add(tid, {"body": "c", "created_at": 2.0})
+    for tag in (None, "x"):
+        [(doc_id, data)] = repos.threads.list(tag, 10, fields=["excerpt", "comment_count"])
+        assert doc_id == tid
+        assert data == {"title": "t", "excerpt": "e", "last_activity": 2.0, "comment_count": 1}
+
+
+def test_comment_add_missing_thread_raises(repos):
+    with pytest.raises(NotFound):
+        repos.comments.add("nope", {"body": "b", "created_at": 1.0})
+    with pytest.raises(NotFound):
+        repos.comments.list("nope", "new", 10)
+
+
+def test_comment_add_bumps_thread_counters(repos):
+    tid = repos.threads.create(_thread(1))
+    repos.comments.add(tid, {"body": "b", "created_at": 5.0, "score": 0.0})
+    thread = repos.threads.get(tid)
+    assert thread["comment_count"] == 1
+    assert thread["last_activity"] == 5.0
+
+
+def test_tag_index_maintained_on_create_and_comment(repos, store):
+    t1 = repos.threads.create(_thread(1, ["py", "py", "web"]))
+    t2 = repos.threads.create(_thread(2, ["py"]))
+    assert set(store.tag_threads["py"]) == {t1, t2}
+    assert store.tag_counts == {"py": 2, "web": 1}
+    assert repos.threads.tag_counts(10) == [("py", 2), ("web", 1)]
+
+    repos.comments.add(t1, {"body": "b", "created_at": 9.0})
+    assert store.tag_threads["web"][t1]["last_activity"] == 9.0
+    docs = repos.threads.list("py", 10)
+    assert [d[0] for d in docs] == [t1, t2]
+    assert docs[0][1]["comment_count"] == 1
+
+
+def test_backfill_tag_index_indexes_legacy_threads(repos, store):
+    from backend.tools.backfill_tag_index import backfill_tag_index
+
+    for i in range(5):
+        store.threads[f"t{i}"] = _thread(i, ["old"] + (["odd"] if i % 2 else []))
+    assert repos.threads.list("old", 10) == []
+    report = backfill_tag_index(repos, page_size=2)
+    assert (report.scanned, report.entries) == (5, 7)
+    assert [d[0] for d in repos.threads.list("odd", 10)] == ["t3", "t1"]
+    assert repos.threads.tag_counts(10) == [("old", 5), ("odd", 2)]
+    assert backfill_tag_index(repos).counts == {"old": 5, "odd": 2}  # idempotent
+
+
+def test_tag_listing_skips_bare_entries_without_short_pages(repos, store):
+    ids = [repos.threads.create(_thread(ts, ["py"])) for ts in (1, 2, 3)]
+    store.threads["legacy"] = _thread(0, ["py"])  # predates the tag index
+    repos.comments.add("legacy", {"body": "b", "created_at": 9.0})
+    assert store.tag_threads["py"]["legacy"] == {"last_activity": 9.0, "updated_at": 9.0}
+
+    assert [d[0] for d in repos.threads.list("py", 2)] == [ids[2], ids[1]]
+    client = TestClient(create_app())
+    seen, token = [], None
+    while True:
+        url = "/threads?tag=py&limit=1" + (f"&page_token={token}" if token else "")
+        page = client.get(url).json()
+        seen.extend(item["id"] for item in page["items"])
+        token = page["next_page_token"]
+        if not token:
+            break
+    assert seen == ids[::-1]
+
+
+def test_user_create_conflict(repos):
+    repos.users.create("u1", {"username": "a"})
+    with pytest.raises(Conflict):
+        repos.users.create("u1", {"username": "b"})
+
+
+def test_user_create_claims_username_reservation(repos, store):
+    assert not repos.users.username_taken("alice")
+    repos.users.create("u1", {"username": "Alice", "username_lower": "alice"})
+    assert store.usernames["alice"] == {"uid": "u1", "username": "Alice"}
+    assert repos.users.username_taken("alice")
+    with pytest.raises(UsernameTaken):
+        repos.users.create("u2", {"username": "ALICE", "username_lower": "alice"})
+    assert "u2" not in store.users
+
+
+def test_backfill_usernames_claims_legacy_profiles(repos, store):
+    from backend.tools.backfill_usernames import backfill_usernames
+
+    store.users.update({
+        "u1": {"username": "Bob", "username_lower": "bob"},
+        "u2": {"username": "carol"},
+        "u3": {"username": "BOB", "username_lower": "bob"},
+        "u4": {"display_name": "no username"},
+    })
+    repos.users.create("u5", {"username": "dave"})
+    report = backfill_usernames(repos, page_size=2)
+    assert (report.scanned, report.claimed, report.skipped) == (5, 3, 1)
+    assert report.conflicts == [("u3", "bob")]
+    assert {k: v["uid"] for k, v in store.usernames.items()} == {
+        "bob": "u1",
+        "carol": "u2",
+        "dave": "u5",
+    }
+    assert backfill_usernames(repos).claimed == 3  # idempotent
+
+
+def test_backfill_usernames_dry_run_matches_real_run(repos, store):
+    from backend.tools.backfill_usernames import backfill_usernames
+
+    store.users.update({
+        "u1": {"username": "Bob"},
+        "u2": {"username": "bob"},
+        "u3": {"username": "erin"},
+    })
+    repos.users.create("u4", {"username": "dave"})
+    preview = backfill_usernames(repos, dry_run=True)
+    assert set(store.usernames) == {"dave"}  # nothing written
+    assert (preview.scanned, preview.claimed, preview.skipped) == (4, 3, 0)
+    assert preview.conflicts == [("u2", "bob")]
+    assert backfill_usernames(repos) == preview
+
+
+def test_rerender_bodies_updates_stale_documents(repos, store):
+    from backend.render import RENDER_VERSION, render_body
+    from backend.tools.rerender_bodies import rerender_bodies
+
+    t1 = repos.threads.create(_thread(1) | {"body": "*legacy*"})
+    t2 = repos.threads.create(_thread(2) | {"body_html": "<p>x</p>", "render_version": "old"})
+    current = repos.threads.create(
+        _thread(3) | {"body_html": "kept", "render_version": RENDER_VERSION}
+    )
+    for n in range(3):
+        repos.comments.add(t1, {"body": f"c{n} **b**", "created_at": float(n)})
+
+    dry = rerender_bodies(repos, page_size=2, dry_run=True)
+    assert (dry.threads_rendered, dry.comments_rendered) == (2, 3)
+    assert "body_html" not in store.threads[t1]
+
+    report = rerender_bodies(repos, page_size=2)
+    assert (report.threads_scanned, report.threads_rendered) == (3, 2)
+    assert (report.comments_scanned, report.comments_rendered) == (3, 3)
+    assert store.threads[t1]["body_html"] == "<p><em>legacy</em></p>\n"
+    assert store.threads[t2]["body_html"] == render_body("b")
+    assert store.threads[current]["body_html"] == "kept"
+    assert all(
+        c["body_html"] == render_body(c["body"]) and c["render_version"] == RENDER_VERSION
+        for c in store.comments[t1].values()
+    )
+    assert rerender_bodies(repos).threads_rendered == 0  # idempotent
+    assert rerender_bodies(repos, force=True).comments_rendered == 3
+
+
+def test_rerender_bodies_backfills_thread_excerpts(repos, store):
+    from backend.render import RENDER_VERSION, excerpt
+    from backend.tools.rerender_bodies import rerender_bodies
+
+    current = _thread(1) | {"body_html": "<p>kept &amp; <em>short</em></p>"}
+    tid = repos.threads.create(current | {"tags": ["x"], "render_version": RENDER_VERSION})
+    report = rerender_bodies(repos)
+    assert (report.threads_rendered, report.threads_excerpted) == (0, 1)
+    assert store.threads[tid]["body_html"] == current["body_html"]
+    assert store.threads[tid]["excerpt"] == "kept &amp; short"
+    assert store.tag_threads["x"][tid]["excerpt"] == "kept &amp; short"
+    assert rerender_bodies(repos).threads_excerpted == 0
+
+    long = excerpt("<p>" + "word " * 100 + "</p>")
+    assert long.endswith("word\u2026") and len(long) <= 201
+
+
+
+def test_update_many_skips_missing_threads_and_creates_missing_tag_entries(repos, store):
+    tid = repos.threads.create(_thread(1) | {"tags": ["x", "y"]})
+    del store.tag_threads["y"][tid]  # written before the tag index was backfilled
+    repos.threads.update_many({tid: {"excerpt": "e"}, "gone": {"excerpt": "e"}})
+    assert store.threads[tid]["excerpt"] == "e" and "gone" not in store.threads
+    assert store.tag_threads["x"][tid]["excerpt"] == "e"
+    assert store.tag_threads["y"][tid] == {"excerpt": "e"}
+
+def test_op_stats_count_reads_and_writes(repos, store):
+    tid = repos.threads.create(_thread(1))
+    repos.comments.add(tid, {"body": "b", "created_at": 2.0, "score": 0.0})
+    repos.threads.list(None, 10)
+    stats = repos.stats.snapshot()
+    assert stats["threads.create"] == {"calls": 1, "reads": 0, "writes": 1}
+    # comment + counter shard + thread touch
+    assert stats["comments.add"] == {"calls": 1, "reads": 1, "writes": 3}
+    assert stats["threads.list"]["reads"] == 1 + store.num_shards
+
+
+def test_sharded_comment_count_is_exact(repos, store):
+    legacy = _thread(1)
+    legacy["comment_count"] = 3  # pre-sharding count stored on the thread document
+    tid = repos.threads.create(legacy)
+    for i in range(25):
+        repos.comments.add(tid, {"body": "b", "created_at": 2.0 + i, "score": 0.0})
+    assert sum(store.comment_shards[tid]) == 25
+    assert store.threads[tid]["comment_count"] == 3
+    assert repos.threads.get(tid)["comment_count"] == 28
+    assert repos.threads.list(None, 10)[0][1]["comment_count"] == 28
+    assert repos.threads.get(tid)["last_activity"] == 26.0
+
+
+def test_profile_update_round_trips(repos):
+    client = TestClient(create_app())
+    headers = {"Authorization": "Bearer x"}
+    r = client.post("/profiles", json={"display_name": "A", "username": "abc"}, headers=headers)
+    assert r.status_code == 201
+    repos.stats.reset()
+    r = client.post("/profiles", json={"display_name": "B", "username": "abc"}, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["created_at"] <= r.json()["updated_at"]
+    assert repos.stats.snapshot() == {
+        "users.get": {"calls": 1, "reads": 1, "writes": 0},
+        "users.update": {"calls": 1, "reads": 0, "writes": 1},
+    }
+
+
+def test_wilson_lower_bound_orders_by_confidence():
+    from backend.ranking import wilson_lower_bound
+
+    assert wilson_lower_bound(0, 0) == 0.0
+    assert wilson_lower_bound(10, 1) > wilson_lower_bound(1, 0)
+    assert wilson_lower_bound(100, 10) > wilson_lower_bound(10, 1)
+    assert 0.0 < wilson_lower_bound(5, 5) < 0.5
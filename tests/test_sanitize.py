@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import sanitize
+from backend.main import create_app
+
+DIRTY = (
+    '<p onclick="x()">Hi <b>there</b><script>alert(1)</script> '
+    '<a href="javascript:evil()">bad</a> <a href="https://ok.dev" rel="nofollow">ok</a> '
+    '<img src=x onerror=y> a > b</p>'
+)
+
+
+@pytest.fixture(params=["bleach", "nh3"])
+def engine(request):
+    if request.param == "nh3":
+        pytest.importorskip("nh3")
+    return sanitize.Sanitizer(request.param)
+
+
+def test_engines_strip_unsafe_markup(engine):
+    out = engine(DIRTY)
+    assert "<b>there</b>" in out
+    assert '<a href="https://ok.dev" rel="nofollow">ok</a>' in out
+    for bad in ("onclick", "<script", "javascript:", "<img", "onerror"):
+        assert bad not in out
+    assert "a &gt; b" in out
+
+
+def test_memo_and_already_sanitized_passthrough(engine):
+    first = engine(DIRTY)
+    assert isinstance(first, sanitize.SanitizedText)
+    assert engine(DIRTY) is first
+    assert engine(first) is first
+    assert engine.memo.stats()["misses"] == 1
+
+
+def test_create_thread_sanitizes_each_field_once(monkeypatch):
+    calls = []
+    sanitizer = sanitize.Sanitizer("bleach")
+    clean = sanitizer._clean
+    monkeypatch.setattr(sanitizer, "_clean", lambda text: calls.append(text) or clean(text))
+    monkeypatch.setattr(sanitize, "_default", sanitizer)
+    client = TestClient(create_app())
+    body = {"title": "T <i>x</i>", "body": DIRTY, "tags": [], "author_mode": "public"}
+    r = client.post("/threads", json=body, headers={"Authorization": "Bearer x"})
+    assert r.status_code == 201
+    assert "<script" not in r.json()["body"]
+    assert calls == ["T <i>x</i>", DIRTY]
+    client.post("/threads", json=body, headers={"Authorization": "Bearer x"})
+    assert len(calls) == 2  # identical content is served from the memo
@@ -0,0 +1,114 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from backend.main import create_app
+from backend.search import SearchIndex, parse_query, tokenize
+
+
+def _keys(hits):
+    return [h.key for h in hits]
+
+
+def test_tokenize_strips_markup_and_stopwords():
+    assert tokenize("<p>The <b>Rust</b> &amp; Go-lang</p>") == ["rust", "go", "lang"]
+    assert parse_query("fast pyth*") == [("fast", False), ("pyth", True)]
+
+
+def test_bm25_ranks_title_and_rare_terms_higher(tmp_path):
+    index = SearchIndex(tmp_path)
+    index.add_document("t1", "a post that mentions python once", "Cooking")
+    index.add_document("t2", "something else entirely", "Python packaging")
+    index.add_document("t3", "python python python", "Misc")
+    index.add_document("t4", "unrelated")
+    assert _keys(index.search("python"))[:2] == ["t3", "t2"]
+    assert _keys(index.search("cooking python"))[0] == "t1"
+    assert index.search("nothing-matches") == []
+
+
+def test_prefix_query_expands_terms(tmp_path):
+    index = SearchIndex(tmp_path)
+    index.add_document("t1", "pythonic idioms")
+    index.add_document("t1/c1", "python")
+    index.add_document("t2", "pyramid")
+    assert sorted(_keys(index.search("pyth*"))) == ["t1", "t1/c1"]
+    assert sorted(_keys(index.search("py*"))) == ["t1", "t1/c1", "t2"]
+    hit = index.search("python")[0]
+    assert (hit.thread_id, hit.comment_id) == ("t1", "c1")
+
+
+def test_index_survives_reopen_and_is_shared_between_processes(tmp_path):
+    writer = SearchIndex(tmp_path, flush_docs=2, max_segments=2)
+    reader = SearchIndex(tmp_path)
+    for i in range(11):
+        files = sorted(os.listdir(tmp_path))
+        (writer if i % 2 else reader).add_document(f"t{i}", "rust" if i % 3 else "go")
+        assert sorted(os.listdir(tmp_path)) == files  # a write only appends to the log
+        if i % 4 == 3:
+            writer.maintain()
+    assert _keys(reader.search("go", 10)) == _keys(writer.search("go", 10))
+    assert sorted(_keys(reader.search("go", 10))) == ["t0", "t3", "t6", "t9"]
+    writer.maintain()
+    segments = [f for f in os.listdir(tmp_path) if f.startswith("seg-")]
+    assert 1 <= len(segments) <= 2  # flushed and compacted
+
+    reopened = SearchIndex(tmp_path)  # segments are mapped and the log replayed, no rebuild
+    assert reopened.doc_count == 11
+    assert sorted(_keys(reopened.search("rust", 20))) == sorted(
+        f"t{i}" for i in range(11) if i % 3
+    )
+
+
+def test_search_endpoint_indexes_new_posts(monkeypatch):
+    from backend import deps
+
+    async def fake_user():
+        return {"uid": "u1"}
+
+    monkeypatch.setattr(deps, "get_current_user", fake_user)
+    client = TestClient(create_app())
+    auth = {"Authorization": "Bearer x"}
+    payload = {
+        "title": "Async tips",
+        "body": "Use asyncio.gather",
+        "tags": ["python"],
+        "author_mode": "anon",
+    }
+    thread = client.post("/threads", json=payload, headers=auth).json()
+    comment = client.post(
+        f"/threads/{thread['id']}/comments", json={"body": "gather is great"}, headers=auth
+    ).json()
+
+    items = client.get("/search?q=gather").json()["items"]
+    assert {(i["kind"], i["comment_id"]) for i in items} == {
+        ("thread", None),
+        ("comment", comment["id"]),
+    }
+    assert all(i["thread"]["id"] == thread["id"] for i in items)
+    assert items[0]["thread"]["author_uid"] is None  # anon stays masked
+    assert client.get("/search?q=pyth*").json()["items"][0]["thread_id"] == thread["id"]
+    assert client.get("/search?q=").status_code == 422
+
+
+def test_build_search_index_from_repositories(repos, tmp_path):
+    from backend.tools.build_search_index import build_search_index
+
+    tid = repos.threads.create({"title": "Zig", "body": "comptime", "tags": [], "last_activity": 1})
+    repos.comments.add(tid, {"body": "allocators", "created_at": 1.0})
+    index = SearchIndex(tmp_path)
+    report = build_search_index(index, repos, page_size=1)
+    assert (report.threads, report.comments) == (1, 1)
+    assert _keys(index.search("zig")) == [tid]
+    assert index.search("allocators")[0].comment_id is not None
+
+
+def test_indexing_failures_are_counted_not_raised(monkeypatch):
+    from backend import search
+
+    def broken():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(search, "get_index", broken)
+    before = search.index_failures["comment"]
+    search.index_comment("t1", "c1", {"body": "lost"})
+    assert search.index_failures["comment"] == before + 1
@@ -0,0 +1,65 @@
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import spa
+
+
+def _dist(tmp_path, html=b"<!doctype html><title>v1</title>" + b"<div id=root></div>" * 100):
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    (dist / "index.html").write_bytes(html)
+    return dist
+
+
+def test_deep_links_served_from_memory(tmp_path, monkeypatch):
+    dist = _dist(tmp_path)
+    app = FastAPI()
+    shell = spa.mount_frontend(app, dist)
+    client = TestClient(app)
+
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(spa.os, "stat", lambda p, *a, **k: stats.append(p) or real_stat(p))
+    shell.check_interval = 3600
+    for path in ("/planet/earth", "/profile/u1", "/galaxy"):
+        r = client.get(path, headers={"Accept-Encoding": "identity"})
+        assert r.status_code == 200 and r.content == (dist / "index.html").read_bytes()
+        assert r.headers["content-type"].startswith("text/html")
+    # the static mount still looks the path up; the shell itself is not re-read or stat'ed
+    assert str(dist / "index.html") not in map(str, stats)
+
+    r = client.get("/planet/mars", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.text.startswith("<!doctype html>")
+    assert r.headers["etag"].endswith('-gzip"') and r.headers["cache-control"] == "no-cache"
+    again = client.get(
+        "/planet/mars", headers={"Accept-Encoding": "gzip", "If-None-Match": r.headers["etag"]}
+    )
+    assert again.status_code == 304 and again.content == b""
+    assert client.get("/assets/missing-abcdefgh.js").json()["error"]["code"] == 404
+
+
+def test_shell_reloads_when_file_changes(tmp_path):
+    dist = _dist(tmp_path)
+    now = [0.0]
+    shell = spa.SpaShell(dist / "index.html", check_interval=1.0, clock=lambda: now[0])
+    app = FastAPI()
+
+    @app.get("/{path:path}")
+    async def fallback(request: spa.Request):
+        return shell.response(request)
+
+    client = TestClient(app)
+    etag = client.get("/x").headers["etag"]
+    (dist / "index.html").write_bytes(b"<!doctype html><title>v2</title>")
+    os.utime(dist / "index.html", ns=(1, 1))  # a different mtime, whatever the clock resolution
+    assert client.get("/x").headers["etag"] == etag  # not re-checked within the interval
+    now[0] = 2.0
+    r = client.get("/x")
+    assert r.headers["etag"] != etag and "v2" in r.text and shell.reloads == 2
+    assert shell.refresh() is False  # unchanged since
+
+    (dist / "index.html").unlink()  # mid-rebuild
+    now[0] = 4.0
+    assert "v2" in client.get("/x").text
@@ -0,0 +1,72 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend import firebase
+from backend.main import create_app
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_app_import_defers_firebase_and_http_clients():
+    probe = (
+        "import sys, backend.main; "
+        "print(sorted(m for m in ('firebase_admin', 'google.cloud.firestore', 'grpc', 'httpx') "
+        "if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=PROJECT_ROOT,
+        env={"FIREBASE_PROJECT_ID": "test-project", "PATH": ""},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_readyz_flips_after_warm_up(monkeypatch):
+    attempts = []
+
+    def warm_up():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("firestore unreachable")
+
+    monkeypatch.setattr(firebase, "warm_up", warm_up)
+    with TestClient(create_app()) as client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        r = client.get("/readyz")
+        assert r.status_code == 503 and r.json() == {"status": "starting"}
+        deadline = time.monotonic() + 5
+        while client.get("/readyz").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert client.get("/readyz").json() == {"status": "ready"} and len(attempts) == 2
+
+
+def test_data_routes_do_not_block_the_loop_during_a_slow_warm_up(monkeypatch, repos):
+    from backend import repositories
+
+    released = threading.Event()
+
+    def slow_get_repositories():  # like get_db() waiting on warm_up's _init_lock
+        released.wait(5)
+        return repos
+
+    monkeypatch.setattr(repositories, "get_repositories", slow_get_repositories)
+    with TestClient(create_app()) as client:
+        listing = []
+        reader = threading.Thread(target=lambda: listing.append(client.get("/threads")))
+        reader.start()
+        time.sleep(0.1)  # the listing is now waiting for the repositories
+        start = time.monotonic()
+        assert client.get("/healthz").status_code == 200
+        assert client.get("/readyz").status_code == 503
+        assert time.monotonic() - start < 1 and not listing
+        released.set()
+        reader.join(5)
+        assert listing[0].status_code == 200
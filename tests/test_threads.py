@@ -9,65 +9,6 @@ from backend.main import create_app
 def client(monkeypatch):
     app = create_app()
 
-    class DummyDB:
-        def __init__(self):
-            self.threads = {}
-
-        def collection(self, name):
-            assert name == "threads"
-            return self
-
-        def document(self, doc_id=None):
-            from types import SimpleNamespace
-
-            if doc_id is None:
-                doc_id = f"t{len(self.threads)+1}"
-            db = self
-
-            class DocRef:
-                def __init__(self, id):
-                    self.id = id
-
-                def set(self, data):
-                    db.threads[self.id] = data
-
-                def get(self):
-                    class Snap:
-                        exists = self.id in db.threads
-
-                        def to_dict(inner_self):
-                            return db.threads[self.id]
-
-                        id = self.id
-
-                    return Snap()
-
-            return DocRef(doc_id)
-
-        def order_by(self, *args, **kwargs):
-            return self
-
-        def where(self, *args, **kwargs):
-            return self
-
-        def limit(self, n):
-            return self
-
-        def stream(self):
-            for k, v in self.threads.items():
-
-                class Snap:
-                    id = k
-
-                    def to_dict(self):
-                        return v
-
-                yield Snap()
-
-    # Monkeypatch get_db
-    from backend import firebase
-
-    monkeypatch.setattr(firebase, "get_db", lambda: DummyDB())
     # Patch auth
     from backend import deps
 
@@ -97,7 +38,197 @@ def test_create_thread(client):
     assert data["title"] == "Hello"
 
 
+def test_body_html_rendered_once_at_write_time(client, store, monkeypatch):
+    from backend import render
+
+    payload = {
+        "title": "Md",
+        "body": "# Hi\n\n**bold** <script>x</script> [l](javascript:alert(1))",
+        "tags": [],
+        "author_mode": "public",
+    }
+    created = client.post("/threads", json=payload, headers={"Authorization": "Bearer x"}).json()
+    assert created["body_html"].startswith("<h1>Hi</h1>\n<p><strong>bold</strong>")
+    assert "<script" not in created["body_html"] and "href" not in created["body_html"]
+    assert store.threads[created["id"]]["render_version"] == render.RENDER_VERSION
+
+    # reads serve the stored HTML without rendering again
+    monkeypatch.setattr(render, "_md", None)
+    assert client.get(f"/threads/{created['id']}").json()["body_html"] == created["body_html"]
+    assert client.get("/threads").json()["items"][0]["body_html"] == created["body_html"]
+
+
+def test_tag_feed_and_counts_from_index(client, repos):
+    for tags in (["python", "web"], ["python"], ["rust"]):
+        payload = {"title": "T", "body": "b", "tags": tags, "author_mode": "public"}
+        client.post("/threads", json=payload, headers={"Authorization": "Bearer x"})
+    assert len(client.get("/threads?tag=python").json()["items"]) == 2
+    repos.stats.reset()
+    assert client.get("/tags?limit=2").json()["items"] == [
+        {"tag": "python", "thread_count": 2},
+        {"tag": "rust", "thread_count": 1},
+    ]
+    client.get("/tags?limit=2")
+    assert repos.stats.snapshot()["tags.counts"]["calls"] == 1  # second call cached
+
+
+def test_summary_view_and_sparse_fieldsets(client, repos):
+    payload = {
+        "title": "Feed",
+        "body": "Intro **words** & more\n\n" + "lorem ipsum " * 200,
+        "tags": ["py"],
+        "author_mode": "public",
+    }
+    created = client.post("/threads", json=payload, headers={"Authorization": "Bearer x"}).json()
+    assert created["excerpt"].startswith("Intro words &amp; more lorem ipsum")
+    full = client.get("/threads").json()["items"][0]
+    summary = client.get("/threads?view=summary").json()["items"][0]
+    assert summary == {k: v for k, v in full.items() if k not in ("body", "body_html")}
+    hot = client.get("/threads?view=summary&tag=py&sort=hot").json()["items"][0]
+    assert hot["excerpt"] == created["excerpt"] and hot["hot_score"] is not None
+    assert "body" not in hot
+
+    repos.stats.reset()
+    items = client.get("/threads?fields=title,comment_count").json()["items"]
+    assert items == [{"id": created["id"], "title": "Feed", "comment_count": 0}]
+    assert repos.stats.snapshot() == {}  # only summary fields: the cached summary page
+    items = client.get("/threads?tag=py&fields=title,body&expand=author").json()["items"]
+    assert set(items[0]) == {"id", "title", "body", "author"}
+    assert client.get("/threads?view=summary&fields=title,body").status_code == 422
+    assert client.get("/threads?fields=nope").status_code == 422
+
+
 def test_create_thread_validation(client):
     payload = {"title": "", "body": "World", "tags": [], "author_mode": "public"}
     r = client.post("/threads", json=payload, headers={"Authorization": "Bearer x"})
     assert r.status_code == 422
+
+
+def test_pagination_with_equal_last_activity(client, repos, store):
+    for i in range(7):
+        store.threads[f"t{i}"] = {
+            "title": f"T{i}",
+            "body": "b",
+            "tags": [],
+            "author_uid": "u1",
+            "author_mode": "public",
+            "comment_count": 0,
+            "last_activity": 100.0,
+            "created_at": 100.0,
+            "updated_at": 100.0,
+        }
+    seen, token = [], None
+    while True:
+        url = "/threads?limit=3" + (f"&page_token={token}" if token else "")
+        page = client.get(url).json()
+        seen.extend(item["id"] for item in page["items"])
+        token = page["next_page_token"]
+        if not token:
+            break
+    assert sorted(seen) == sorted(store.threads)
+    assert len(seen) == len(set(seen))
+    # Each page is a single limit+1 query (plus the comment-counter shards of the returned
+    # threads): no extra document read for the cursor
+    docs = 4 + 4 + 1
+    assert repos.stats.snapshot()["threads.list"] == {
+        "calls": 3,
+        "reads": docs * (1 + store.num_shards),
+        "writes": 0,
+    }
+
+
+def test_malformed_page_tokens_are_400(client):
+    import base64
+    import json
+
+    def token(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode()
+
+    bad_new = [token({"offset": 20, "gen": 1.0}), token({"id": "t1"}), token([1, 2]), "%%%"]
+    for bad in bad_new:
+        assert client.get(f"/threads?page_token={bad}").status_code == 400
+    for bad in [token({"offset": "x"}), token({"id": "t1", "ts": 1.0}), token({"offset": -1})]:
+        assert client.get(f"/threads?sort=hot&page_token={bad}").status_code == 400
+
+
+def test_hot_feed_served_from_materialized_document(client, repos, store):
+    import time
+    from backend import jobs
+
+    now = time.time()
+    for tid, comments, age_hours in [("old", 50, 48), ("busy", 10, 1), ("quiet", 0, 10)]:
+        store.threads[tid] = {
+            "title": tid,
+            "body": "b",
+            "tags": ["x"] if tid != "quiet" else [],
+            "author_uid": "u1",
+            "author_mode": "anon",
+            "comment_count": comments,
+            "last_activity": now,
+            "created_at": now - age_hours * 3600,
+            "updated_at": now,
+        }
+    jobs.refresh_hot_feed(repos, now=now)
+    assert all("body" not in item for item in store.feeds[jobs.HOT_FEED_NAME]["items"])
+    repos.stats.reset()
+
+    page = client.get("/threads?sort=hot&limit=2").json()
+    assert [t["id"] for t in page["items"]] == ["busy", "old"]
+    assert page["items"][0]["hot_score"] > page["items"][1]["hot_score"]
+    assert page["items"][0]["author_uid"] is None
+    rest = client.get(f"/threads?sort=hot&limit=2&page_token={page['next_page_token']}").json()
+    assert [t["id"] for t in rest["items"]] == ["quiet"]
+    assert [t["id"] for t in client.get("/threads?sort=hot&tag=x").json()["items"]] == ["busy", "old"]
+    # every page is one read of feeds/hot plus one batched get of its threads, no thread query
+    stats = repos.stats.snapshot()
+    assert set(stats) == {"feeds.get", "threads.get_many"}
+    assert stats["feeds.get"]["calls"] == stats["threads.get_many"]["calls"] == 3
+    repos.stats.reset()
+    summary = client.get("/threads?sort=hot&limit=2&view=summary").json()
+    assert [t["id"] for t in summary["items"]] == ["busy", "old"]
+    assert set(repos.stats.snapshot()) == {"feeds.get"}
+
+
+def test_hot_feed_fits_firestore_document_limit(client, repos, store):
+    import json
+    from backend import jobs
+
+    body = "&lt;" * 5000  # 5000 "<" after sanitizing
+    for i in range(jobs.HOT_FEED_SIZE):
+        store.threads[f"t{i}"] = {
+            "title": f"T{i}",
+            "body": body,
+            "body_html": f"<p>{body}</p>",
+            "excerpt": "&lt;" * 200,
+            "tags": [],
+            "author_uid": "u1",
+            "author_mode": "public",
+            "comment_count": i,
+            "last_activity": 100.0,
+            "created_at": 100.0,
+            "updated_at": 100.0,
+        }
+    feed = jobs.refresh_hot_feed(repos, now=200.0)
+    assert len(feed["items"]) == jobs.HOT_FEED_SIZE
+    assert len(json.dumps(feed).encode()) < 1024 * 1024 // 2
+    page = client.get("/threads?sort=hot&limit=2").json()["items"]
+    assert [t["id"] for t in page] == ["t99", "t98"]
+    assert page[0]["body"] == body and page[0]["body_html"] == f"<p>{body}</p>"
+
+
+def test_listing_fast_path_matches_validated_models(client, monkeypatch):
+    from backend import responses
+    from backend.schemas import ThreadsPage
+
+    payload = {"title": "Fast", "body": "path", "tags": ["json"], "author_mode": "anon"}
+    client.post("/threads", json=payload, headers={"Authorization": "Bearer x"})
+    r = client.get("/threads")
+    assert r.headers["content-type"] == "application/json"
+    # Same document the validating response_model path would have produced.
+    assert ThreadsPage.model_validate(r.json()).model_dump(mode="json") == r.json()
+    assert r.json()["items"][0]["author_uid"] is None
+
+    body = {"tags": ["a"], "counts": {1: 2}}
+    assert responses.FastJSONResponse(body).body == b'{"tags":["a"],"counts":{"1":2}}'
+    monkeypatch.setattr(responses, "orjson", None)  # stdlib fallback
+    assert responses.FastJSONResponse({"tags": ["a"]}).body == b'{"tags":["a"]}'